@@ -1,26 +1,35 @@
+from typing import Any, Dict, Optional
+
 from flask import Flask
 from flask_cors import CORS
 
-def create_app():
+from app.blueprints import register_blueprints
+from app.compression import Compress
+from app.idempotency import Idempotency
+from app.instrumentation import Instrumentation
+from app.log import Logging
+from app.profiling import Profiler
+from app.tenants import Tenants
+from app.validation import RequestValidation
+
+def create_app(config: Optional[Dict[str, Any]] = None):
     app = Flask(__name__)
+    if config:
+        app.config.update(config)
     CORS(app)
+    # First, so every other hook logs with the request id
+    Logging(app)
+    # Registered before Compress so its after_request runs last and timing includes compression
+    Instrumentation(app)
+    # Rejects bad bodies before any view, and so any file I/O, runs; see app/validation.py
+    RequestValidation(app)
+    Compress(app)
+    Idempotency(app)
+    # Off unless PROFILING is set; see app/profiling.py
+    Profiler(app)
 
-    # Import and register blueprints
-    from app.advanced.routes import advanced_bp
-    from app.chart_of_accounts.routes import chart_of_accounts_bp
-    from app.company.routes import company_bp
-    from app.customers.routes import customers_bp
-    from app.estimates.routes import estimates_bp
-    from app.invoices.routes import invoices_bp
-    from app.transactions.routes import transactions_bp
-
-    # Register all blueprints with their prefixes
-    app.register_blueprint(advanced_bp, url_prefix='/api/advanced')
-    app.register_blueprint(chart_of_accounts_bp, url_prefix='/api/coa')
-    app.register_blueprint(company_bp, url_prefix='/api/company')
-    app.register_blueprint(customers_bp, url_prefix='/api/customers')
-    app.register_blueprint(estimates_bp, url_prefix='/api/estimates')
-    app.register_blueprint(invoices_bp, url_prefix='/api/invoices')
-    app.register_blueprint(transactions_bp, url_prefix='/api/transactions')
+    register_blueprints(app)
+    # Outermost, so the /t/<tenant> prefix is gone before blueprints are matched
+    Tenants(app)
 
     return app
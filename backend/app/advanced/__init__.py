@@ -2,4 +2,4 @@ from flask import Blueprint
 
 advanced_bp = Blueprint('advanced', __name__)
 
-from . import routes
+# Routes are attached when app.blueprints imports the routes module
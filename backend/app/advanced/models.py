@@ -1,5 +1,63 @@
 from dataclasses import dataclass
 from typing import Optional, Dict, Any
+from app.instrumentation import timed
+
+# Advanced field enums
+ADVANCED_ENUMS = {
+    "fiscal_year_start": [
+        "January",
+        "February",
+        "March",
+        "April",
+        "May",
+        "June",
+        "July",
+        "August",
+        "September",
+        "October",
+        "November",
+        "December"
+    ],
+    "income_tax_year_start": [
+        "Same as fiscal year",
+        "January"
+    ],
+    "accounting_methods": [
+        "Accrual",
+        "Cash"
+    ],
+    "tax_forms": [
+        "Sole Proprietor (Form 1040)",
+        "Partnership or limited liability company (Form 1065)",
+        "Small Business corporation, two or more owners (Form 1120S)",
+        "Corporation, one or more shareholders (Form 1120)",
+        "Nonprofit organization (Form 990)",
+        "Limited Liability",
+        "Other (Please specify)"
+    ],
+    "tips_accounts": [
+        "Cash on Hand",
+        "Accounts Receivable"
+    ],
+    "date_formats": [
+        "mm/dd/yyyy",
+        "dd/mm/yyyy",
+        "yyyy/mm/dd"
+    ],
+    "currencies": [
+        "United States Dollar (USD)"
+    ],
+    "number_formats": [
+        "#,###.##",
+        "#.###,##",
+        "# ###,##"
+    ],
+    "sign_out_after_inactivity": [
+        "1 hour",
+        "2 hours",
+        "3 hours"
+    ]
+}
 
 @dataclass
 class Accounting:
@@ -60,6 +118,7 @@ class AdvancedSettings:
     other_preferences: OtherPreferences
 
     @classmethod
+    @timed('model')
     def from_dict(cls, data: Dict[str, Any]) -> 'AdvancedSettings':
         """Create an AdvancedSettings instance from a dictionary"""
         return cls(
@@ -73,6 +132,7 @@ class AdvancedSettings:
             other_preferences=OtherPreferences(**data['other_preferences'])
         )
 
+    @timed('model')
     def to_dict(self) -> Dict[str, Any]:
         """Convert AdvancedSettings instance to dictionary"""
         return {
@@ -1,8 +1,9 @@
 from flask import jsonify, request
+from app import storage
+from app.changes.routes import record_change
 from . import advanced_bp
-from .models import AdvancedSettings
-import json
-import os
+from app.precomputed import PrecomputedResponse
+from .models import AdvancedSettings, ADVANCED_ENUMS
 import logging
 from datetime import datetime
 from typing import Dict, Optional, List
@@ -10,80 +11,17 @@ from app.transactions.routes import load_transactions
 from app.chart_of_accounts.routes import load_accounts
 
 # Set up logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # File path for storing advanced settings data
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-DATA_DIR = os.path.join(BASE_DIR, 'data')
-ADVANCED_DATA_FILE = os.path.join(DATA_DIR, 'advanced.json')
-
-# Ensure data directory exists
-os.makedirs(DATA_DIR, exist_ok=True)
-
-# Advanced field enums
-ADVANCED_ENUMS = {
-    "fiscal_year_start": [
-        "January",
-        "February",
-        "March",
-        "April",
-        "May",
-        "June",
-        "July",
-        "August",
-        "September",
-        "October",
-        "November",
-        "December"
-    ],
-    "income_tax_year_start": [
-        "Same as fiscal year",
-        "January"
-    ],
-    "accounting_methods": [
-        "Accrual",
-        "Cash"
-    ],
-    "tax_forms": [
-        "Sole Proprietor (Form 1040)",
-        "Partnership or limited liability company (Form 1065)",
-        "Small Business corporation, two or more owners (Form 1120S)",
-        "Corporation, one or more shareholders (Form 1120)",
-        "Nonprofit organization (Form 990)",
-        "Limited Liability",
-        "Other (Please specify)"
-    ],
-    "tips_accounts": [
-        "Cash on Hand",
-        "Accounts Receivable"
-    ],
-    "date_formats": [
-        "mm/dd/yyyy",
-        "dd/mm/yyyy",
-        "yyyy/mm/dd"
-    ],
-    "currencies": [
-        "United States Dollar (USD)"
-    ],
-    "number_formats": [
-        "#,###.##",
-        "#.###,##",
-        "# ###,##"
-    ],
-    "sign_out_after_inactivity": [
-        "1 hour",
-        "2 hours",
-        "3 hours"
-    ]
-}
+ADVANCED_DATA_FILE = 'advanced.json'
 
 def load_advanced_data():
     """Load advanced settings data from JSON file."""
     try:
-        if os.path.exists(ADVANCED_DATA_FILE):
-            with open(ADVANCED_DATA_FILE, 'r') as f:
-                return json.load(f)
+        data = storage.load_json(ADVANCED_DATA_FILE)
+        if data is not None:
+            return data
         else:
             default_data = {
                 "accounting": {
@@ -126,21 +64,19 @@ def load_advanced_data():
                     "sign_out_after_inactivity": ""
                 }
             }
-            with open(ADVANCED_DATA_FILE, 'w') as f:
-                json.dump(default_data, f, indent=4)
+            storage.save_json(ADVANCED_DATA_FILE, default_data, indent=4)
             return default_data
     except Exception as e:
-        print(f"Error loading advanced data: {e}")
+        logger.exception("Error loading advanced data: %s", e)
         return None
 
 def save_advanced_data(data):
     """Save advanced settings data to JSON file"""
     try:
-        with open(ADVANCED_DATA_FILE, 'w') as file:
-            json.dump(data, file, indent=4)
+        storage.save_json(ADVANCED_DATA_FILE, data, indent=4)
         return True
     except Exception as e:
-        print(f"Error saving advanced settings data: {str(e)}")
+        logger.exception("Error saving advanced settings data: %s", e)
         return False
 
 def deep_update(original, update):
@@ -203,10 +139,10 @@ def validate_accounting_method_change(current_settings: Dict, new_settings: Dict
 def create_settings_backup() -> bool:
     """Create a backup of current settings"""
     try:
-        backup_file = os.path.join(DATA_DIR, f'advanced_backup_{datetime.utcnow().strftime("%Y%m%d_%H%M%S")}.json')
-        if os.path.exists(ADVANCED_DATA_FILE):
-            with open(ADVANCED_DATA_FILE, 'r') as src, open(backup_file, 'w') as dst:
-                json.dump(json.load(src), dst, indent=2)
+        backup_file = f'advanced_backup_{datetime.utcnow().strftime("%Y%m%d_%H%M%S")}.json'
+        current = storage.load_json(ADVANCED_DATA_FILE)
+        if current is not None:
+            storage.save_json(backup_file, current)
         return True
     except Exception as e:
         logger.error(f"Backup creation failed: {str(e)}")
@@ -261,6 +197,7 @@ def create_advanced():
 
         # Save advanced settings data
         if save_advanced_data(advanced_data):
+            record_change('advanced', None, 'create')
             return jsonify({
                 'message': 'Advanced settings created successfully',
                 'settings': advanced_data
@@ -303,6 +240,7 @@ def update_advanced():
         
         # Save changes
         if save_advanced_data(current_settings):
+            record_change('advanced', None, 'update')
             logger.info("Advanced settings updated successfully")
             return jsonify(current_settings)
         else:
@@ -316,10 +254,10 @@ def update_advanced():
 def delete_advanced():
     """Reset advanced settings"""
     try:
-        if os.path.exists(ADVANCED_DATA_FILE):
+        if storage.exists(ADVANCED_DATA_FILE):
             # Write an empty object to the file instead of deleting it
-            with open(ADVANCED_DATA_FILE, 'w') as file:
-                json.dump({}, file)
+            storage.save_json(ADVANCED_DATA_FILE, {}, indent=None)
+            record_change('advanced', None, 'delete')
             return jsonify({
                 'message': 'Advanced settings reset successfully'
             }), 200
@@ -332,7 +270,9 @@ def delete_advanced():
             'error': str(e)
         }), 500
 
+FIELD_OPTIONS_RESPONSE = PrecomputedResponse(ADVANCED_ENUMS)
+
 @advanced_bp.route('/get_field_options', methods=['GET'])
 def get_field_options():
     """Get available options for advanced settings fields"""
-    return jsonify(ADVANCED_ENUMS), 200
+    return FIELD_OPTIONS_RESPONSE.response()
@@ -0,0 +1,214 @@
+import asyncio
+import io
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from flask import Flask, request, request_finished
+
+from app.tenants import split_tenant_path
+
+# Endpoints that may hold a worker for a long time (reports, exports, batches)
+DEFAULT_SLOW_ENDPOINTS = {
+    'batch.run_batch',
+    'customers.get_customer_summary',
+    'invoices.get_summary',
+    'transactions.export_transactions',
+}
+
+# Endpoints that hold a connection open indefinitely (event streams)
+DEFAULT_STREAM_ENDPOINTS = {
+    'events.stream_events',
+}
+
+_END = object()
+
+# Set in the environ when the response body is already in memory
+BUFFERED_KEY = 'app.buffered'
+
+def _note_buffered(sender: Flask, response, **extra) -> None:
+    # request_finished comes after every after_request hook, so this is the body that is sent
+    if response.is_sequence and not response.direct_passthrough:
+        request.environ[BUFFERED_KEY] = True
+
+class AsgiApp:
+    """Serve the Flask app over ASGI without blocking the event loop
+
+    Every WSGI call, and every chunk pulled from a streamed response, runs
+    in a bounded thread pool so disk I/O never happens on the loop. Slow
+    report and export endpoints get their own smaller pool so they cannot
+    starve ordinary requests, and long-lived event streams get a third pool
+    whose threads spend nearly all their time waiting.
+
+    Configuration keys (read from the Flask app config):
+        ASGI_WORKERS          - threads for ordinary requests
+        ASGI_SLOW_WORKERS     - threads for slow endpoints
+        ASGI_SLOW_ENDPOINTS   - endpoint names routed to the slow pool
+        ASGI_STREAM_WORKERS   - threads for event streams
+        ASGI_STREAM_ENDPOINTS - endpoint names routed to the stream pool
+    """
+
+    def __init__(self, app: Flask):
+        self.app = app
+        workers = app.config.get('ASGI_WORKERS') or min(32, (os.cpu_count() or 1) + 4)
+        slow_workers = app.config.get('ASGI_SLOW_WORKERS') or 4
+        stream_workers = app.config.get('ASGI_STREAM_WORKERS') or app.config.get('EVENTS_MAX_CLIENTS', 100)
+        self.slow_endpoints = set(app.config.get('ASGI_SLOW_ENDPOINTS', DEFAULT_SLOW_ENDPOINTS))
+        self.stream_endpoints = set(app.config.get('ASGI_STREAM_ENDPOINTS', DEFAULT_STREAM_ENDPOINTS))
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='asgi')
+        self.slow_executor = ThreadPoolExecutor(max_workers=slow_workers, thread_name_prefix='asgi-slow')
+        self.stream_executor = ThreadPoolExecutor(max_workers=stream_workers, thread_name_prefix='asgi-stream')
+        request_finished.connect(_note_buffered, app)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self._http(scope, receive, send)
+        elif scope['type'] == 'websocket':
+            await send({'type': 'websocket.close', 'code': 1000})
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=False)
+                self.slow_executor.shutdown(wait=False)
+                self.stream_executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def _executor_for(self, environ: Dict, path: str) -> ThreadPoolExecutor:
+        try:
+            adapter = self.app.url_map.bind_to_environ(environ)
+            endpoint, _ = adapter.match(path)
+        except Exception:
+            return self.executor
+        if endpoint in self.stream_endpoints:
+            return self.stream_executor
+        return self.slow_executor if endpoint in self.slow_endpoints else self.executor
+
+    async def _http(self, scope, receive, send):
+        body = await self._read_body(receive)
+        if body is None:
+            return
+        environ = build_environ(scope, body)
+        loop = asyncio.get_running_loop()
+
+        # Routing sees the path without a /t/<tenant> prefix
+        _, path = split_tenant_path(environ['PATH_INFO'])
+        executor = self._executor_for(environ, path)
+
+        response: Dict = {}
+
+        def start_response(status: str, headers: List[Tuple[str, str]], exc_info=None):
+            response['status'] = int(status.split(' ', 1)[0])
+            response['headers'] = [
+                (name.lower().encode('latin-1'), value.encode('latin-1'))
+                for name, value in headers
+            ]
+
+        disconnected = asyncio.Event()
+        watcher = iterable = None
+        try:
+            watcher = asyncio.ensure_future(self._watch_disconnect(receive, disconnected))
+            iterable = await loop.run_in_executor(executor, self.app, environ, start_response)
+            started = False
+            if environ.get(BUFFERED_KEY):
+                # Buffered responses need no further trips to the pool
+                chunks = iter(iterable)
+                next_chunk = lambda: next(chunks, _END)
+            else:
+                iterator = iter(iterable)
+                next_chunk = None
+
+            while not disconnected.is_set():
+                if next_chunk is not None:
+                    chunk = next_chunk()
+                else:
+                    chunk = await loop.run_in_executor(executor, next, iterator, _END)
+                if chunk is _END:
+                    break
+                if not started:
+                    await self._start(send, response)
+                    started = True
+                if chunk:
+                    await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+
+            if not disconnected.is_set():
+                if not started:
+                    await self._start(send, response)
+                await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+        finally:
+            if watcher is not None:
+                watcher.cancel()
+            close = getattr(iterable, 'close', None)
+            if close is not None:
+                await loop.run_in_executor(executor, close)
+
+    @staticmethod
+    async def _start(send, response: Dict):
+        await send({
+            'type': 'http.response.start',
+            'status': response.get('status', 500),
+            'headers': response.get('headers', [])
+        })
+
+    @staticmethod
+    async def _read_body(receive) -> Optional[bytes]:
+        body = io.BytesIO()
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return None
+            body.write(message.get('body', b''))
+            if not message.get('more_body', False):
+                return body.getvalue()
+
+    @staticmethod
+    async def _watch_disconnect(receive, disconnected: asyncio.Event):
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                disconnected.set()
+                return
+
+def build_environ(scope: Dict, body: bytes) -> Dict:
+    """Translate an ASGI HTTP scope into a WSGI environ"""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1] or 80),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': client[0],
+        'REMOTE_PORT': str(client[1]),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    for raw_name, raw_value in scope.get('headers', []):
+        name = raw_name.decode('latin-1').upper().replace('-', '_')
+        value = raw_value.decode('latin-1')
+        if name == 'CONTENT_TYPE':
+            key = 'CONTENT_TYPE'
+        elif name == 'CONTENT_LENGTH':
+            key = 'CONTENT_LENGTH'
+        else:
+            key = f'HTTP_{name}'
+        if key in environ:
+            environ[key] = f'{environ[key]},{value}'
+        else:
+            environ[key] = value
+    return environ
@@ -0,0 +1,129 @@
+from flask import current_app, jsonify, request
+from werkzeug.test import EnvironBuilder
+from typing import Any, Dict, List, Optional
+
+from app import storage
+from . import batch_bp
+
+ALLOWED_METHODS = ['GET', 'POST', 'PUT', 'PATCH', 'DELETE']
+DEFAULT_MAX_OPERATIONS = 50
+# Endpoints whose response is streamed, which a batch cannot hold in its body
+STREAMED_PATHS = ['/api/events/stream', '/api/transactions/export']
+
+def validate_operation(operation: Any) -> Optional[str]:
+    """Validate a single batch operation"""
+    if not isinstance(operation, dict):
+        return 'Each operation must be an object'
+    method = str(operation.get('method', 'GET')).upper()
+    if method not in ALLOWED_METHODS:
+        return f'Unsupported method: {method}'
+    path = operation.get('path')
+    if not isinstance(path, str) or not path.startswith('/api/'):
+        return 'Operation path must start with /api/'
+    endpoint = path.split('?', 1)[0].rstrip('/')
+    if endpoint == '/api/batch':
+        return 'Batch operations cannot be nested'
+    if endpoint in STREAMED_PATHS:
+        return 'Streamed endpoints cannot be batched'
+    if 'headers' in operation and not isinstance(operation['headers'], dict):
+        return 'Operation headers must be an object'
+    return None
+
+def run_operation(operation: Dict) -> Dict:
+    """Dispatch one operation through the app without going over HTTP"""
+    method = str(operation.get('method', 'GET')).upper()
+    builder = EnvironBuilder(
+        path=operation['path'],
+        method=method,
+        base_url=request.host_url,
+        headers=operation.get('headers') or {},
+        json=operation.get('body'),
+        environ_base={'REMOTE_ADDR': request.remote_addr}
+    )
+    environ = builder.get_environ()
+
+    # A fresh app context keeps g isolated between operations
+    with current_app.app_context(), current_app.request_context(environ):
+        try:
+            response = current_app.full_dispatch_request()
+        except Exception as e:
+            return {'status': 500, 'body': {'error': str(e)}}
+
+    if response.is_streamed:
+        # Reading the body would wait for the stream to end, which may be never
+        response.close()
+        return {'status': 400, 'body': {'error': 'Streamed responses cannot be batched'}}
+    if response.is_json:
+        body = response.get_json(silent=True)
+    else:
+        body = response.get_data(as_text=True)
+    response.close()
+    return {'status': response.status_code, 'body': body}
+
+@batch_bp.route('', methods=['POST'])
+def run_batch():
+    """Execute several API operations in one request
+
+    Body: {"atomic": bool, "requests": [{"id", "method", "path", "body", "headers"}]}
+    or a bare list of operations. Operations run in order and share loaded
+    documents; writes reach disk once at the end. In atomic mode the first
+    failing operation (status >= 400) aborts the batch and nothing is saved.
+    """
+    payload = request.get_json(silent=True)
+    if isinstance(payload, list):
+        operations, atomic = payload, False
+    elif isinstance(payload, dict):
+        operations, atomic = payload.get('requests'), bool(payload.get('atomic', False))
+    else:
+        return jsonify({'error': 'Request body must be a list of operations or an object with "requests"'}), 400
+
+    if not isinstance(operations, list) or not operations:
+        return jsonify({'error': 'requests must be a non-empty list'}), 400
+
+    max_operations = current_app.config.get('BATCH_MAX_OPERATIONS', DEFAULT_MAX_OPERATIONS)
+    if len(operations) > max_operations:
+        return jsonify({'error': f'A batch may contain at most {max_operations} operations'}), 400
+
+    idempotency_keys = set()
+    for index, operation in enumerate(operations):
+        error = validate_operation(operation)
+        if error:
+            return jsonify({'error': f'Operation {index}: {error}'}), 400
+        # Stored responses only become visible once the batch commits
+        key = (operation.get('headers') or {}).get('Idempotency-Key')
+        if key:
+            if key in idempotency_keys:
+                return jsonify({'error': f'Operation {index}: Idempotency-Key repeated within the batch'}), 400
+            idempotency_keys.add(key)
+
+    responses: List[Dict] = []
+    failed = False
+    with storage.unit_of_work() as unit:
+        for index, operation in enumerate(operations):
+            operation_id = operation.get('id', index)
+            if atomic and failed:
+                responses.append({
+                    'id': operation_id,
+                    'status': 424,
+                    'body': {'error': 'Skipped because an earlier operation failed'}
+                })
+                continue
+
+            unit.begin_operation()
+            result = run_operation(operation)
+            if result['status'] >= 400:
+                failed = True
+                unit.discard_operation()
+            responses.append({'id': operation_id, **result})
+
+        committed = not (atomic and failed)
+        if committed:
+            unit.commit()
+        else:
+            unit.rollback()
+
+    return jsonify({
+        'atomic': atomic,
+        'committed': committed,
+        'responses': responses
+    }), 200
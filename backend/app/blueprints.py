@@ -0,0 +1,89 @@
+import importlib
+import threading
+from typing import Callable, List, Optional, Tuple
+
+from flask import Blueprint, Flask, current_app
+from flask.blueprints import BlueprintSetupState
+
+from app.route_table import ROUTES
+
+# URL prefix, module and attribute of every blueprint
+BLUEPRINTS: List[Tuple[str, str, str]] = [
+    ('/api/advanced', 'app.advanced.routes', 'advanced_bp'),
+    ('/api/batch', 'app.batch.routes', 'batch_bp'),
+    ('/api/coa', 'app.chart_of_accounts.routes', 'chart_of_accounts_bp'),
+    ('/api/changes', 'app.changes.routes', 'changes_bp'),
+    ('/api/company', 'app.company.routes', 'company_bp'),
+    ('/api/customers', 'app.customers.routes', 'customers_bp'),
+    ('/api/estimates', 'app.estimates.routes', 'estimates_bp'),
+    ('/api/events', 'app.events.routes', 'events_bp'),
+    ('/api/invoices', 'app.invoices.routes', 'invoices_bp'),
+    ('/api/meta', 'app.meta.routes', 'meta_bp'),
+    ('/api/profiles', 'app.profiles.routes', 'profiles_bp'),
+    ('/api/search', 'app.search.routes', 'search_bp'),
+    ('/api/stats', 'app.stats.routes', 'stats_bp'),
+    ('/api/transactions', 'app.transactions.routes', 'transactions_bp'),
+    ('/metrics', 'app.metrics.routes', 'metrics_bp'),
+]
+
+class _SetupState(BlueprintSetupState):
+    """Runs a blueprint's setup callbacks except its URL rules, which create_app already added"""
+
+    def add_url_rule(self, *args, **kwargs) -> None:
+        pass
+
+class LazyView:
+    """A view that imports its routes module the first time it is called
+
+    Importing a routes module attaches its views to the blueprint and runs
+    the blueprint's other setup callbacks (such as record_once) against the
+    app, as registering it would have.
+    """
+
+    _lock = threading.Lock()
+
+    def __init__(self, blueprint: Blueprint, prefix: str, module_name: str, function: str):
+        self.blueprint = blueprint
+        self.prefix = prefix
+        self.module_name = module_name
+        self.function = function
+        self.__name__ = function
+        self._view: Optional[Callable] = None
+
+    @property
+    def view(self) -> Callable:
+        if self._view is None:
+            module = importlib.import_module(self.module_name)
+            with self._lock:
+                # Routes modules whose blueprint setup already ran for this app
+                set_up = current_app.extensions.setdefault('blueprints_set_up', set())
+                if self.module_name not in set_up:
+                    app = current_app._get_current_object()
+                    state = _SetupState(self.blueprint, app, {'url_prefix': self.prefix}, True)
+                    for deferred in self.blueprint.deferred_functions:
+                        deferred(state)
+                    set_up.add(self.module_name)
+            self._view = getattr(module, self.function)
+        return self._view
+
+    def __call__(self, **kwargs):
+        return self.view(**kwargs)
+
+def register_blueprints(app: Flask, blueprints: List[Tuple[str, str, str]] = BLUEPRINTS) -> None:
+    """Add the URL rule of every route, leaving each routes module to be imported on its first request
+
+    The rules come from app/route_table.py, so no routes module is imported
+    here. They are all added in create_app, before the app serves anything:
+    Flask's url_map is not safe to change while other threads match
+    requests against it.
+    """
+    for prefix, module_name, attr in blueprints:
+        # The package only defines the blueprint; its routes module holds the views
+        blueprint = getattr(importlib.import_module(module_name.rpartition('.')[0]), attr)
+        for rule, function, methods in ROUTES[module_name]:
+            app.add_url_rule(
+                '/'.join((prefix.rstrip('/'), rule.lstrip('/'))) if rule else prefix,
+                endpoint=f'{blueprint.name}.{function}',
+                view_func=LazyView(blueprint, prefix, module_name, function),
+                methods=methods
+            )
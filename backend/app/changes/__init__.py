@@ -0,0 +1,5 @@
+from flask import Blueprint
+
+changes_bp = Blueprint('changes', __name__)
+
+# Routes are attached when app.blueprints imports the routes module
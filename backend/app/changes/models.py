@@ -0,0 +1,47 @@
+from dataclasses import dataclass
+from typing import Dict, Any
+from app.instrumentation import timed
+
+# Kinds of records tracked by the change feed
+CHANGE_ENTITIES = [
+    'invoice',
+    'estimate',
+    'transaction',
+    'account',
+    'customer',
+    'company',
+    'advanced'
+]
+CHANGE_OPERATIONS = ['create', 'update', 'delete']
+
+@dataclass
+class Change:
+    """A single create, update or delete recorded in the change feed"""
+    seq: int
+    entity: str
+    entity_id: str
+    op: str
+    at: str
+
+    @classmethod
+    @timed('model')
+    def from_dict(cls, data: Dict[str, Any]) -> 'Change':
+        """Create a Change instance from a dictionary"""
+        return cls(
+            seq=int(data['seq']),
+            entity=data['entity'],
+            entity_id=data['id'],
+            op=data['op'],
+            at=data.get('at', '')
+        )
+
+    @timed('model')
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert Change instance to dictionary"""
+        return {
+            'seq': self.seq,
+            'entity': self.entity,
+            'id': self.entity_id,
+            'op': self.op,
+            'at': self.at
+        }
@@ -0,0 +1,238 @@
+"""Change feed of every create, update and delete
+
+The log is kept as newline-delimited JSON in changes.ndjson, one change per
+line, so recording a change appends one line. It is rewritten with only the
+retained changes once it holds twice as many. Each tenant's retained changes
+are kept in memory as a derived object of the file (see storage.Tenant).
+"""
+import bisect
+import json
+import logging
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from flask import current_app, has_app_context, jsonify, request
+
+from app import storage
+from app.events.broker import broker
+from . import changes_bp
+from .models import Change, CHANGE_ENTITIES, CHANGE_OPERATIONS
+
+logger = logging.getLogger(__name__)
+
+KIND = 'changes'
+CHANGES_FILE = 'changes.ndjson'
+# The whole log as one document, as it was stored before changes.ndjson; only read to continue its sequence
+LEGACY_CHANGES_FILE = 'changes.json'
+
+# Number of changes kept before the oldest are truncated
+DEFAULT_RETENTION = 2000
+DEFAULT_LIMIT = 500
+MAX_LIMIT = 5000
+
+# Singleton documents are reported under a fixed id
+SINGLETON_IDS = {
+    'company': 'company',
+    'advanced': 'advanced'
+}
+
+class ChangeLog:
+    """The retained changes of a tenant as stored dicts, oldest first"""
+
+    def __init__(self, changes: List[Dict], last_seq: int, lines: int):
+        self.changes = changes
+        self.last_seq = last_seq
+        # Lines in changes.ndjson, including truncated changes not yet compacted away
+        self.lines = lines
+
+    def copy(self) -> 'ChangeLog':
+        return ChangeLog(list(self.changes), self.last_seq, self.lines)
+
+    def add(self, change: Dict, retention: int, compacted: bool) -> None:
+        self.changes.append(change)
+        if len(self.changes) > retention:
+            del self.changes[:len(self.changes) - retention]
+        self.last_seq = change['seq']
+        self.lines = len(self.changes) if compacted else self.lines + 1
+
+    def since(self, seq: int) -> List[Dict]:
+        """Changes after a sequence number"""
+        return self.changes[bisect.bisect_right(self.changes, seq, key=lambda change: change['seq']):]
+
+def _read_log(tenant: storage.Tenant) -> ChangeLog:
+    changes = []
+    try:
+        with open(tenant.path(CHANGES_FILE), 'r') as f:
+            for line in f:
+                try:
+                    changes.append(json.loads(line))
+                except ValueError:
+                    # A line cut short by a failed append
+                    logger.warning("Skipping unreadable change log line in %s", tenant.root)
+    except FileNotFoundError:
+        try:
+            legacy = tenant.read(LEGACY_CHANGES_FILE) or {}
+        except Exception as e:
+            logger.exception("Error loading change log: %s", e)
+            legacy = {}
+        changes = legacy.get('changes', [])
+        return ChangeLog(changes, int(legacy.get('last_seq', 0)), 0)
+    return ChangeLog(changes, changes[-1]['seq'] if changes else 0, len(changes))
+
+def _log(tenant: storage.Tenant) -> ChangeLog:
+    # The log is written once the data is on disk, so a unit of work's copies are never used
+    return tenant.derived(KIND, (CHANGES_FILE,), lambda: _read_log(tenant))
+
+def current_log() -> ChangeLog:
+    """The current tenant's change log"""
+    return _log(storage.current_tenant())
+
+def get_retention() -> int:
+    """Number of changes to keep in the log"""
+    if has_app_context():
+        return int(current_app.config.get('CHANGES_RETENTION', DEFAULT_RETENTION))
+    return DEFAULT_RETENTION
+
+def record_change(entity: str, entity_id: Optional[str], op: str) -> None:
+    """Record a change once the write that made it has committed; called by write paths after a successful save
+
+    Never raises - a failure to record must not fail the write itself.
+    """
+    try:
+        if entity not in CHANGE_ENTITIES or op not in CHANGE_OPERATIONS:
+            raise ValueError(f"Unknown change {entity}/{op}")
+        entity_id = entity_id or SINGLETON_IDS.get(entity)
+        if not entity_id:
+            raise ValueError(f"Missing id for {entity} change")
+        tenant = storage.current_tenant()
+        storage.after_commit(lambda: _append(tenant, entity, str(entity_id), op))
+    except Exception as e:
+        logger.exception("Error recording change: %s", e)
+
+def _append(tenant: storage.Tenant, entity: str, entity_id: str, op: str) -> None:
+    try:
+        retention = get_retention()
+        with tenant.lock(CHANGES_FILE):
+            log = _log(tenant)
+            change = Change(
+                seq=log.last_seq + 1,
+                entity=entity,
+                entity_id=entity_id,
+                op=op,
+                at=datetime.utcnow().isoformat()
+            )
+            stored = change.to_dict()
+            before = tenant.file_key(CHANGES_FILE)
+            compact = before is None or log.lines + 1 > 2 * retention
+            if compact:
+                kept = log.changes[max(len(log.changes) + 1 - retention, 0):] + [stored]
+                tenant.write(CHANGES_FILE, ''.join(json.dumps(c) + '\n' for c in kept))
+            else:
+                tenant.append(CHANGES_FILE, json.dumps(stored) + '\n')
+            tenant.update_derived(KIND, CHANGES_FILE, before, lambda l: l.add(stored, retention, compact))
+    except Exception as e:
+        logger.exception("Error recording change: %s", e)
+        return
+    # Live subscribers hear about it once it is in the log
+    broker.publish(change.entity, change.entity_id, change.op, change.seq)
+
+def _by_id(entity: str, name: str, load: Callable[[], List[Dict]]) -> Dict[str, Dict]:
+    """Stored records of a collection keyed by id, kept until its document changes"""
+    return storage.derived('records:' + entity, (name,), lambda: {r.get('id'): r for r in load()})
+
+def resolve_records(entity: str, ids: List[str]) -> Dict[str, Any]:
+    """The current state of the given records, keyed by id"""
+    if entity == 'invoice':
+        from app.invoices.routes import INVOICES_FILE, load_invoices
+        records = _by_id(entity, INVOICES_FILE, lambda: load_invoices().get('invoices', []))
+    elif entity == 'estimate':
+        from app.estimates.routes import ESTIMATES_FILE, load_estimates
+        records = _by_id(entity, ESTIMATES_FILE, lambda: load_estimates().get('estimates', []))
+    elif entity == 'transaction':
+        from app.transactions.routes import TRANSACTIONS_FILE, iter_transactions
+        records = _by_id(entity, TRANSACTIONS_FILE, iter_transactions)
+    elif entity == 'account':
+        from app.chart_of_accounts.routes import ACCOUNTS_FILE, load_accounts
+        records = _by_id(entity, ACCOUNTS_FILE, lambda: load_accounts().get('accounts', []))
+    elif entity == 'customer':
+        from app.customers.models import CustomerRepository
+        records = CustomerRepository.current().records
+    elif entity == 'company':
+        from app.company.routes import load_company_data
+        company = load_company_data()
+        return {'company': company} if company else {}
+    elif entity == 'advanced':
+        from app.advanced.routes import load_advanced_data
+        advanced = load_advanced_data()
+        return {'advanced': advanced} if advanced else {}
+    else:
+        return {}
+    return {id: records[id] for id in ids if id in records}
+
+@changes_bp.route('', methods=['GET'])
+def list_changes():
+    """Get records created, updated or deleted after a sequence number"""
+    try:
+        since = int(request.args.get('since', ''))
+        limit = min(int(request.args.get('limit', DEFAULT_LIMIT)), MAX_LIMIT)
+    except ValueError:
+        return jsonify({'error': 'since and limit must be integers'}), 400
+    if since < 0 or limit < 1:
+        return jsonify({'error': 'since must be >= 0 and limit >= 1'}), 400
+
+    entity_filter = request.args.get('entity')
+    if entity_filter and entity_filter not in CHANGE_ENTITIES:
+        return jsonify({'error': f'Unknown entity: {entity_filter}'}), 400
+
+    log = current_log()
+    last_seq = log.last_seq
+    oldest_seq = log.changes[0]['seq'] if log.changes else last_seq + 1
+
+    # The client missed changes that have been truncated, or the log was reset
+    if since < oldest_seq - 1 or since > last_seq:
+        return jsonify({
+            'error': 'Change log no longer covers the requested sequence, reload all data',
+            'reset': True,
+            'oldest_seq': oldest_seq,
+            'last_seq': last_seq
+        }), 410
+
+    pending = log.since(since)
+    has_more = len(pending) > limit
+    pending = [Change.from_dict(c) for c in pending[:limit]]
+    next_seq = pending[-1].seq if pending else since
+
+    # Several changes to one record collapse into the latest
+    latest: Dict[tuple, Change] = {}
+    for change in pending:
+        if entity_filter and change.entity != entity_filter:
+            continue
+        key = (change.entity, change.entity_id)
+        previous = latest.get(key)
+        if previous is not None and previous.op == 'create' and change.op == 'update':
+            # Still new to the client
+            change = Change(change.seq, change.entity, change.entity_id, 'create', change.at)
+        latest[key] = change
+
+    ids_by_entity: Dict[str, List[str]] = {}
+    for change in latest.values():
+        if change.op != 'delete':
+            ids_by_entity.setdefault(change.entity, []).append(change.entity_id)
+    records = {entity: resolve_records(entity, ids) for entity, ids in ids_by_entity.items()}
+
+    result = []
+    for change in sorted(latest.values(), key=lambda c: c.seq):
+        item = change.to_dict()
+        record = records.get(change.entity, {}).get(change.entity_id)
+        if change.op != 'delete' and record is None:
+            # Removed after this change was recorded
+            item['op'] = 'delete'
+        item['record'] = record if item['op'] != 'delete' else None
+        result.append(item)
+
+    return jsonify({
+        'since': since,
+        'last_seq': next_seq,
+        'has_more': has_more,
+        'changes': result
+    }), 200
@@ -2,4 +2,4 @@ from flask import Blueprint
 
 chart_of_accounts_bp = Blueprint('chart_of_accounts', __name__)
 
-from . import routes
+# Routes are attached when app.blueprints imports the routes module
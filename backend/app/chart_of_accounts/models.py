@@ -1,6 +1,9 @@
 from dataclasses import dataclass
 from typing import Optional, Dict, Any
 from datetime import datetime
+from app import money
+from app.instrumentation import timed
+from app.records import RecordView
 
 # Define the valid detail types for each account type
 ACCOUNT_TYPE_DETAILS = {
@@ -199,7 +202,7 @@ NORMAL_BALANCE_TYPES = {
     "Other Expense": "debit"
 }
 
-@dataclass
+@dataclass(slots=True)
 class Account:
     """Represents a Chart of Accounts entry"""
     id: str
@@ -224,6 +227,7 @@ class Account:
             self.currentBalance = self.openingBalance
 
     @classmethod
+    @timed('model')
     def from_dict(cls, data: Dict[str, Any]) -> 'Account':
         """Create an Account instance from a dictionary"""
         # Convert lastTransactionDate if it exists
@@ -247,6 +251,24 @@ class Account:
             isDefault=data.get('isDefault', False)
         )
 
+    @classmethod
+    @timed('model')
+    def from_stored(cls, data: Dict[str, Any]) -> 'Account':
+        """Create an Account from a saved record, which has every key; falls back to from_dict"""
+        try:
+            last_transaction = data['lastTransactionDate']
+            if last_transaction:
+                last_transaction = datetime.fromisoformat(last_transaction.replace('Z', '+00:00'))
+            return cls(
+                data['id'], data['name'], data['accountType'], data['detailType'], data['description'],
+                float(data['openingBalance']), float(data['currentBalance']), float(data['quickbooksBalance']),
+                data['normalBalanceType'], data['parentAccountId'], last_transaction, data['active'],
+                data['isDefault']
+            )
+        except KeyError:
+            return cls.from_dict(data)
+
+    @timed('model')
     def to_dict(self) -> Dict[str, Any]:
         """Convert Account instance to dictionary"""
         return {
@@ -294,12 +316,47 @@ class Account:
         # Calculate balance change
         balance_change = self.calculate_balance_change(amount, type)
         
-        # Update balance and last transaction date
-        self.currentBalance += balance_change
+        # Update balance, added up in cents, and last transaction date
+        self.currentBalance = money.from_cents(money.to_cents(self.currentBalance) + money.to_cents(balance_change))
         self.lastTransactionDate = datetime.utcnow()
         
         return True, None
 
+class AccountView(RecordView):
+    """A stored account whose balance is updated in place"""
+    __slots__ = ()
+    touch = None
+
+    @property
+    def active(self) -> bool:
+        return self.data.get('active', True)
+
+    @property
+    def normalBalanceType(self) -> str:
+        return self.data.get('normalBalanceType') or NORMAL_BALANCE_TYPES.get(self.data.get('accountType'), 'debit')
+
+    # Same rules as Account; they only read active and normalBalanceType
+    validate_transaction = Account.validate_transaction
+    calculate_balance_change = Account.calculate_balance_change
+
+    def update_balance(self, amount: float, type: str) -> tuple[bool, Optional[str]]:
+        """Update account balance based on transaction"""
+        is_valid, error = self.validate_transaction(amount, type)
+        if not is_valid:
+            return False, error
+
+        current = self.data.get('currentBalance')
+        if current is None:
+            current = self.data.get('openingBalance', 0.0)
+        # normalBalanceType is written too, as Account.to_dict would, so update_summary counts the account
+        balance_cents = money.to_cents(current) + money.to_cents(self.calculate_balance_change(amount, type))
+        self.set(
+            currentBalance=money.from_cents(balance_cents),
+            lastTransactionDate=datetime.utcnow().isoformat(),
+            normalBalanceType=self.normalBalanceType
+        )
+        return True, None
+
 @dataclass
 class AccountsSummary:
     """
@@ -312,6 +369,7 @@ class AccountsSummary:
     totalCredit: float = 0.0
 
     @classmethod
+    @timed('model')
     def from_dict(cls, data: Dict[str, Any]) -> 'AccountsSummary':
         """Create an AccountsSummary instance from a dictionary"""
         return cls(
@@ -322,6 +380,7 @@ class AccountsSummary:
             totalCredit=data.get('totalCredit', 0.0)
         )
 
+    @timed('model')
     def to_dict(self) -> Dict[str, Any]:
         """Convert AccountsSummary instance to dictionary"""
         return {
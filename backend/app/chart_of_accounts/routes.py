@@ -1,20 +1,20 @@
 from flask import jsonify, request
-import json
-import os
 from typing import Dict, List, Optional
 import random
+import logging
 from datetime import datetime
 
+from app import money, storage
+from app.changes.routes import record_change
+from app.instrumentation import timed
+from app.precomputed import PrecomputedResponse
 from . import chart_of_accounts_bp
-from .models import Account, AccountsSummary
+from .models import Account, AccountView, AccountsSummary, ACCOUNT_TYPE_DETAILS
 
-# File path handling
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-DATA_DIR = os.path.join(BASE_DIR, 'data')
-ACCOUNTS_FILE = os.path.join(DATA_DIR, 'chart_of_accounts.json')
+logger = logging.getLogger(__name__)
 
-# Ensure data directory exists
-os.makedirs(DATA_DIR, exist_ok=True)
+# File path handling
+ACCOUNTS_FILE = 'chart_of_accounts.json'
 
 def deep_update(original: Dict, update: Dict) -> None:
     """Recursively update nested dictionaries"""
@@ -27,41 +27,41 @@ def deep_update(original: Dict, update: Dict) -> None:
 def load_accounts() -> Dict:
     """Load accounts data from JSON file"""
     try:
-        if os.path.exists(ACCOUNTS_FILE):
-            with open(ACCOUNTS_FILE, 'r') as f:
-                return json.load(f)
+        data = storage.load_json(ACCOUNTS_FILE)
+        if data is not None:
+            return data
     except Exception as e:
-        print(f"Error loading accounts data: {str(e)}")
+        logger.exception("Error loading accounts data: %s", e)
     return {'accounts': [], 'summary': {}}
 
 def save_accounts(data: Dict) -> bool:
     """Save accounts data to JSON file"""
     try:
-        with open(ACCOUNTS_FILE, 'w') as f:
-            json.dump(data, f, indent=2)
+        storage.save_json(ACCOUNTS_FILE, data)
         return True
     except Exception as e:
-        print(f"Error saving accounts data: {str(e)}")
+        logger.exception("Error saving accounts data: %s", e)
         return False
 
+@timed('summary')
 def update_summary(accounts: List[Dict]) -> AccountsSummary:
     """Update accounts summary information"""
     total = len(accounts)
     active = sum(1 for acc in accounts if acc.get('active', True))
     inactive = total - active
     
-    # Calculate total debits and credits based on current balances
-    total_debit = sum(
-        acc.get('currentBalance', 0) 
+    # Calculate total debits and credits based on current balances, added up in cents
+    total_debit = money.from_cents(sum(
+        money.to_cents(acc.get('currentBalance', 0))
         for acc in accounts 
         if acc.get('normalBalanceType') == 'debit' and acc.get('active', True)
-    )
+    ))
     
-    total_credit = sum(
-        acc.get('currentBalance', 0) 
+    total_credit = money.from_cents(sum(
+        money.to_cents(acc.get('currentBalance', 0))
         for acc in accounts 
         if acc.get('normalBalanceType') == 'credit' and acc.get('active', True)
-    )
+    ))
     
     return AccountsSummary(
         totalAccounts=total,
@@ -116,6 +116,7 @@ def create_account():
         # Save updated data
         if not save_accounts(accounts_data):
             return jsonify({'error': 'Failed to save account'}), 500
+        record_change('account', account_dict['id'], 'create')
         
         return jsonify(account_dict), 201
     except ValueError as e:
@@ -170,13 +171,14 @@ def update_account(account_id):
         deep_update(account, update_data)
         
         # Validate updated account
-        Account.from_dict(account)  # This will raise ValueError if invalid
+        Account.from_stored(account)  # This will raise ValueError if invalid
         
         # Save changes
         accounts_data['accounts'] = accounts
         accounts_data['summary'] = update_summary(accounts).to_dict()
         if not save_accounts(accounts_data):
             return jsonify({'error': 'Failed to save account updates'}), 500
+        record_change('account', account_id, 'update')
         
         return jsonify(account), 200
     except ValueError as e:
@@ -219,6 +221,7 @@ def delete_account(account_id):
             'accounts': accounts,
             'summary': summary.to_dict()
         })
+        record_change('account', account_id, 'delete')
         
         return jsonify({
             'message': f'Account {account_id} deleted successfully',
@@ -228,46 +231,31 @@ def delete_account(account_id):
     except Exception as e:
         return jsonify({'message': f'Error deleting account: {str(e)}'}), 500
 
+# Reference data responses, encoded once at import
+ACCOUNT_TYPES_RESPONSE = PrecomputedResponse(list(ACCOUNT_TYPE_DETAILS.keys()))
+DETAIL_TYPES_RESPONSES = {
+    account_type: PrecomputedResponse({'detail_types': detail_types})
+    for account_type, detail_types in ACCOUNT_TYPE_DETAILS.items()
+}
+
 @chart_of_accounts_bp.route('/account_types', methods=['GET'])
 def get_account_types():
     """Get list of all valid account types"""
-    try:
-        from .models import ACCOUNT_TYPE_DETAILS
-        account_types = list(ACCOUNT_TYPE_DETAILS.keys())
-        return jsonify(account_types), 200
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    return ACCOUNT_TYPES_RESPONSE.response()
 
 @chart_of_accounts_bp.route('/detail-types/<account_type>', methods=['GET'])
 def get_detail_types(account_type):
     """Get valid detail types for a given account type"""
-    print(f"Debug: Received request for account type: {account_type}")
-    
-    from .models import ACCOUNT_TYPE_DETAILS
-    print(f"Debug: Available account types: {list(ACCOUNT_TYPE_DETAILS.keys())}")
-    
-    try:
-        if account_type not in ACCOUNT_TYPE_DETAILS:
-            print(f"Debug: Invalid account type: {account_type}")
-            return jsonify({'error': 'Invalid account type'}), 400
-            
-        detail_types = ACCOUNT_TYPE_DETAILS[account_type]
-        print(f"Debug: Found detail types: {detail_types}")
-        return jsonify({'detail_types': detail_types}), 200
-    except Exception as e:
-        print(f"Debug: Error: {str(e)}")
-        return jsonify({'error': str(e)}), 500
+    precomputed = DETAIL_TYPES_RESPONSES.get(account_type)
+    if precomputed is None:
+        return jsonify({'error': 'Invalid account type'}), 400
+    return precomputed.response()
 
 @chart_of_accounts_bp.route('/update-balance/<account_id>', methods=['POST'])
 def update_account_balance(account_id):
     """Update account balance"""
     try:
         data = request.get_json()
-        if not data or 'amount' not in data or 'type' not in data:
-            return jsonify({
-                'message': 'Amount and type are required'
-            }), 400
-
         amount = float(data['amount'])
         type = data['type']
 
@@ -286,16 +274,25 @@ def update_account_balance(account_id):
             return jsonify({'message': 'Account not found'}), 404
             
         # Update balance
-        account = Account.from_dict(accounts[account_index])
+        account = AccountView(accounts[account_index])
+        old_balance = account.data.get('currentBalance') or 0.0
         success, error = account.update_balance(amount, type)
         
         if not success:
             return jsonify({'message': error}), 400
+
+        # Adjust the summary by the change instead of re-adding every account
+        summary = accounts_data.get('summary')
+        if summary and account.active:
+            key = 'totalDebit' if account.normalBalanceType == 'debit' else 'totalCredit'
+            summary[key] = money.from_cents(
+                money.to_cents(summary.get(key, 0.0)) + money.to_cents(account.currentBalance) - money.to_cents(old_balance)
+            )
             
         # Save changes
-        accounts[account_index] = account.to_dict()
-        if not save_accounts({'accounts': accounts}):
+        if not save_accounts(accounts_data):
             return jsonify({'message': 'Failed to save changes'}), 500
+        record_change('account', account_id, 'update')
             
         return jsonify(account.to_dict())
         
@@ -307,11 +304,6 @@ def validate_account_transaction(account_id):
     """Validate if a transaction can be applied to an account"""
     try:
         data = request.get_json()
-        if not data or 'amount' not in data or 'type' not in data:
-            return jsonify({
-                'message': 'Amount and type are required'
-            }), 400
-
         amount = float(data['amount'])
         type = data['type']
 
@@ -320,7 +312,7 @@ def validate_account_transaction(account_id):
         
         # Find account
         account = next(
-            (Account.from_dict(acc) for acc in accounts_data.get('accounts', [])
+            (AccountView(acc) for acc in accounts_data.get('accounts', [])
              if acc['id'] == account_id),
             None
         )
@@ -2,4 +2,4 @@ from flask import Blueprint
 
 company_bp = Blueprint('company', __name__)
 
-from . import routes
+# Routes are attached when app.blueprints imports the routes module
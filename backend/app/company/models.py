@@ -1,5 +1,33 @@
 from dataclasses import dataclass
 from typing import Optional, Dict, Any
+from app.instrumentation import timed
+
+# Company field enums
+COMPANY_ENUMS = {
+    "identity_types": [
+        "SSN",
+        "EIN"
+    ],
+    "tax_forms": [
+        "Sole Proprietor (Form 1040)",
+        "Partnership or limited liability company (Form 1065)",
+        "Small Business corporation, two or more owners (Form 1120S)",
+        "Corporation, one or more shareholders (Form 1120)",
+        "Nonprofit organization (Form 990)",
+        "Limited Liability",
+        "Other (Please specify)"
+    ],
+    "states": [
+        "Alabama", "Alaska", "Arizona", "Arkansas", "California", "Colorado", "Connecticut", 
+        "Delaware", "Florida", "Georgia", "Hawaii", "Idaho", "Illinois", "Indiana", "Iowa", 
+        "Kansas", "Kentucky", "Louisiana", "Maine", "Maryland", "Massachusetts", "Michigan", 
+        "Minnesota", "Mississippi", "Missouri", "Montana", "Nebraska", "Nevada", "New Hampshire", 
+        "New Jersey", "New Mexico", "New York", "North Carolina", "North Dakota", "Ohio", 
+        "Oklahoma", "Oregon", "Pennsylvania", "Rhode Island", "South Carolina", "South Dakota", 
+        "Tennessee", "Texas", "Utah", "Vermont", "Virginia", "Washington", "West Virginia", 
+        "Wisconsin", "Wyoming"
+    ]
+}
 
 @dataclass
 class CompanyNameInfo:
@@ -30,6 +58,7 @@ class Address:
     zip_code: str
     country: str
 
+    @timed('model')
     def to_dict(self) -> Dict[str, Any]:
         """Convert Address instance to dictionary"""
         return {
@@ -41,6 +70,7 @@ class Address:
         }
 
     @classmethod
+    @timed('model')
     def from_dict(cls, data: Dict[str, Any]) -> 'Address':
         """Create an Address instance from a dictionary"""
         return cls(
@@ -57,6 +87,7 @@ class CompanyAddress:
     legal_address: Optional[Address] = None
     same_as_company_address: bool = False
 
+    @timed('model')
     def to_dict(self) -> Dict[str, Any]:
         """Convert CompanyAddress instance to dictionary"""
         result = {
@@ -68,6 +99,7 @@ class CompanyAddress:
         return result
 
     @classmethod
+    @timed('model')
     def from_dict(cls, data: Dict[str, Any]) -> 'CompanyAddress':
         """Create a CompanyAddress instance from a dictionary"""
         company_address = Address.from_dict(data.get('company_address', {}))
@@ -119,6 +151,7 @@ class Company:
             same_as_company_address=True
         )
 
+    @timed('model')
     def to_dict(self) -> Dict[str, Any]:
         """Convert Company instance to dictionary"""
         return {
@@ -144,6 +177,7 @@ class Company:
         }
 
     @classmethod
+    @timed('model')
     def from_dict(cls, data: Dict[str, Any]) -> 'Company':
         """Create a Company instance from a dictionary"""
         company = cls()
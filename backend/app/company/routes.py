@@ -1,102 +1,24 @@
 from flask import jsonify, request
+from app import storage
+from app.changes.routes import record_change
+from app.precomputed import PrecomputedResponse
 from . import company_bp
-import json
-import os
+from .models import COMPANY_ENUMS
 import logging
 from datetime import datetime
-from typing import Dict, Optional
-import re
+from typing import Dict
 
 # Set up logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # File path for storing company data
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-DATA_DIR = os.path.join(BASE_DIR, 'data')
-COMPANY_DATA_FILE = os.path.join(DATA_DIR, 'company.json')
-
-# Ensure data directory exists
-os.makedirs(DATA_DIR, exist_ok=True)
-
-# Company field enums
-COMPANY_ENUMS = {
-    "identity_types": [
-        "SSN",
-        "EIN"
-    ],
-    "tax_forms": [
-        "Sole Proprietor (Form 1040)",
-        "Partnership or limited liability company (Form 1065)",
-        "Small Business corporation, two or more owners (Form 1120S)",
-        "Corporation, one or more shareholders (Form 1120)",
-        "Nonprofit organization (Form 990)",
-        "Limited Liability",
-        "Other (Please specify)"
-    ],
-    "states": [
-        "Alabama", "Alaska", "Arizona", "Arkansas", "California", "Colorado", "Connecticut", 
-        "Delaware", "Florida", "Georgia", "Hawaii", "Idaho", "Illinois", "Indiana", "Iowa", 
-        "Kansas", "Kentucky", "Louisiana", "Maine", "Maryland", "Massachusetts", "Michigan", 
-        "Minnesota", "Mississippi", "Missouri", "Montana", "Nebraska", "Nevada", "New Hampshire", 
-        "New Jersey", "New Mexico", "New York", "North Carolina", "North Dakota", "Ohio", 
-        "Oklahoma", "Oregon", "Pennsylvania", "Rhode Island", "South Carolina", "South Dakota", 
-        "Tennessee", "Texas", "Utah", "Vermont", "Virginia", "Washington", "West Virginia", 
-        "Wisconsin", "Wyoming"
-    ]
-}
-
-# Validation patterns
-PATTERNS = {
-    'tax_id': r'^\d{2}-\d{7}$',
-    'email': r'^[^\s@]+@[^\s@]+\.[^\s@]+$',
-    'phone': r'^\+?[\d\s-]{10,}$',
-    'zip': r'^\d{5}(-\d{4})?$'
-}
-
-def validate_company_data(data: Dict) -> Optional[str]:
-    """Validate company data"""
-    try:
-        # Required fields
-        if not data.get('company_name_info', {}).get('company_name'):
-            return "Company name is required"
-            
-        # Tax ID format
-        tax_id = data.get('company_name_info', {}).get('tax_id')
-        if tax_id and not re.match(PATTERNS['tax_id'], tax_id):
-            return "Tax ID must be in format XX-XXXXXXX"
-            
-        # Email format
-        email = data.get('contact_info', {}).get('company_email')
-        if email and not re.match(PATTERNS['email'], email):
-            return "Invalid email format"
-            
-        # Phone format
-        phone = data.get('contact_info', {}).get('company_phone')
-        if phone and not re.match(PATTERNS['phone'], phone):
-            return "Invalid phone number format"
-            
-        # ZIP code format
-        for address in ['company_address', 'legal_address']:
-            zip_code = data.get('Address', {}).get(address, {}).get('zip_code')
-            if zip_code and not re.match(PATTERNS['zip'], zip_code):
-                return f"Invalid ZIP code format for {address}"
-                
-        return None
-        
-    except Exception as e:
-        logger.error(f"Validation error: {str(e)}")
-        return f"Validation error: {str(e)}"
+COMPANY_DATA_FILE = 'company.json'
+COMPANY_AUDIT_FILE = 'company_audit.json'
 
 def create_audit_log(action: str, data: Dict) -> None:
     """Create an audit log entry"""
     try:
-        audit_file = os.path.join(DATA_DIR, 'company_audit.json')
-        audit_data = []
-        
-        if os.path.exists(audit_file):
-            with open(audit_file, 'r') as f:
-                audit_data = json.load(f)
+        audit_data = storage.load_json(COMPANY_AUDIT_FILE) or []
                 
         log_entry = {
             'timestamp': datetime.utcnow().isoformat(),
@@ -106,8 +28,7 @@ def create_audit_log(action: str, data: Dict) -> None:
         
         audit_data.append(log_entry)
         
-        with open(audit_file, 'w') as f:
-            json.dump(audit_data, f, indent=2)
+        storage.save_json(COMPANY_AUDIT_FILE, audit_data)
             
     except Exception as e:
         logger.error(f"Failed to create audit log: {str(e)}")
@@ -115,62 +36,60 @@ def create_audit_log(action: str, data: Dict) -> None:
 def load_company_data():
     """Load company data from JSON file"""
     try:
-        if os.path.exists(COMPANY_DATA_FILE):
-            with open(COMPANY_DATA_FILE, 'r') as file:
-                data = json.load(file)
-                # If file is empty or just contains {}, return default template
-                if not data:
-                    data = {
-                        "company_name_info": {
-                            "company_name": "",
-                            "legal_name": "",
-                            "same_as_company_name": False,
-                            "identity": "",
-                            "tax_id": ""
+        data = storage.load_json(COMPANY_DATA_FILE)
+        if data is not None:
+            # If file is empty or just contains {}, return default template
+            if not data:
+                data = {
+                    "company_name_info": {
+                        "company_name": "",
+                        "legal_name": "",
+                        "same_as_company_name": False,
+                        "identity": "",
+                        "tax_id": ""
+                    },
+                    "company_type": {
+                        "tax_form": "",
+                        "industry": ""
+                    },
+                    "contact_info": {
+                        "company_email": "",
+                        "customer_facing_email": "",
+                        "same_as_company_email": False,
+                        "company_phone": "",
+                        "website": ""
+                    },
+                    "Address": {
+                        "company_address": {
+                            "street": "",
+                            "city": "",
+                            "state": "",
+                            "zip_code": "",
+                            "country": ""
                         },
-                        "company_type": {
-                            "tax_form": "",
-                            "industry": ""
+                        "legal_address": {
+                            "street": "",
+                            "city": "",
+                            "state": "",
+                            "zip_code": "",
+                            "country": ""
                         },
-                        "contact_info": {
-                            "company_email": "",
-                            "customer_facing_email": "",
-                            "same_as_company_email": False,
-                            "company_phone": "",
-                            "website": ""
-                        },
-                        "Address": {
-                            "company_address": {
-                                "street": "",
-                                "city": "",
-                                "state": "",
-                                "zip_code": "",
-                                "country": ""
-                            },
-                            "legal_address": {
-                                "street": "",
-                                "city": "",
-                                "state": "",
-                                "zip_code": "",
-                                "country": ""
-                            },
-                            "same_as_company_address": False
-                        }
+                        "same_as_company_address": False
                     }
-                    save_company_data(data)
-                return data
+                }
+                save_company_data(data)
+            return data
     except Exception as e:
-        print(f"Error loading company data: {str(e)}")
+        logger.exception("Error loading company data: %s", e)
     return None
 
 def save_company_data(data):
     """Save company data to JSON file"""
     try:
-        with open(COMPANY_DATA_FILE, 'w') as file:
-            json.dump(data, file, indent=4)
+        storage.save_json(COMPANY_DATA_FILE, data, indent=4)
         return True
     except Exception as e:
-        print(f"Error saving company data: {str(e)}")
+        logger.exception("Error saving company data: %s", e)
         return False
 
 def deep_update(original, update):
@@ -222,22 +141,7 @@ def create_company():
                 'message': 'Company already exists'
             }), 409
 
-        # Validate required fields
-        required_fields = ['company_name_info', 'company_type', 'contact_info', 'Address']
-        for field in required_fields:
-            if field not in company_data:
-                return jsonify({
-                    'success': False,
-                    'message': f'Missing required field: {field}'
-                }), 400
-
-        # Validate company data
-        validation_error = validate_company_data(company_data)
-        if validation_error:
-            return jsonify({
-                'success': False,
-                'message': validation_error
-            }), 400
+        # Required sections and field formats are checked against the API spec (app/validation.py)
 
         # Apply boolean logic
         apply_boolean_logic(company_data)
@@ -246,6 +150,7 @@ def create_company():
         if save_company_data(company_data):
             # Create audit log
             create_audit_log('create', company_data)
+            record_change('company', None, 'create')
             
             logger.info(f"Company created successfully")
             return jsonify({
@@ -304,13 +209,6 @@ def update_company():
                 'error': 'Company not found'
             }), 404
 
-        # Validate company data
-        validation_error = validate_company_data(update_data)
-        if validation_error:
-            return jsonify({
-                'error': validation_error
-            }), 400
-
         # Use deep update
         deep_update(existing_company, update_data)
         
@@ -324,6 +222,7 @@ def update_company():
                 'changes': update_data,
                 'timestamp': datetime.utcnow().isoformat()
             })
+            record_change('company', None, 'update')
             
             logger.info(f"Company data updated successfully")
             return jsonify({
@@ -345,12 +244,12 @@ def update_company():
 def delete_company():
     """Delete a company"""
     try:
-        if os.path.exists(COMPANY_DATA_FILE):
+        if storage.exists(COMPANY_DATA_FILE):
             # Write an empty object to the file instead of deleting it
-            with open(COMPANY_DATA_FILE, 'w') as file:
-                json.dump({}, file)
+            storage.save_json(COMPANY_DATA_FILE, {}, indent=None)
             # Create audit log
             create_audit_log('delete', {})
+            record_change('company', None, 'delete')
             
             logger.info(f"Company deleted successfully")
             return jsonify({
@@ -366,7 +265,9 @@ def delete_company():
             'error': str(e)
         }), 500
 
+FIELD_OPTIONS_RESPONSE = PrecomputedResponse(COMPANY_ENUMS)
+
 @company_bp.route('/get_field_options', methods=['GET'])
 def get_field_options():
     """Get available options for company fields"""
-    return jsonify(COMPANY_ENUMS), 200
+    return FIELD_OPTIONS_RESPONSE.response()
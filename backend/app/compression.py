@@ -0,0 +1,238 @@
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Iterable, Iterator, Optional
+
+from flask import Flask, request
+
+# Optional codecs - gzip is always available, zstd and brotli only when installed
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+DEFAULT_MIMETYPES = {
+    'application/json',
+    'application/x-ndjson',
+    'text/csv',
+    'text/html',
+    'text/plain',
+}
+
+class _GzipCodec:
+    """gzip encoder built on zlib so it can also be used incrementally"""
+    name = 'gzip'
+
+    def __init__(self, level: int):
+        self.level = level
+
+    def compressor(self):
+        return zlib.compressobj(self.level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        compressor = self.compressor()
+        return compressor.compress(data) + compressor.flush()
+
+class _BrotliCodec:
+    """Brotli encoder (requires the optional brotli package)"""
+    name = 'br'
+
+    def __init__(self, level: int):
+        self.level = level
+
+    def compressor(self):
+        return _BrotliStream(brotli.Compressor(quality=self.level))
+
+    def compress(self, data: bytes) -> bytes:
+        return brotli.compress(data, quality=self.level)
+
+class _BrotliStream:
+    """Adapt brotli.Compressor to the compress/flush interface used by zlib"""
+
+    def __init__(self, compressor):
+        self._compressor = compressor
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.finish()
+
+class _ZstdCodec:
+    """Zstandard encoder (requires the optional zstandard package)"""
+    name = 'zstd'
+
+    def __init__(self, level: int):
+        self.level = level
+        self._local = threading.local()
+
+    def _context(self):
+        # Compression contexts are not thread safe, keep one per thread
+        context = getattr(self._local, 'context', None)
+        if context is None:
+            context = self._local.context = zstandard.ZstdCompressor(level=self.level)
+        return context
+
+    def compressor(self):
+        return zstandard.ZstdCompressor(level=self.level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._context().compress(data)
+
+class _CompressedCache:
+    """Bounded LRU of compressed bodies keyed by (path, ETag, encoding)"""
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: 'OrderedDict[tuple, bytes]' = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: tuple) -> Optional[bytes]:
+        with self._lock:
+            body = self._entries.get(key)
+            if body is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return body
+
+    def put(self, key: tuple, body: bytes) -> None:
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous)
+            self._entries[key] = body
+            self._size += len(body)
+            while self._entries and (len(self._entries) > self.max_entries or self._size > self.max_bytes):
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+def _iter_compressed(chunks: Iterable, compressor) -> Iterator[bytes]:
+    """Compress a response iterable chunk by chunk without buffering it"""
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            if chunk:
+                data = compressor.compress(chunk)
+                if data:
+                    yield data
+        tail = compressor.flush()
+        if tail:
+            yield tail
+    finally:
+        close = getattr(chunks, 'close', None)
+        if close is not None:
+            close()
+
+class Compress:
+    """Compress responses according to the client's Accept-Encoding header
+
+    Configuration keys (all optional):
+        COMPRESS_ALGORITHMS - server preference order, default zstd, br, gzip
+        COMPRESS_LEVEL      - per algorithm levels, e.g. {'gzip': 6}
+        COMPRESS_MIN_SIZE   - bodies smaller than this are sent as-is
+        COMPRESS_MIMETYPES  - mimetypes eligible for compression
+        COMPRESS_CACHE_SIZE / COMPRESS_CACHE_MAX_BYTES - compressed ETag cache bounds
+    """
+
+    def __init__(self, app: Optional[Flask] = None):
+        self.codecs = {}
+        self.cache: Optional[_CompressedCache] = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app: Flask) -> None:
+        app.config.setdefault('COMPRESS_ALGORITHMS', ['zstd', 'br', 'gzip'])
+        app.config.setdefault('COMPRESS_LEVEL', {'gzip': 6, 'br': 4, 'zstd': 3})
+        app.config.setdefault('COMPRESS_MIN_SIZE', 1024)
+        app.config.setdefault('COMPRESS_MIMETYPES', DEFAULT_MIMETYPES)
+        app.config.setdefault('COMPRESS_CACHE_SIZE', 256)
+        app.config.setdefault('COMPRESS_CACHE_MAX_BYTES', 32 * 1024 * 1024)
+
+        levels = app.config['COMPRESS_LEVEL']
+        available = {
+            'gzip': _GzipCodec,
+            'br': _BrotliCodec if brotli is not None else None,
+            'zstd': _ZstdCodec if zstandard is not None else None,
+        }
+        for name in app.config['COMPRESS_ALGORITHMS']:
+            codec = available.get(name)
+            if codec is not None:
+                self.codecs[name] = codec(levels.get(name, 6))
+
+        self.cache = _CompressedCache(
+            app.config['COMPRESS_CACHE_SIZE'],
+            app.config['COMPRESS_CACHE_MAX_BYTES']
+        )
+        self.min_size = app.config['COMPRESS_MIN_SIZE']
+        self.mimetypes = set(app.config['COMPRESS_MIMETYPES'])
+
+        app.extensions['compress'] = self
+        app.after_request(self.after_request)
+
+    def negotiate(self) -> Optional[str]:
+        """Pick the best encoding both sides support, honouring q-values"""
+        if not self.codecs:
+            return None
+        return request.accept_encodings.best_match(list(self.codecs))
+
+    def after_request(self, response):
+        if response.mimetype not in self.mimetypes:
+            return response
+
+        response.vary.add('Accept-Encoding')
+
+        if (
+            request.method == 'HEAD'
+            or response.status_code < 200
+            or response.status_code in (204, 206, 304)
+            or 'Content-Encoding' in response.headers
+            or response.direct_passthrough
+            or 'no-transform' in response.headers.get('Cache-Control', '')
+        ):
+            return response
+
+        content_length = response.content_length
+        if content_length is not None and content_length < self.min_size:
+            return response
+
+        encoding = self.negotiate()
+        if encoding is None:
+            return response
+        codec = self.codecs[encoding]
+
+        if response.is_streamed:
+            # Generator responses are compressed as they are produced
+            response.response = _iter_compressed(response.response, codec.compressor())
+            response.headers.pop('Content-Length', None)
+        else:
+            etag, _ = response.get_etag()
+            cache_key = (request.path, etag, encoding) if etag else None
+            body = self.cache.get(cache_key) if cache_key else None
+            if body is None:
+                data = response.get_data()
+                if len(data) < self.min_size:
+                    return response
+                body = codec.compress(data)
+                if cache_key:
+                    self.cache.put(cache_key, body)
+            response.set_data(body)
+            if etag:
+                # The compressed representation differs byte-wise from the original
+                response.set_etag(etag, weak=True)
+
+        response.headers['Content-Encoding'] = encoding
+        return response
@@ -1,8 +1,14 @@
+from collections import Counter
+import copy
 from datetime import datetime
-import json
-import os
+import logging
 import random
-from typing import Dict, List, Optional
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from app import storage
+from app.instrumentation import timed
+
+logger = logging.getLogger(__name__)
 
 class Address:
     def __init__(self, street: str, city: str, state: str, postal_code: str, country: str):
@@ -12,6 +18,7 @@ class Address:
         self.postal_code = postal_code
         self.country = country
 
+    @timed('model')
     def to_dict(self) -> Dict:
         return {
             'street': self.street,
@@ -22,6 +29,7 @@ class Address:
         }
 
     @staticmethod
+    @timed('model')
     def from_dict(data: Dict) -> 'Address':
         return Address(
             street=data['street'],
@@ -32,20 +40,19 @@ class Address:
         )
 
 class Customer:
-    BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-    DATA_FILE = os.path.join(BASE_DIR, 'data', 'customers.json')
+    DATA_FILE = 'customers.json'
 
     @staticmethod
     def generate_customer_id() -> str:
         """Generate a random 8-digit ID with a dash in the middle"""
+        repository = CustomerRepository.current()
         while True:
             first_half = str(random.randint(1000, 9999))
             second_half = str(random.randint(1000, 9999))
             id = f"{first_half}-{second_half}"
             
             # Check if ID exists
-            customers = Customer.get_all()
-            if Customer.is_id_unique(id, customers):
+            if id not in repository.by_id:
                 return id
 
     def __init__(self, id: str, customer_no: str, first_name: str, last_name: str, 
@@ -67,6 +74,18 @@ class Customer:
         self.created_at = created_at or datetime.utcnow().isoformat()
         self.updated_at = updated_at or datetime.utcnow().isoformat()
 
+    @property
+    def display_name(self) -> str:
+        return f"{self.first_name} {self.last_name}"
+
+    def labels(self) -> Set[str]:
+        """The names invoices and estimates may refer to this customer by"""
+        labels = {label_key(self.display_name)}
+        if self.company_name:
+            labels.add(label_key(self.company_name))
+        return labels
+
+    @timed('model')
     def to_dict(self) -> Dict:
         return {
             'id': self.id,
@@ -85,6 +104,7 @@ class Customer:
         }
 
     @staticmethod
+    @timed('model')
     def from_dict(data: Dict) -> 'Customer':
         return Customer(
             id=data['id'],
@@ -104,22 +124,14 @@ class Customer:
 
     @classmethod
     def get_all(cls) -> List['Customer']:
-        """Get all customers"""
-        try:
-            if not os.path.exists(cls.DATA_FILE):
-                return []
-            with open(cls.DATA_FILE, 'r') as f:
-                data = json.load(f)
-                return [cls.from_dict(customer_data) for customer_data in data.get('customers', [])]
-        except Exception as e:
-            print(f"Error loading customers: {str(e)}")
-            return []
+        """Get all customers; they are shared with the repository, so change one only through a copy and save()"""
+        return list(CustomerRepository.current().by_id.values())
 
     @classmethod
     def get_by_id(cls, id: str) -> Optional['Customer']:
-        """Get customer by ID"""
-        customers = cls.get_all()
-        return next((customer for customer in customers if customer.id == id), None)
+        """Get customer by ID, as a copy the caller may edit"""
+        customer = CustomerRepository.current().by_id.get(id)
+        return copy.copy(customer) if customer is not None else None
 
     @staticmethod
     def is_id_unique(id: str, customers: List['Customer']) -> bool:
@@ -129,58 +141,159 @@ class Customer:
     @staticmethod
     def exists(first_name: str, last_name: str) -> bool:
         """Check if a customer with the given first and last name exists"""
-        customers = Customer.get_all()
-        return any(
-            c.first_name.lower() == first_name.lower() and 
-            c.last_name.lower() == last_name.lower() 
-            for c in customers
-        )
+        return CustomerRepository.current().names[name_key(first_name, last_name)] > 0
 
     @classmethod
     def get_next_number(cls) -> str:
         """Get next customer number"""
-        try:
-            customers = cls.get_all()
-            if not customers:
-                current_year = datetime.now().year
-                return f"CUST-{current_year}-001"
-
-            # Extract all customer numbers
-            customer_numbers = [c.customer_no for c in customers]
-            
-            # Get the highest number
-            current_year = datetime.now().year
-            current_year_prefix = f"CUST-{current_year}-"
-            current_year_numbers = [int(n.split('-')[2]) for n in customer_numbers if n.startswith(current_year_prefix)]
-            
-            if current_year_numbers:
-                next_number = max(current_year_numbers) + 1
-            else:
-                next_number = 1
-                
-            return f"{current_year_prefix}{next_number:03d}"
-        except Exception as e:
-            print(f"Error generating next customer number: {str(e)}")
-            current_year = datetime.now().year
-            return f"CUST-{current_year}-001"
+        current_year_prefix = f"CUST-{datetime.now().year}-"
+        next_number = CustomerRepository.current().last_number(current_year_prefix) + 1
+        return f"{current_year_prefix}{next_number:03d}"
 
     @classmethod
     def save_all(cls, customers: List['Customer']) -> None:
-        os.makedirs(os.path.dirname(cls.DATA_FILE), exist_ok=True)
-        with open(cls.DATA_FILE, 'w') as f:
-            json.dump({"customers": [c.to_dict() for c in customers]}, f, indent=2)
+        storage.save_json(cls.DATA_FILE, {"customers": [c.to_dict() for c in customers]})
+        CustomerRepository.forget()
 
     def save(self) -> None:
-        customers = self.get_all()
-        existing_customer = next((c for c in customers if c.id == self.id), None)
-        
-        if existing_customer:
-            customers.remove(existing_customer)
-        
-        customers.append(self)
-        self.save_all(customers)
+        CustomerRepository.current().save(self)
 
     def delete(self) -> None:
-        customers = self.get_all()
-        customers = [c for c in customers if c.id != self.id]
-        self.save_all(customers)
+        CustomerRepository.current().delete(self.id)
+
+def name_key(first_name: str, last_name: str) -> Tuple[str, str]:
+    return first_name.lower(), last_name.lower()
+
+def label_key(text: str) -> str:
+    """Free-text customer name as compared against customers: lowercased, with single spaces"""
+    return ' '.join(text.lower().split())
+
+def split_number(customer_no: str) -> Tuple[str, Optional[int]]:
+    """CUST-2024-007 as ('CUST-2024-', 7); the number is None when it is not one"""
+    prefix, _, number = customer_no.rpartition('-')
+    try:
+        return prefix + '-', int(number)
+    except ValueError:
+        return customer_no, None
+
+class CustomerRepository:
+    """Every stored customer, built once and indexed by id, customer number and name
+
+    The repository is kept on the tenant as a derived object of
+    customers.json (see storage.Tenant), so lookups and creates do not parse
+    the file or rebuild any customer. A save or delete serializes only the
+    customer it changes and passes the change as an update.
+    """
+
+    KIND = 'customers'
+
+    def __init__(self, records: List[Dict]):
+        # Stored dicts in file order, reused as they are when the file is rewritten
+        self.records: Dict[str, Dict] = {}
+        self.by_id: Dict[str, Customer] = {}
+        self.by_number: Dict[str, Customer] = {}
+        self.names: Counter = Counter()
+        # Lowercased "first last" and company name -> ids of the customers known by it
+        self.by_label: Dict[str, Set[str]] = {}
+        # Customer number prefix -> highest number in use, computed when first asked for
+        self._last_numbers: Dict[str, int] = {}
+        for record in records:
+            self._put(record, Customer.from_dict(record))
+
+    def _put(self, record: Dict, customer: Customer) -> None:
+        previous = self.by_id.get(customer.id)
+        if previous is not None:
+            self._drop(customer.id, renumbered=previous.customer_no != customer.customer_no)
+        self.records[customer.id] = record
+        self.by_id[customer.id] = customer
+        self.by_number[customer.customer_no] = customer
+        self.names[name_key(customer.first_name, customer.last_name)] += 1
+        for label in customer.labels():
+            self.by_label.setdefault(label, set()).add(customer.id)
+        prefix, number = split_number(customer.customer_no)
+        if number is not None and prefix in self._last_numbers:
+            self._last_numbers[prefix] = max(self._last_numbers[prefix], number)
+
+    def _drop(self, id: str, renumbered: bool = True) -> None:
+        customer = self.by_id.pop(id, None)
+        if customer is None:
+            return
+        del self.records[id]
+        if self.by_number.get(customer.customer_no) is customer:
+            del self.by_number[customer.customer_no]
+        key = name_key(customer.first_name, customer.last_name)
+        self.names[key] -= 1
+        if not self.names[key]:
+            del self.names[key]
+        for label in customer.labels():
+            ids = self.by_label.get(label)
+            if ids is not None:
+                ids.discard(id)
+                if not ids:
+                    del self.by_label[label]
+        prefix, number = split_number(customer.customer_no)
+        if renumbered and number is not None and self._last_numbers.get(prefix) == number:
+            # The highest number is gone; work it out again when next asked for
+            del self._last_numbers[prefix]
+
+    def copy(self) -> 'CustomerRepository':
+        repository = CustomerRepository([])
+        repository.records = dict(self.records)
+        repository.by_id = dict(self.by_id)
+        repository.by_number = dict(self.by_number)
+        repository.names = Counter(self.names)
+        repository.by_label = {label: set(ids) for label, ids in self.by_label.items()}
+        repository._last_numbers = dict(self._last_numbers)
+        return repository
+
+    def resolve(self, name: str) -> Optional[Customer]:
+        """The one customer whose full or company name is the given text, or None when none or several are"""
+        ids = self.by_label.get(label_key(name or ''))
+        if ids is None or len(ids) != 1:
+            return None
+        return self.by_id[next(iter(ids))]
+
+    def last_number(self, prefix: str) -> int:
+        """The highest customer number in use under a prefix such as CUST-2024-, or 0"""
+        if prefix not in self._last_numbers:
+            self._last_numbers[prefix] = max(
+                (n for p, n in map(split_number, list(self.by_number)) if p == prefix and n is not None), default=0
+            )
+        return self._last_numbers[prefix]
+
+    def save(self, customer: Customer) -> None:
+        """Write a new or changed customer"""
+        record = customer.to_dict()
+        stored = copy.copy(customer)
+        records = dict(self.records)
+        records[customer.id] = record
+        self._write(records.values(), lambda repository: repository._put(record, stored))
+
+    def delete(self, id: str) -> None:
+        records = dict(self.records)
+        records.pop(id, None)
+        self._write(records.values(), lambda repository: repository._drop(id))
+
+    def _write(self, records: Iterable[Dict], change: Callable[['CustomerRepository'], None]) -> None:
+        saved = storage.before_save(self.KIND, Customer.DATA_FILE)
+        storage.save_json(Customer.DATA_FILE, {"customers": list(records)})
+        saved(change)
+
+    @classmethod
+    def current(cls) -> 'CustomerRepository':
+        """The current tenant's customers"""
+        return storage.derived(cls.KIND, (Customer.DATA_FILE,), lambda: cls(cls._load()))
+
+    @classmethod
+    def forget(cls) -> None:
+        """Drop the current tenant's repository, so the next use reloads it"""
+        storage.forget_derived(cls.KIND)
+
+    @staticmethod
+    def _load() -> List[Dict]:
+        try:
+            data = storage.load_json(Customer.DATA_FILE)
+            return data.get('customers', []) if data is not None else []
+        except Exception as e:
+            logger.exception("Error loading customers: %s", e)
+            return []
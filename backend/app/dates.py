@@ -0,0 +1,70 @@
+"""Business dates and their day ordinals
+
+Invoice, due, estimate, transaction and payment dates are stored as
+YYYY-MM-DD whatever form they arrived in. Each is saved with its day number
+(date.toordinal()) beside it under <field>_ordinal. Filters, sorting and
+status checks compare those integers, so no record's date gets parsed.
+Records saved before ordinals existed have none, and day_of derives one.
+"""
+from datetime import date, datetime
+from typing import Any, Dict, Optional, Tuple
+
+SUFFIX = '_ordinal'
+
+def parse_day(value: Any) -> Optional[date]:
+    """The calendar day of a date, datetime or ISO 8601 string, or None when empty
+
+    Any time of day and UTC offset are dropped: 2024-03-01T23:30:00-05:00
+    is 2024-03-01, the day as written.
+    """
+    if value is None or value == '':
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if isinstance(value, str) and (len(value) == 10 or (len(value) > 10 and value[10] in 'T ')):
+        try:
+            return date.fromisoformat(value[:10])
+        except ValueError:
+            pass
+    raise ValueError(f'{value!r} is not a valid date')
+
+def normalize(value: Any) -> Tuple[Any, Optional[int]]:
+    """A date as (YYYY-MM-DD, ordinal); empty values come back unchanged with no ordinal"""
+    day = parse_day(value)
+    if day is None:
+        return value, None
+    return day.isoformat(), day.toordinal()
+
+def stamp(record: Dict[str, Any], *fields: str) -> None:
+    """Normalize the given date fields of a record in place and write their ordinals"""
+    for field in fields:
+        if field in record:
+            record[field], record[field + SUFFIX] = normalize(record[field])
+
+def day_of(record: Dict[str, Any], field: str) -> Optional[int]:
+    """The stored ordinal of a date field, derived from the date for records saved without one"""
+    ordinal = record.get(field + SUFFIX)
+    if ordinal is None and record.get(field):
+        try:
+            ordinal = parse_day(record[field]).toordinal()
+        except ValueError:
+            return None
+    return ordinal
+
+def to_ordinal(value: Any) -> Optional[int]:
+    """The ordinal of a single value, e.g. a query string bound, or None when empty"""
+    day = parse_day(value)
+    return day.toordinal() if day else None
+
+def today() -> int:
+    return datetime.utcnow().date().toordinal()
+
+def in_range(ordinal: Optional[int], start: Optional[int], end: Optional[int]) -> bool:
+    """Whether a day falls within inclusive bounds, either of which may be open"""
+    if start is not None and (ordinal is None or ordinal < start):
+        return False
+    if end is not None and (ordinal is None or ordinal > end):
+        return False
+    return True
@@ -1,6 +1,8 @@
 from dataclasses import dataclass
 from typing import Optional, Dict, Any, List
 from datetime import datetime
+from app import dates, money
+from app.instrumentation import timed
 
 # Define valid estimate statuses
 ESTIMATE_STATUSES = ["Draft", "Sent", "Accepted", "Declined"]
@@ -13,6 +15,7 @@ class Product:
     price: float
 
     @classmethod
+    @timed('model')
     def from_dict(cls, data: Dict[str, Any]) -> 'Product':
         """Create a Product instance from a dictionary"""
         return cls(
@@ -21,6 +24,7 @@ class Product:
             price=float(data.get('price', 0.0))
         )
 
+    @timed('model')
     def to_dict(self) -> Dict[str, Any]:
         """Convert Product instance to dictionary"""
         return {
@@ -43,38 +47,56 @@ class Estimate:
     accepted_date: Optional[str]
     created_at: str
     updated_at: str
+    estimate_date_ordinal: Optional[int] = None  # Day number of estimate_date; see app/dates.py
+    total_amount_cents: Optional[int] = None  # total_amount in cents; see app/money.py
+    customer_id: Optional[str] = None  # Customer the estimate is for, when linked; see app/receivables.py
+
+    def __post_init__(self):
+        """Normalize the estimate date and round the total to cents"""
+        if self.estimate_date_ordinal is None:
+            self.estimate_date, self.estimate_date_ordinal = dates.normalize(self.estimate_date)
+        if self.total_amount_cents is None:
+            self.total_amount_cents = money.to_cents(self.total_amount)
+            self.total_amount = money.from_cents(self.total_amount_cents)
 
     @classmethod
+    @timed('model')
     def from_dict(cls, data: Dict[str, Any]) -> 'Estimate':
         """Create an Estimate instance from a dictionary"""
         now = datetime.utcnow().isoformat()
         products = [Product.from_dict(p) for p in data.get('products', [])]
-        total_amount = sum(product.price for product in products)
+        total_cents = sum(money.to_cents(product.price) for product in products)
         
         return cls(
             id=data.get('id', ''),
             estimate_no=data.get('estimate_no', ''),
             estimate_date=data.get('estimate_date', ''),
             customer_name=data.get('customer_name', ''),
+            customer_id=data.get('customer_id'),
             status=data.get('status', 'Draft'),
             products=products,
-            total_amount=total_amount,
+            total_amount=money.from_cents(total_cents),
+            total_amount_cents=total_cents,
             accepted_by=data.get('accepted_by'),
             accepted_date=data.get('accepted_date'),
             created_at=data.get('created_at', now),
             updated_at=data.get('updated_at', now)
         )
 
+    @timed('model')
     def to_dict(self) -> Dict[str, Any]:
         """Convert Estimate instance to dictionary"""
         data = {
             'id': self.id,
             'estimate_no': self.estimate_no,
             'estimate_date': self.estimate_date,
+            'estimate_date_ordinal': self.estimate_date_ordinal,
             'customer_name': self.customer_name,
+            'customer_id': self.customer_id,
             'status': self.status,
             'products': [p.to_dict() for p in self.products],
             'total_amount': self.total_amount,
+            'total_amount_cents': self.total_amount_cents,
             'created_at': self.created_at,
             'updated_at': self.updated_at
         }
@@ -90,6 +112,7 @@ class EstimatesSummary:
     total_count: int = 0
     total_amount: float = 0.0
     
+    @timed('model')
     def to_dict(self) -> Dict[str, Any]:
         """Convert EstimatesSummary instance to dictionary"""
         return {
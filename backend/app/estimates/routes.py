@@ -1,29 +1,24 @@
 from flask import jsonify, request
-import json
-import os
-from typing import Dict, List, Optional
-import uuid
+from typing import Callable, Dict, List, Optional
 from datetime import datetime
+import logging
 import random
-import sys
 
-from . import estimates_bp
-from .models import Estimate, EstimatesSummary, Product, ESTIMATE_STATUSES
-
-# Add path to allow importing from sibling packages
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from invoices.routes import (
+from app import dates, money, receivables, storage
+from app.changes.routes import record_change
+from app.instrumentation import timed
+from app.invoices.routes import (
     load_invoices, save_invoices, get_next_invoice_number,
     generate_invoice_id, update_summary as update_invoice_summary
 )
+from app.precomputed import PrecomputedResponse
+from . import estimates_bp
+from .models import Estimate, EstimatesSummary, Product, ESTIMATE_STATUSES
 
-# File path handling
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-DATA_DIR = os.path.join(BASE_DIR, 'data')
-ESTIMATES_FILE = os.path.join(DATA_DIR, 'estimates.json')
+logger = logging.getLogger(__name__)
 
-# Ensure data directory exists
-os.makedirs(DATA_DIR, exist_ok=True)
+# File path handling
+ESTIMATES_FILE = 'estimates.json'
 
 def deep_update(original: Dict, update: Dict) -> None:
     """Recursively update nested dictionaries"""
@@ -36,28 +31,35 @@ def deep_update(original: Dict, update: Dict) -> None:
 def load_estimates() -> Dict:
     """Load estimates data from JSON file"""
     try:
-        if os.path.exists(ESTIMATES_FILE):
-            with open(ESTIMATES_FILE, 'r') as f:
-                return json.load(f)
+        data = storage.load_json(ESTIMATES_FILE)
+        if data is not None:
+            return data
     except Exception as e:
-        print(f"Error loading estimates data: {str(e)}")
+        logger.exception("Error loading estimates data: %s", e)
     return {'estimates': [], 'summary': {}}
 
-def save_estimates(data: Dict) -> bool:
-    """Save estimates data to JSON file"""
+def save_estimates(data: Dict, receivables_update: Optional[Callable[[receivables.Receivables], None]] = None) -> bool:
+    """Save estimates data to JSON file
+
+    receivables_update, when given, brings the customer index in line with
+    this save; without it the index is rebuilt the next time it is used.
+    """
     try:
-        with open(ESTIMATES_FILE, 'w') as f:
-            json.dump(data, f, indent=2)
+        saved = storage.before_save(receivables.KIND, ESTIMATES_FILE)
+        storage.save_json(ESTIMATES_FILE, data)
+        if receivables_update is not None:
+            saved(receivables_update)
         return True
     except Exception as e:
-        print(f"Error saving estimates data: {str(e)}")
+        logger.exception("Error saving estimates data: %s", e)
         return False
 
+@timed('summary')
 def update_summary(estimates: List[Dict]) -> EstimatesSummary:
     """Update estimates summary information"""
     summary = EstimatesSummary()
     summary.total_count = len(estimates)
-    summary.total_amount = sum(float(est.get('total_amount', 0)) for est in estimates)
+    summary.total_amount = money.from_cents(sum(money.cents_of(est, 'total_amount') for est in estimates))
     return summary
 
 def get_next_estimate_number() -> str:
@@ -96,10 +98,12 @@ def calculate_due_date(invoice_date, payment_terms):
     return invoice_date  # For now, just return same date for due_on_receipt
 
 # Interface Routes
+STATUS_TYPES_RESPONSE = PrecomputedResponse(ESTIMATE_STATUSES)
+
 @estimates_bp.route('/status_types', methods=['GET'])
 def get_status_types():
     """Get all valid estimate status types"""
-    return jsonify(ESTIMATE_STATUSES)
+    return STATUS_TYPES_RESPONSE.response()
 
 @estimates_bp.route('/next_number', methods=['GET'])
 def get_next_number():
@@ -111,21 +115,8 @@ def get_next_number():
 def create_estimate():
     """Create a new estimate"""
     try:
+        # Required fields and products are checked against the API spec (app/validation.py)
         data = request.get_json()
-        
-        # Validate required fields
-        required_fields = ['customer_name', 'estimate_date', 'products', 'status']
-        for field in required_fields:
-            if field not in data:
-                return jsonify({'error': f'Missing required field: {field}'}), 400
-
-        # Validate products
-        if not isinstance(data['products'], list):
-            return jsonify({'error': 'Products must be a list'}), 400
-        
-        for product in data['products']:
-            if not all(key in product for key in ['name', 'description', 'price']):
-                return jsonify({'error': 'Each product must have name, description, and price'}), 400
 
         # Generate unique ID
         data_store = load_estimates()
@@ -139,16 +130,21 @@ def create_estimate():
         # Set estimate number
         data['estimate_no'] = get_next_estimate_number()
         data['id'] = new_id
+        error = receivables.link_customer(data)
+        if error:
+            return jsonify({'error': error}), 400
 
         # Create estimate instance
         estimate = Estimate.from_dict(data)
         
         # Add to storage
-        estimates.append(estimate.to_dict())
+        stored = estimate.to_dict()
+        estimates.append(stored)
         data_store['estimates'] = estimates
         data_store['summary'] = update_summary(estimates).to_dict()
         
-        if save_estimates(data_store):
+        if save_estimates(data_store, lambda r: r.put_estimate(stored)):
+            record_change('estimate', new_id, 'create')
             return jsonify(estimate.to_dict()), 201
         else:
             return jsonify({'error': 'Failed to save estimate'}), 500
@@ -167,8 +163,11 @@ def list_estimates():
         # Apply filters
         status = request.args.get('status')
         search = request.args.get('search', '').lower()
-        date_from = request.args.get('date_from')
-        date_to = request.args.get('date_to')
+        try:
+            date_from = dates.to_ordinal(request.args.get('date_from'))
+            date_to = dates.to_ordinal(request.args.get('date_to'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
         filtered_estimates = estimates
         
@@ -182,16 +181,10 @@ def list_estimates():
                    search in est['estimate_no'].lower()
             ]
             
-        if date_from:
-            filtered_estimates = [
-                est for est in filtered_estimates
-                if est['estimate_date'] >= date_from
-            ]
-            
-        if date_to:
+        if date_from is not None or date_to is not None:
             filtered_estimates = [
                 est for est in filtered_estimates
-                if est['estimate_date'] <= date_to
+                if dates.in_range(dates.day_of(est, 'estimate_date'), date_from, date_to)
             ]
         
         # Update summary for filtered results
@@ -225,16 +218,8 @@ def get_estimate(id):
 def update_estimate(id):
     """Update an estimate"""
     try:
+        # Products, when given, are checked against the API spec (app/validation.py)
         update_data = request.get_json()
-        
-        # Validate products if provided
-        if 'products' in update_data:
-            if not isinstance(update_data['products'], list):
-                return jsonify({'error': 'Products must be a list'}), 400
-            
-            for product in update_data['products']:
-                if not all(key in product for key in ['name', 'description', 'price']):
-                    return jsonify({'error': 'Each product must have name, description, and price'}), 400
 
         # Load current data
         data_store = load_estimates()
@@ -251,6 +236,17 @@ def update_estimate(id):
 
         # Create updated estimate
         current_estimate = estimates[estimate_index]
+
+        # A new customer id or name is linked afresh
+        if 'customer_id' in update_data or 'customer_name' in update_data:
+            customer = {
+                'customer_id': update_data.get('customer_id'),
+                'customer_name': update_data.get('customer_name', current_estimate.get('customer_name'))
+            }
+            error = receivables.link_customer(customer)
+            if error:
+                return jsonify({'error': error}), 400
+            update_data.update(customer)
         
         # If products are being updated, replace the entire products list
         if 'products' in update_data:
@@ -261,9 +257,6 @@ def update_estimate(id):
         # Update other fields
         current_estimate.update(update_data)
         
-        # Calculate total amount
-        current_estimate['total_amount'] = sum(float(product.get('price', 0)) for product in current_estimate['products'])
-        
         # Update timestamp
         current_estimate['updated_at'] = datetime.utcnow().isoformat()
         
@@ -271,11 +264,12 @@ def update_estimate(id):
         updated_estimate = Estimate.from_dict(current_estimate)
         
         # Save changes
-        estimates[estimate_index] = updated_estimate.to_dict()
+        stored = estimates[estimate_index] = updated_estimate.to_dict()
         data_store['estimates'] = estimates
         data_store['summary'] = update_summary(estimates).to_dict()
         
-        if save_estimates(data_store):
+        if save_estimates(data_store, lambda r: r.put_estimate(stored)):
+            record_change('estimate', id, 'update')
             return jsonify(updated_estimate.to_dict())
         else:
             return jsonify({'error': 'Failed to save changes'}), 500
@@ -301,7 +295,8 @@ def delete_estimate(id):
         data_store['estimates'] = estimates
         data_store['summary'] = update_summary(estimates).to_dict()
         
-        if save_estimates(data_store):
+        if save_estimates(data_store, lambda r: r.remove_estimate(id)):
+            record_change('estimate', id, 'delete')
             return '', 204
         else:
             return jsonify({'error': 'Failed to save changes'}), 500
@@ -344,6 +339,7 @@ def convert_to_invoice(id):
             "invoice_date": invoice_date,
             "due_date": calculate_due_date(invoice_date, payment_terms),
             "customer_name": estimate['customer_name'],
+            "customer_id": estimate.get('customer_id'),
             "status": "draft",
             "products": estimate['products'],
             "total_amount": float(estimate['total_amount']),
@@ -365,11 +361,13 @@ def convert_to_invoice(id):
             "invoice_no": new_invoice['invoice_no'],
             "conversion_date": datetime.now().isoformat()
         }
+        dates.stamp(new_invoice, 'invoice_date', 'due_date')
+        money.stamp(new_invoice, 'total_amount', 'balance_due')
         estimate['status'] = 'accepted'
         estimate['updated_at'] = datetime.now().isoformat()
         
         # Save estimate changes
-        save_estimates(estimates_data)
+        save_estimates(estimates_data, lambda r: r.put_estimate(estimate))
         
         # Add invoice to invoices.json
         invoices_data = load_invoices()
@@ -377,7 +375,9 @@ def convert_to_invoice(id):
         invoices.append(new_invoice)
         invoices_data['invoices'] = invoices
         invoices_data['summary'] = update_invoice_summary(invoices).to_dict()
-        save_invoices(invoices_data)
+        save_invoices(invoices_data, lambda r: r.put_invoice(new_invoice))
+        record_change('estimate', id, 'update')
+        record_change('invoice', new_invoice['id'], 'create')
         
         return jsonify({
             "message": "Estimate converted to invoice successfully",
@@ -385,5 +385,5 @@ def convert_to_invoice(id):
         }), 200
         
     except Exception as e:
-        print(f"Error converting estimate to invoice: {str(e)}")
+        logger.exception("Error converting estimate to invoice: %s", e)
         return jsonify({"error": "Failed to convert estimate"}), 500
@@ -0,0 +1,5 @@
+from flask import Blueprint
+
+events_bp = Blueprint('events', __name__)
+
+# Routes are attached when app.blueprints imports the routes module
@@ -0,0 +1,258 @@
+import json
+import logging
+import threading
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from app import storage
+
+logger = logging.getLogger(__name__)
+
+# Topics a client can subscribe to, and the change feed entities that affect them
+TOPIC_SOURCES = {
+    'invoice_summary': 'invoice',
+    'customer_summary': 'customer',
+    'account_balance': 'account',
+    'transaction': 'transaction'
+}
+EVENT_TOPICS = list(TOPIC_SOURCES)
+
+DEFAULT_WINDOW = 0.25
+# New transactions held for a slow client before the oldest are dropped
+MAX_PENDING_TRANSACTIONS = 200
+
+class Message:
+    """An event shared by every subscriber, encoded once on first send"""
+    __slots__ = ('topic', 'seq', 'payload', '_encoded')
+
+    def __init__(self, topic: str, seq: int, payload: Dict):
+        self.topic = topic
+        self.seq = seq
+        self.payload = payload
+        self._encoded: Optional[str] = None
+
+    def encode(self) -> str:
+        if self._encoded is None:
+            data = json.dumps(self.payload, separators=(',', ':'))
+            self._encoded = f'id: {self.seq}\nevent: {self.topic}\ndata: {data}\n\n'
+        return self._encoded
+
+def merge_transactions(previous: Message, message: Message) -> Message:
+    """Combine two undelivered transaction messages into one"""
+    transactions = previous.payload['transactions'] + message.payload['transactions']
+    payload = {'transactions': transactions[-MAX_PENDING_TRANSACTIONS:]}
+    if len(transactions) > MAX_PENDING_TRANSACTIONS or previous.payload.get('truncated'):
+        payload['truncated'] = True
+    return Message(message.topic, message.seq, payload)
+
+class Subscription:
+    """A connected client and the latest undelivered message per topic
+
+    Messages that pile up while the client is slow are coalesced, so a
+    client never has more than one message per topic waiting.
+    """
+
+    def __init__(self, topics: Iterable[str], tenant_id: Optional[str] = None):
+        self.topics = frozenset(topics)
+        self.tenant_id = tenant_id
+        self._pending: Dict[str, Message] = {}
+        self._ready = threading.Condition()
+
+    def offer(self, messages: List[Message]) -> None:
+        with self._ready:
+            for message in messages:
+                if message.topic not in self.topics:
+                    continue
+                previous = self._pending.get(message.topic)
+                if previous is not None and message.topic == 'transaction':
+                    message = merge_transactions(previous, message)
+                self._pending[message.topic] = message
+            if self._pending:
+                self._ready.notify()
+
+    def wait(self, timeout: float) -> List[Message]:
+        """Block until messages are available or the timeout passes"""
+        with self._ready:
+            if not self._pending:
+                self._ready.wait(timeout)
+            messages = sorted(self._pending.values(), key=lambda m: m.seq)
+            self._pending = {}
+        return messages
+
+def build_message(topic: str, ids: Optional[Set[str]], seq: int) -> Optional[Message]:
+    """Load the current state behind a topic; ids limits it to changed records"""
+    if topic == 'invoice_summary':
+        from app.invoices.routes import load_invoices, update_summary
+        invoices = load_invoices().get('invoices', [])
+        return Message(topic, seq, update_summary(invoices).to_dict())
+    if topic == 'customer_summary':
+        from app.customers.routes import build_customer_summary
+        return Message(topic, seq, build_customer_summary())
+    if topic == 'account_balance':
+        from app.chart_of_accounts.routes import load_accounts
+        data = load_accounts()
+        accounts = data.get('accounts', [])
+        if ids is not None:
+            accounts = [a for a in accounts if a.get('id') in ids]
+        payload = {'accounts': accounts, 'summary': data.get('summary', {})}
+        if ids is not None:
+            payload['deleted'] = sorted(ids - {a.get('id') for a in accounts})
+        return Message(topic, seq, payload)
+    if topic == 'transaction':
+        if not ids:
+            return None
+        from app.changes.routes import resolve_records
+        records = resolve_records('transaction', list(ids))
+        if not records:
+            return None
+        return Message(topic, seq, {'transactions': list(records.values())})
+    return None
+
+class _Channel:
+    """Subscribers, pending changes and cached snapshots of one tenant"""
+
+    def __init__(self, tenant: storage.Tenant, seq: int):
+        self.tenant = tenant
+        self.subscribers: Set[Subscription] = set()
+        self.changes: Dict[Tuple[str, str], str] = {}
+        self.snapshots: Dict[str, Message] = {}
+        self.seq = seq
+        self.version = 0
+
+class EventBroker:
+    """Turn committed writes into coalesced server-sent events
+
+    Changes arriving within the coalescing window are flushed together:
+    each affected topic is loaded from disk once per tenant and the
+    resulting message is handed to every subscriber of that tenant.
+    Nothing is tracked for tenants without a connected client.
+    """
+
+    def __init__(self, window: float = DEFAULT_WINDOW):
+        self.window = window
+        self._lock = threading.Lock()
+        self._channels: Dict[Optional[str], _Channel] = {}
+        self._timer: Optional[threading.Timer] = None
+
+    @property
+    def subscriber_count(self) -> int:
+        return sum(len(c.subscribers) for c in list(self._channels.values()))
+
+    def subscribe(self, topics: Iterable[str]) -> Subscription:
+        """Subscribe to the current tenant's events"""
+        tenant = storage.current_tenant()
+        subscription = Subscription(topics, tenant.id)
+        with self._lock:
+            channel = self._channels.get(tenant.id)
+        seq = 0
+        if channel is None:
+            # Event ids continue from the tenant's change feed
+            from app.changes.routes import current_log
+            seq = current_log().last_seq
+        with self._lock:
+            channel = self._channels.get(tenant.id)
+            if channel is None:
+                channel = self._channels[tenant.id] = _Channel(tenant, seq)
+            channel.subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            channel = self._channels.get(subscription.tenant_id)
+            if channel is None:
+                return
+            channel.subscribers.discard(subscription)
+            if not channel.subscribers:
+                del self._channels[subscription.tenant_id]
+
+    def publish(self, entity: str, entity_id: str, op: str, seq: int) -> None:
+        """Queue a change committed for the current tenant for the next flush"""
+        with self._lock:
+            channel = self._channels.get(storage.current_tenant().id)
+            if channel is None:
+                return
+            channel.seq = max(channel.seq, seq)
+            channel.version += 1
+            for topic, source in TOPIC_SOURCES.items():
+                if source == entity:
+                    channel.snapshots.pop(topic, None)
+            key = (entity, entity_id)
+            if channel.changes.get(key) != 'create':
+                channel.changes[key] = op
+            if self._timer is None:
+                self._timer = threading.Timer(self.window, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self) -> None:
+        """Build one message per affected topic and deliver it to every subscriber"""
+        with self._lock:
+            self._timer = None
+            work = []
+            for channel in self._channels.values():
+                if channel.changes:
+                    work.append((channel, channel.changes, channel.seq, channel.version, list(channel.subscribers)))
+                    channel.changes = {}
+
+        for channel, changes, seq, version, subscribers in work:
+            with storage.use_tenant(channel.tenant):
+                messages = self._build(changes, seq, subscribers)
+            with self._lock:
+                if channel.version == version:
+                    for message in messages:
+                        if message.topic in ('invoice_summary', 'customer_summary'):
+                            channel.snapshots[message.topic] = message
+            for subscription in subscribers:
+                subscription.offer(messages)
+
+    @staticmethod
+    def _build(changes: Dict[Tuple[str, str], str], seq: int, subscribers: List[Subscription]) -> List[Message]:
+        wanted = set()
+        for subscription in subscribers:
+            wanted |= subscription.topics
+
+        messages = []
+        for topic in EVENT_TOPICS:
+            if topic not in wanted:
+                continue
+            source = TOPIC_SOURCES[topic]
+            if topic == 'transaction':
+                ids = {i for (e, i), op in changes.items() if e == source and op == 'create'}
+            else:
+                ids = {i for (e, i) in changes if e == source}
+            if not ids:
+                continue
+            if topic in ('invoice_summary', 'customer_summary'):
+                ids = None
+            try:
+                message = build_message(topic, ids, seq)
+            except Exception as e:
+                logger.exception("Error building %s event: %s", topic, e)
+                continue
+            if message is not None:
+                messages.append(message)
+        return messages
+
+    def snapshot(self, topics: Iterable[str]) -> List[Message]:
+        """Current state of each topic for a newly connected client of the current tenant"""
+        tenant_id = storage.current_tenant().id
+        messages = []
+        for topic in topics:
+            if topic == 'transaction':
+                continue
+            with self._lock:
+                channel = self._channels.get(tenant_id)
+                if channel is None:
+                    return messages
+                message = channel.snapshots.get(topic)
+                seq, version = channel.seq, channel.version
+            if message is None:
+                message = build_message(topic, None, seq)
+                with self._lock:
+                    # Only cache it if no write landed while it was being built
+                    if message is not None and channel.version == version:
+                        channel.snapshots[topic] = message
+            if message is not None:
+                messages.append(message)
+        return messages
+
+broker = EventBroker()
@@ -0,0 +1,63 @@
+from flask import Response, current_app, jsonify, request
+
+from . import events_bp
+from .broker import broker, EVENT_TOPICS, DEFAULT_WINDOW
+
+DEFAULT_HEARTBEAT = 15
+DEFAULT_MAX_CLIENTS = 100
+# Reconnect delay suggested to EventSource clients, in milliseconds
+RETRY_MS = 3000
+
+@events_bp.record_once
+def configure_broker(state):
+    broker.window = float(state.app.config.get('EVENTS_COALESCE_WINDOW', DEFAULT_WINDOW))
+
+def parse_topics(value: str):
+    """Split a comma separated topics parameter, defaulting to every topic"""
+    if not value:
+        return list(EVENT_TOPICS), None
+    topics = [t.strip() for t in value.split(',') if t.strip()]
+    unknown = [t for t in topics if t not in EVENT_TOPICS]
+    if unknown:
+        return None, f'Unknown topics: {", ".join(unknown)}'
+    return topics, None
+
+@events_bp.route('/stream', methods=['GET'])
+def stream_events():
+    """Stream invoice summary, customer summary, account balance and new transaction events
+
+    Sends the current summaries on connect, then one message per topic for
+    each burst of writes. Event ids are change feed sequence numbers, so a
+    reconnecting client can catch up with /api/changes?since=<Last-Event-ID>.
+    """
+    topics, error = parse_topics(request.args.get('topics', ''))
+    if error:
+        return jsonify({'error': error}), 400
+
+    max_clients = current_app.config.get('EVENTS_MAX_CLIENTS', DEFAULT_MAX_CLIENTS)
+    if broker.subscriber_count >= max_clients:
+        return jsonify({'error': 'Too many event stream clients'}), 503
+    heartbeat = current_app.config.get('EVENTS_HEARTBEAT', DEFAULT_HEARTBEAT)
+
+    # Subscribe before taking the snapshot so no write falls in between
+    subscription = broker.subscribe(topics)
+    try:
+        initial = broker.snapshot(topics)
+    except Exception:
+        broker.unsubscribe(subscription)
+        raise
+
+    def generate():
+        yield f'retry: {RETRY_MS}\n\n' + ''.join(m.encode() for m in initial)
+        while True:
+            messages = subscription.wait(heartbeat)
+            if messages:
+                yield ''.join(m.encode() for m in messages)
+            else:
+                yield ': keepalive\n\n'
+
+    response = Response(generate(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    response.call_on_close(lambda: broker.unsubscribe(subscription))
+    return response
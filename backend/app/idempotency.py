@@ -0,0 +1,163 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from typing import Dict, Optional, Tuple
+
+from flask import Flask, Response, current_app, jsonify, make_response, request
+
+from app import storage
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+class _StoredResponse:
+    """A response kept for replay, with the fingerprint of the request that produced it"""
+    __slots__ = ('fingerprint', 'status', 'body', 'headers', 'expires_at')
+
+    def __init__(self, fingerprint: str, status: int, body: bytes, headers: Dict[str, str], expires_at: float):
+        self.fingerprint = fingerprint
+        self.status = status
+        self.body = body
+        self.headers = headers
+        self.expires_at = expires_at
+
+class IdempotencyStore:
+    """Bounded in-memory store of responses keyed by idempotency key, with a TTL
+
+    Keys that are currently being processed are tracked separately so a
+    concurrent retry is rejected instead of running the write twice.
+    """
+
+    def __init__(self, ttl: float, max_keys: int):
+        self.ttl = ttl
+        self.max_keys = max_keys
+        self._responses: 'OrderedDict[Tuple, _StoredResponse]' = OrderedDict()
+        self._in_flight: Dict[Tuple, str] = {}
+        self._lock = threading.Lock()
+
+    def _purge(self, now: float) -> None:
+        # Entries are kept in insertion order, so expired ones sit at the front
+        while self._responses:
+            key, stored = next(iter(self._responses.items()))
+            if stored.expires_at > now:
+                break
+            del self._responses[key]
+
+    def begin(self, key: Tuple, fingerprint: str) -> Tuple[str, Optional[_StoredResponse]]:
+        """Claim a key; returns ('new', None), ('replay', stored), ('conflict', None) or ('mismatch', None)"""
+        now = time.monotonic()
+        with self._lock:
+            self._purge(now)
+            stored = self._responses.get(key)
+            if stored is not None:
+                if stored.fingerprint != fingerprint:
+                    return 'mismatch', None
+                return 'replay', stored
+            if key in self._in_flight:
+                return 'conflict', None
+            self._in_flight[key] = fingerprint
+            return 'new', None
+
+    def finish(self, key: Tuple) -> None:
+        """Release a claimed key"""
+        with self._lock:
+            self._in_flight.pop(key, None)
+
+    def complete(self, key: Tuple, stored: _StoredResponse) -> None:
+        """Store the response of a claimed key and release it, in one step so no retry falls in between"""
+        with self._lock:
+            self._in_flight.pop(key, None)
+            self._store(key, stored)
+
+    def snapshot(self, fingerprint: str, response: Response) -> _StoredResponse:
+        """Copy what is needed to replay a response"""
+        headers = {'Content-Type': response.headers.get('Content-Type', 'application/json')}
+        location = response.headers.get('Location')
+        if location:
+            headers['Location'] = location
+        return _StoredResponse(
+            fingerprint, response.status_code, response.get_data(), headers, time.monotonic() + self.ttl
+        )
+
+    def _store(self, key: Tuple, stored: _StoredResponse) -> None:
+        self._responses.pop(key, None)
+        self._responses[key] = stored
+        while len(self._responses) > self.max_keys:
+            self._responses.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._responses)
+
+class Idempotency:
+    """Replay stored responses for requests that repeat an Idempotency-Key header
+
+    Configuration keys (all optional):
+        IDEMPOTENCY_TTL      - seconds a response is kept, default 24 hours
+        IDEMPOTENCY_MAX_KEYS - keys kept before the oldest are evicted
+    """
+
+    def __init__(self, app: Optional[Flask] = None):
+        self.store: Optional[IdempotencyStore] = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app: Flask) -> None:
+        app.config.setdefault('IDEMPOTENCY_TTL', 24 * 60 * 60)
+        app.config.setdefault('IDEMPOTENCY_MAX_KEYS', 10000)
+        self.store = IdempotencyStore(app.config['IDEMPOTENCY_TTL'], app.config['IDEMPOTENCY_MAX_KEYS'])
+        app.extensions['idempotency'] = self
+
+def request_fingerprint() -> str:
+    """Hash of the parts of the request that must match on replay"""
+    digest = hashlib.sha256()
+    digest.update(request.method.encode('utf-8'))
+    digest.update(request.path.encode('utf-8'))
+    digest.update(request.get_data())
+    return digest.hexdigest()
+
+def idempotent(view):
+    """Make a create endpoint safe to retry when the client sends an Idempotency-Key
+
+    The first response below 500 is stored and replayed for later requests
+    with the same key. Reusing a key for a different request is an error.
+    Inside /api/batch the response is only stored once the batch commits,
+    and the key stays claimed until then.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key_value = request.headers.get(HEADER)
+        extension = current_app.extensions.get('idempotency')
+        if not key_value or extension is None:
+            return view(*args, **kwargs)
+        if len(key_value) > MAX_KEY_LENGTH:
+            return jsonify({'error': f'{HEADER} must be at most {MAX_KEY_LENGTH} characters'}), 400
+
+        store = extension.store
+        key = (storage.current_tenant().id, request.endpoint, key_value)
+        fingerprint = request_fingerprint()
+        state, stored = store.begin(key, fingerprint)
+        if state == 'replay':
+            response = Response(stored.body, status=stored.status, headers=stored.headers)
+            response.headers['Idempotent-Replayed'] = 'true'
+            return response
+        if state == 'mismatch':
+            return jsonify({'error': f'{HEADER} was already used for a different request'}), 422
+        if state == 'conflict':
+            return jsonify({'error': f'A request with this {HEADER} is still being processed'}), 409
+
+        release = True
+        try:
+            response = make_response(view(*args, **kwargs))
+            # Server errors are not stored so the client can retry them
+            if response.status_code < 500 and not response.is_streamed:
+                stored = store.snapshot(fingerprint, response)
+                storage.after_commit(lambda: store.complete(key, stored))
+                storage.on_discard(lambda: store.finish(key))
+                release = False
+            return response
+        finally:
+            if release:
+                store.finish(key)
+    return wrapper
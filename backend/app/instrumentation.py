@@ -0,0 +1,293 @@
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from functools import wraps
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from flask import Flask, g, request
+
+# Where a request's time can go, in Server-Timing order. The phases are
+# measured independently, so summary includes any model conversion it does
+PHASES = ('read', 'parse', 'serialize', 'write', 'model', 'summary')
+
+COUNTERS = ('loads', 'cache_hits', 'saves', 'bytes_read', 'bytes_written')
+
+# Phases that make up full-file I/O
+IO_PHASES = ('read', 'parse', 'serialize', 'write')
+
+class RequestStats:
+    """Storage and model work done while handling one request
+
+    bytes_read is the size of every document loaded, including those
+    served from the tenant's cache; cache_hits counts the loads that did
+    not touch the disk.
+    """
+    __slots__ = ('loads', 'cache_hits', 'saves', 'bytes_read', 'bytes_written', 'times', 'active')
+
+    def __init__(self):
+        self.loads = 0
+        self.cache_hits = 0
+        self.saves = 0
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.times: Dict[str, float] = dict.fromkeys(PHASES, 0.0)
+        self.active = set()
+
+_current_stats: contextvars.ContextVar[Optional[RequestStats]] = contextvars.ContextVar(
+    'request_stats', default=None
+)
+
+def current_stats() -> Optional[RequestStats]:
+    """Return the stats of the request being handled, if it is instrumented"""
+    return _current_stats.get()
+
+@contextmanager
+def unrecorded() -> Iterator[None]:
+    """Leave the work done in the enclosed block out of the current request's stats"""
+    token = _current_stats.set(None)
+    try:
+        yield
+    finally:
+        _current_stats.reset(token)
+
+def record_load(size: int, read: float, parse: float, cached: bool) -> None:
+    stats = _current_stats.get()
+    if stats is None:
+        return
+    stats.loads += 1
+    stats.bytes_read += size
+    stats.times['read'] += read
+    stats.times['parse'] += parse
+    if cached:
+        stats.cache_hits += 1
+
+def record_serialize(elapsed: float) -> None:
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.times['serialize'] += elapsed
+
+def record_save(size: int, elapsed: float) -> None:
+    stats = _current_stats.get()
+    if stats is None:
+        return
+    stats.saves += 1
+    stats.bytes_written += size
+    stats.times['write'] += elapsed
+
+def timed(phase: str):
+    """Add the time spent in a function to a phase of the current request
+
+    Nested calls in the same phase, such as Invoice.from_dict building its
+    products, are only counted once.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            stats = _current_stats.get()
+            if stats is None or phase in stats.active:
+                return func(*args, **kwargs)
+            stats.active.add(phase)
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                stats.times[phase] += time.perf_counter() - started
+                stats.active.discard(phase)
+        return wrapper
+    return decorator
+
+class EndpointStats:
+    """Running totals per (endpoint, method) across all requests"""
+
+    def __init__(self):
+        self.since = datetime.now(timezone.utc)
+        self._totals: Dict[Tuple[str, str], Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, endpoint: str, method: str, status: int, elapsed: float, stats: RequestStats) -> None:
+        with self._lock:
+            totals = self._totals.get((endpoint, method))
+            if totals is None:
+                totals = dict.fromkeys(('requests', 'errors', 'total', 'max') + COUNTERS + PHASES, 0)
+                self._totals[(endpoint, method)] = totals
+            totals['requests'] += 1
+            if status >= 500:
+                totals['errors'] += 1
+            totals['total'] += elapsed
+            totals['max'] = max(totals['max'], elapsed)
+            for counter in COUNTERS:
+                totals[counter] += getattr(stats, counter)
+            for phase in PHASES:
+                totals[phase] += stats.times[phase]
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """Per endpoint totals in milliseconds, most total time first"""
+        with self._lock:
+            items = [(key, dict(totals)) for key, totals in self._totals.items()]
+
+        endpoints = []
+        for (endpoint, method), totals in items:
+            io = sum(totals[phase] for phase in IO_PHASES)
+            entry = {
+                'endpoint': endpoint,
+                'method': method,
+                'requests': totals['requests'],
+                'errors': totals['errors'],
+                'total_ms': round(totals['total'] * 1000, 3),
+                'avg_ms': round(totals['total'] * 1000 / totals['requests'], 3),
+                'max_ms': round(totals['max'] * 1000, 3),
+                'io_share': round(io / totals['total'], 3) if totals['total'] else 0.0
+            }
+            for counter in COUNTERS:
+                entry[counter] = totals[counter]
+            for phase in PHASES:
+                entry[f'{phase}_ms'] = round(totals[phase] * 1000, 3)
+            endpoints.append(entry)
+        endpoints.sort(key=lambda e: e['total_ms'], reverse=True)
+        return endpoints
+
+    def reset(self) -> None:
+        with self._lock:
+            self._totals.clear()
+            self.since = datetime.now(timezone.utc)
+
+# Upper bounds in seconds of the latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class MetricsRegistry:
+    """Process lifetime counters for /metrics; unlike EndpointStats these never reset
+
+    Every update takes one short lock, so recording stays cheap and
+    consistent when requests are served from several threads.
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.in_flight = 0
+        self.storage = dict.fromkeys(COUNTERS, 0)
+        self.storage_seconds = dict.fromkeys(IO_PHASES, 0.0)
+        # (endpoint, method) -> [per bucket counts..., +Inf count, sum]
+        self._latency: Dict[Tuple[str, str], List[float]] = {}
+        self._statuses: Dict[Tuple[str, str, int], int] = {}
+        self._lock = threading.Lock()
+
+    def started(self) -> None:
+        with self._lock:
+            self.in_flight += 1
+
+    def finished(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+
+    def record(self, endpoint: str, method: str, status: int, elapsed: float, stats: RequestStats) -> None:
+        index = bisect.bisect_left(self.buckets, elapsed)
+        with self._lock:
+            latency = self._latency.get((endpoint, method))
+            if latency is None:
+                latency = [0] * (len(self.buckets) + 1) + [0.0]
+                self._latency[(endpoint, method)] = latency
+            latency[index] += 1
+            latency[-1] += elapsed
+            key = (endpoint, method, status)
+            self._statuses[key] = self._statuses.get(key, 0) + 1
+            for counter in COUNTERS:
+                self.storage[counter] += getattr(stats, counter)
+            for phase in IO_PHASES:
+                self.storage_seconds[phase] += stats.times[phase]
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Copy every series; histogram buckets are returned cumulative"""
+        with self._lock:
+            latency = {key: list(values) for key, values in self._latency.items()}
+            statuses = dict(self._statuses)
+            snapshot = {
+                'in_flight': self.in_flight,
+                'storage': dict(self.storage),
+                'storage_seconds': dict(self.storage_seconds),
+                'statuses': statuses
+            }
+        histograms = {}
+        for key, values in latency.items():
+            cumulative, total = [], 0
+            for count in values[:-1]:
+                total += count
+                cumulative.append(total)
+            histograms[key] = {'buckets': cumulative, 'count': total, 'sum': values[-1]}
+        snapshot['latency'] = histograms
+        return snapshot
+
+def server_timing(stats: RequestStats, elapsed: float) -> str:
+    """Format a request's breakdown as a Server-Timing header value"""
+    metrics = [f'total;dur={elapsed * 1000:.2f}']
+    for phase in PHASES:
+        duration = stats.times[phase]
+        if phase == 'read' and stats.loads:
+            desc = f'{stats.loads} loads, {stats.cache_hits} cached, {stats.bytes_read} bytes'
+        elif phase == 'write' and stats.saves:
+            desc = f'{stats.saves} saves, {stats.bytes_written} bytes'
+        elif duration:
+            desc = None
+        else:
+            continue
+        metric = f'{phase};dur={duration * 1000:.2f}'
+        if desc:
+            metric += f';desc="{desc}"'
+        metrics.append(metric)
+    return ', '.join(metrics)
+
+class Instrumentation:
+    """Measure where each request's time goes and keep totals per endpoint
+
+    Storage records bytes, loads, saves, parse and serialize time; model
+    conversions and summary updates are timed with @timed. Totals are
+    served by /api/stats, and process lifetime counters by /metrics.
+
+    Configuration keys (all optional):
+        INSTRUMENTATION - measure requests at all, default True
+        SERVER_TIMING   - add a Server-Timing header to each response, default True
+    """
+
+    def __init__(self, app: Optional[Flask] = None):
+        self.endpoints = EndpointStats()
+        self.metrics = MetricsRegistry()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app: Flask) -> None:
+        app.config.setdefault('INSTRUMENTATION', True)
+        app.config.setdefault('SERVER_TIMING', True)
+        app.extensions['instrumentation'] = self
+        if not app.config['INSTRUMENTATION']:
+            return
+        self.server_timing = app.config['SERVER_TIMING']
+        app.before_request(self.before_request)
+        app.after_request(self.after_request)
+        app.teardown_request(self.teardown_request)
+
+    def before_request(self) -> None:
+        g._request_stats_token = _current_stats.set(RequestStats())
+        g._request_started = time.perf_counter()
+        self.metrics.started()
+
+    def after_request(self, response):
+        stats = _current_stats.get()
+        started = g.get('_request_started')
+        if stats is None or started is None:
+            return response
+        elapsed = time.perf_counter() - started
+        endpoint = request.endpoint or '<unmatched>'
+        self.endpoints.record(endpoint, request.method, response.status_code, elapsed, stats)
+        self.metrics.record(endpoint, request.method, response.status_code, elapsed, stats)
+        if self.server_timing:
+            response.headers['Server-Timing'] = server_timing(stats, elapsed)
+            response.headers['Timing-Allow-Origin'] = '*'
+        return response
+
+    def teardown_request(self, exc=None) -> None:
+        token = g.pop('_request_stats_token', None)
+        if token is not None:
+            _current_stats.reset(token)
+            self.metrics.finished()
@@ -1,6 +1,9 @@
 from typing import Dict, List, Optional, Any
 from dataclasses import dataclass, field
 from datetime import datetime
+from app import dates, money
+from app.instrumentation import timed
+from app.records import RecordView
 
 INVOICE_STATUSES = [
     'draft',
@@ -12,7 +15,7 @@ INVOICE_STATUSES = [
 PAYMENT_METHODS = ['cash', 'bank_transfer', 'credit_card', 'check', 'other']
 PAYMENT_TERMS = ['due_on_receipt', 'net_15', 'net_30', 'net_60', 'custom']
 
-@dataclass
+@dataclass(slots=True)
 class Product:
     """Represents a product or service in an invoice"""
     name: str
@@ -22,13 +25,19 @@ class Product:
     tax_rate: float = 0.0
     tax_amount: float = 0.0
     total: float = 0.0
+    total_cents: int = 0  # total in cents; see app/money.py
 
     def __post_init__(self):
-        """Calculate tax and total after initialization"""
-        self.tax_amount = self.price * self.quantity * (self.tax_rate / 100)
-        self.total = (self.price * self.quantity) + self.tax_amount
+        """Calculate tax and total, in whole cents, after initialization"""
+        # Round the line once; rounding the unit price first is off by up to half a cent per unit
+        line_cents = money.whole(self.price * self.quantity * 100)
+        tax_cents = money.scale(line_cents, self.tax_rate / 100)
+        self.total_cents = line_cents + tax_cents
+        self.tax_amount = money.from_cents(tax_cents)
+        self.total = money.from_cents(self.total_cents)
 
     @classmethod
+    @timed('model')
     def from_dict(cls, data: Dict[str, Any]) -> 'Product':
         """Create a Product instance from a dictionary"""
         return cls(
@@ -39,6 +48,16 @@ class Product:
             tax_rate=float(data.get('tax_rate', 0.0))
         )
 
+    @classmethod
+    def from_stored(cls, data: Dict[str, Any]) -> 'Product':
+        """Create a Product from a saved line; falls back to from_dict"""
+        try:
+            return cls(data['name'], data['description'], float(data['price']), float(data['quantity']),
+                       float(data['tax_rate']))
+        except KeyError:
+            return cls.from_dict(data)
+
+    @timed('model')
     def to_dict(self) -> Dict[str, Any]:
         """Convert Product instance to dictionary"""
         return {
@@ -48,10 +67,11 @@ class Product:
             'quantity': self.quantity,
             'tax_rate': self.tax_rate,
             'tax_amount': self.tax_amount,
-            'total': self.total
+            'total': self.total,
+            'total_cents': self.total_cents
         }
 
-@dataclass
+@dataclass(slots=True)
 class Payment:
     """Represents a payment for an invoice"""
     id: str
@@ -62,13 +82,21 @@ class Payment:
     notes: Optional[str] = None
     created_at: Optional[str] = None
     transaction_id: Optional[str] = None  # Link to transaction
+    date_ordinal: Optional[int] = None  # Day number of date; see app/dates.py
+    amount_cents: Optional[int] = None  # amount in cents; see app/money.py
 
     def __post_init__(self):
-        """Set created_at if not provided"""
+        """Set created_at if not provided, normalize the date and round the amount to cents"""
         if not self.created_at:
             self.created_at = datetime.utcnow().isoformat()
+        if self.date_ordinal is None:
+            self.date, self.date_ordinal = dates.normalize(self.date)
+        if self.amount_cents is None:
+            self.amount_cents = money.to_cents(self.amount)
+            self.amount = money.from_cents(self.amount_cents)
 
     @classmethod
+    @timed('model')
     def from_dict(cls, data: Dict[str, Any]) -> 'Payment':
         """Create a Payment instance from a dictionary"""
         return cls(
@@ -82,12 +110,25 @@ class Payment:
             transaction_id=data.get('transaction_id')
         )
 
+    @classmethod
+    def from_stored(cls, data: Dict[str, Any]) -> 'Payment':
+        """Create a Payment from a saved payment; falls back to from_dict"""
+        try:
+            return cls(data['id'], data['date'], data['amount'], data['payment_method'], data['reference'],
+                       data['notes'], data['created_at'], data['transaction_id'], data['date_ordinal'],
+                       data['amount_cents'])
+        except KeyError:
+            return cls.from_dict(data)
+
+    @timed('model')
     def to_dict(self) -> Dict[str, Any]:
         """Convert Payment instance to dictionary"""
         return {
             'id': self.id,
             'date': self.date,
+            'date_ordinal': self.date_ordinal,
             'amount': self.amount,
+            'amount_cents': self.amount_cents,
             'payment_method': self.payment_method,
             'reference': self.reference,
             'notes': self.notes,
@@ -95,7 +136,7 @@ class Payment:
             'transaction_id': self.transaction_id
         }
 
-@dataclass
+@dataclass(slots=True)
 class Invoice:
     """Represents an Invoice entry"""
     id: str
@@ -114,27 +155,42 @@ class Invoice:
     updated_at: Optional[str] = None
     last_payment_date: Optional[str] = None
     converted_from_estimate: Optional[Dict] = None
+    # Day numbers of invoice_date and due_date; see app/dates.py
+    invoice_date_ordinal: Optional[int] = None
+    due_date_ordinal: Optional[int] = None
+    # total_amount and balance_due in cents; see app/money.py
+    total_amount_cents: int = 0
+    balance_due_cents: int = 0
+    # Customer the invoice is for, when customer_name could be linked to one; see app/receivables.py
+    customer_id: Optional[str] = None
 
     def __post_init__(self):
-        """Calculate totals and set timestamps"""
+        """Calculate totals, set timestamps and normalize dates"""
         now = datetime.utcnow().isoformat()
         if not self.created_at:
             self.created_at = now
         if not self.updated_at:
             self.updated_at = now
+        if self.invoice_date_ordinal is None:
+            self.invoice_date, self.invoice_date_ordinal = dates.normalize(self.invoice_date)
+        if self.due_date_ordinal is None:
+            self.due_date, self.due_date_ordinal = dates.normalize(self.due_date)
             
         # Calculate total amount
-        self.total_amount = sum(product.total for product in self.products)
+        self.total_amount_cents = sum(product.total_cents for product in self.products)
+        self.total_amount = money.from_cents(self.total_amount_cents)
         
         # Calculate balance due
-        total_paid = sum(payment.amount for payment in self.payments)
-        self.balance_due = self.total_amount - total_paid
+        total_paid = sum(payment.amount_cents for payment in self.payments)
+        self.balance_due_cents = self.total_amount_cents - total_paid
+        self.balance_due = money.from_cents(self.balance_due_cents)
         
         # Set last payment date
         if self.payments:
-            self.last_payment_date = max(payment.date for payment in self.payments)
+            self.last_payment_date = max(self.payments, key=lambda p: p.date_ordinal or 0).date
 
     @classmethod
+    @timed('model')
     def from_dict(cls, data: Dict[str, Any]) -> 'Invoice':
         """Create an Invoice instance from a dictionary"""
         products = [Product.from_dict(p) for p in data.get('products', [])]
@@ -146,6 +202,7 @@ class Invoice:
             invoice_date=data.get('invoice_date', ''),
             due_date=data.get('due_date', ''),
             customer_name=data.get('customer_name', ''),
+            customer_id=data.get('customer_id'),
             status=data.get('status', 'draft'),
             products=products,
             payment_terms=data.get('payment_terms', 'due_on_receipt'),
@@ -157,18 +214,56 @@ class Invoice:
             converted_from_estimate=data.get('converted_from_estimate')
         )
 
+    @classmethod
+    @timed('model')
+    def from_stored(cls, data: Dict[str, Any]) -> 'Invoice':
+        """Create an Invoice from a record read back from storage
+
+        Like Transaction.from_stored: saved records carry every key, so
+        fields are read directly; anything partial falls back to from_dict.
+        Totals are still recomputed in __post_init__.
+        """
+        try:
+            return cls(
+                id=data['id'],
+                invoice_no=data['invoice_no'],
+                invoice_date=data['invoice_date'],
+                due_date=data['due_date'],
+                customer_name=data['customer_name'],
+                customer_id=data.get('customer_id'),
+                status=data['status'],
+                products=[Product.from_stored(p) for p in data['products']],
+                payments=[Payment.from_stored(p) for p in data['payments']],
+                payment_terms=data['payment_terms'],
+                notes=data['notes'],
+                created_at=data['created_at'],
+                updated_at=data['updated_at'],
+                last_payment_date=data['last_payment_date'],
+                converted_from_estimate=data['converted_from_estimate'],
+                invoice_date_ordinal=data['invoice_date_ordinal'],
+                due_date_ordinal=data['due_date_ordinal']
+            )
+        except KeyError:
+            return cls.from_dict(data)
+
+    @timed('model')
     def to_dict(self) -> Dict[str, Any]:
         """Convert Invoice instance to dictionary"""
         return {
             'id': self.id,
             'invoice_no': self.invoice_no,
             'invoice_date': self.invoice_date,
+            'invoice_date_ordinal': self.invoice_date_ordinal,
             'due_date': self.due_date,
+            'due_date_ordinal': self.due_date_ordinal,
             'customer_name': self.customer_name,
+            'customer_id': self.customer_id,
             'status': self.status,
             'products': [p.to_dict() for p in self.products],
             'total_amount': self.total_amount,
+            'total_amount_cents': self.total_amount_cents,
             'balance_due': self.balance_due,
+            'balance_due_cents': self.balance_due_cents,
             'payments': [p.to_dict() for p in self.payments],
             'payment_terms': self.payment_terms,
             'notes': self.notes,
@@ -178,12 +273,40 @@ class Invoice:
             'converted_from_estimate': self.converted_from_estimate
         }
 
+class InvoiceView(RecordView):
+    """A stored invoice, updated in place; totals are recomputed only on request"""
+    __slots__ = ()
+    date_fields = ('invoice_date', 'due_date')
+
+    # Updates touching any of these make the stored totals stale
+    TOTAL_FIELDS = ('products', 'payments', 'total_amount', 'balance_due', 'total_amount_cents', 'balance_due_cents')
+
+    def refresh_totals(self) -> None:
+        """Normalize lines and payments and recompute totals, as Invoice.__post_init__ does"""
+        products = [Product.from_dict(p).to_dict() for p in self.data.get('products', [])]
+        payments = [Payment.from_dict(p).to_dict() for p in self.data.get('payments', [])]
+        total_cents = sum(p['total_cents'] for p in products)
+        balance_cents = total_cents - sum(p['amount_cents'] for p in payments)
+        changes = {
+            'products': products,
+            'payments': payments,
+            'total_amount': money.from_cents(total_cents),
+            'total_amount_cents': total_cents,
+            'balance_due': money.from_cents(balance_cents),
+            'balance_due_cents': balance_cents
+        }
+        if payments:
+            changes['last_payment_date'] = max(payments, key=lambda p: p['date_ordinal'] or 0)['date']
+        self.data.update(changes)
+
 @dataclass
 class InvoicesSummary:
     """Summary information about invoices"""
     # Counts by status
     draft_count: int = 0
+    sent_count: int = 0
     posted_count: int = 0
+    partially_paid_count: int = 0
     paid_count: int = 0
     overdue_count: int = 0
     cancelled_count: int = 0
@@ -191,7 +314,9 @@ class InvoicesSummary:
     
     # Amounts by status
     draft_amount: float = 0.0
+    sent_amount: float = 0.0
     posted_amount: float = 0.0
+    partially_paid_amount: float = 0.0
     paid_amount: float = 0.0
     overdue_amount: float = 0.0
     void_amount: float = 0.0
@@ -200,12 +325,15 @@ class InvoicesSummary:
     total_receivable: float = 0.0  # Total amount still to be collected (excludes paid and cancelled)
     total_collected: float = 0.0   # Total amount collected so far
     
+    @timed('model')
     def to_dict(self) -> Dict[str, Any]:
         """Convert InvoicesSummary instance to dictionary"""
         return {
             # Counts
             'draft_count': self.draft_count,
+            'sent_count': self.sent_count,
             'posted_count': self.posted_count,
+            'partially_paid_count': self.partially_paid_count,
             'paid_count': self.paid_count,
             'overdue_count': self.overdue_count,
             'cancelled_count': self.cancelled_count,
@@ -213,7 +341,9 @@ class InvoicesSummary:
             
             # Amounts
             'draft_amount': self.draft_amount,
+            'sent_amount': self.sent_amount,
             'posted_amount': self.posted_amount,
+            'partially_paid_amount': self.partially_paid_amount,
             'paid_amount': self.paid_amount,
             'overdue_amount': self.overdue_amount,
             'void_amount': self.void_amount,
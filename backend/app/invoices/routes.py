@@ -1,30 +1,31 @@
 from flask import jsonify, request
-import json
-import os
-from typing import Dict, List, Optional
-import uuid
+from typing import Callable, Dict, List, Optional
 from datetime import datetime, timedelta
+from collections import defaultdict
+import logging
 import random
 
+from app import dates, money, receivables, storage
+from app.changes.routes import record_change
+from app.idempotency import idempotent
+from app.instrumentation import timed
+from app.precomputed import PrecomputedResponse
 from . import invoices_bp
-from .models import Invoice, InvoicesSummary, Payment, INVOICE_STATUSES, PAYMENT_METHODS, PAYMENT_TERMS
+from .models import Invoice, InvoiceView, InvoicesSummary, Payment, INVOICE_STATUSES, PAYMENT_METHODS, PAYMENT_TERMS
 from app.transactions.models import Transaction, TransactionType, TransactionEntry
 from app.chart_of_accounts.models import Account
 from app.transactions.routes import create_transaction_direct, load_transactions, save_transactions
 
+logger = logging.getLogger(__name__)
+
 # File path handling
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-DATA_DIR = os.path.join(BASE_DIR, 'data')
-INVOICES_FILE = os.path.join(DATA_DIR, 'invoices.json')
+INVOICES_FILE = 'invoices.json'
 
 # Account IDs - These should match your chart of accounts
 ACCOUNTS_RECEIVABLE_ID = "1200"  # Accounts Receivable
 SALES_REVENUE_ID = "4000"        # Sales Revenue
 CASH_AND_BANK_ID = "1000"        # Cash and Bank
 
-# Ensure data directory exists
-os.makedirs(DATA_DIR, exist_ok=True)
-
 def deep_update(original: Dict, update: Dict) -> None:
     """Recursively update nested dictionaries"""
     for key, value in update.items():
@@ -36,26 +37,35 @@ def deep_update(original: Dict, update: Dict) -> None:
 def load_invoices() -> Dict:
     """Load invoices data from JSON file"""
     try:
-        if os.path.exists(INVOICES_FILE):
-            with open(INVOICES_FILE, 'r') as f:
-                return json.load(f)
+        data = storage.load_json(INVOICES_FILE)
+        if data is not None:
+            return data
     except Exception as e:
-        print(f"Error loading invoices data: {str(e)}")
+        logger.exception("Error loading invoices data: %s", e)
     return {'invoices': [], 'summary': {}}
 
-def save_invoices(data: Dict) -> bool:
-    """Save invoices data to JSON file"""
+def save_invoices(data: Dict, receivables_update: Optional[Callable[[receivables.Receivables], None]] = None) -> bool:
+    """Save invoices data to JSON file
+
+    receivables_update, when given, brings the customer index in line with
+    this save; without it the index is rebuilt the next time it is used.
+    """
     try:
-        with open(INVOICES_FILE, 'w') as f:
-            json.dump(data, f, indent=2)
+        saved = storage.before_save(receivables.KIND, INVOICES_FILE)
+        storage.save_json(INVOICES_FILE, data)
+        if receivables_update is not None:
+            saved(receivables_update)
         return True
     except Exception as e:
-        print(f"Error saving invoices data: {str(e)}")
+        logger.exception("Error saving invoices data: %s", e)
         return False
 
+@timed('summary')
 def update_summary(invoices: List[Dict]) -> InvoicesSummary:
     """Update invoices summary information"""
     summary = InvoicesSummary()
+    # Amounts are added up in cents and converted to dollars once at the end
+    cents = defaultdict(int)
     
     for invoice in invoices:
         # Skip cancelled invoices in amount calculations
@@ -64,33 +74,36 @@ def update_summary(invoices: List[Dict]) -> InvoicesSummary:
             continue
             
         # Get payment info
-        total_paid = sum(payment['amount'] for payment in invoice.get('payments', []))
-        balance_due = invoice['total_amount'] - total_paid
+        total_amount = money.cents_of(invoice, 'total_amount')
+        total_paid = sum(money.cents_of(payment, 'amount') for payment in invoice.get('payments', []))
+        balance_due = total_amount - total_paid
         
         # Update counts and amounts based on status
         if invoice['status'] == 'draft':
             summary.draft_count += 1
-            summary.draft_amount += balance_due
+            cents['draft_amount'] += balance_due
         elif invoice['status'] == 'sent':
             summary.sent_count += 1
-            summary.sent_amount += balance_due
+            cents['sent_amount'] += balance_due
         elif invoice['status'] == 'partially_paid':
             summary.partially_paid_count += 1
-            summary.partially_paid_amount += balance_due
+            cents['partially_paid_amount'] += balance_due
         elif invoice['status'] == 'paid':
             summary.paid_count += 1
-            summary.paid_amount += invoice['total_amount']  # Use total amount for historical tracking
+            cents['paid_amount'] += total_amount  # Use total amount for historical tracking
         elif invoice['status'] == 'overdue':
             summary.overdue_count += 1
-            summary.overdue_amount += balance_due
+            cents['overdue_amount'] += balance_due
         elif invoice['status'] == 'void':
             summary.void_count += 1
             
         # Update payment tracking
         if invoice['status'] not in ['paid', 'cancelled', 'void']:
-            summary.total_receivable += balance_due
-        summary.total_collected += total_paid
-    
+            cents['total_receivable'] += balance_due
+        cents['total_collected'] += total_paid
+
+    for name, value in cents.items():
+        setattr(summary, name, money.from_cents(value))
     return summary
 
 def get_next_invoice_number() -> str:
@@ -131,25 +144,27 @@ def generate_payment_id():
 
 def check_and_update_status(invoice: Dict) -> None:
     """Update invoice status based on payments and due date"""
-    now = datetime.utcnow()
-    due_date = datetime.fromisoformat(invoice['due_date'].replace('Z', '+00:00'))
-    total_paid = sum(payment['amount'] for payment in invoice.get('payments', []))
+    due_day = dates.day_of(invoice, 'due_date')
+    past_due = due_day is not None and due_day < dates.today()
+    total_amount = money.cents_of(invoice, 'total_amount')
+    total_paid = sum(money.cents_of(payment, 'amount') for payment in invoice.get('payments', []))
     
     # Update balance due
-    invoice['balance_due'] = invoice['total_amount'] - total_paid
+    invoice['balance_due_cents'] = total_amount - total_paid
+    invoice['balance_due'] = money.from_cents(invoice['balance_due_cents'])
     
-    if total_paid >= invoice['total_amount']:
+    if total_paid >= total_amount:
         invoice['status'] = 'paid'
     elif total_paid > 0:
         invoice['status'] = 'partially_paid'
-        if due_date < now:
+        if past_due:
             invoice['status'] = 'overdue'
-    elif due_date < now:
+    elif past_due:
         invoice['status'] = 'overdue'
 
 def calculate_due_date(payment_terms: str) -> str:
     """Calculate due date based on payment terms"""
-    now = datetime.utcnow()
+    now = datetime.utcnow().date()
     if payment_terms == 'net_15':
         due_date = now + timedelta(days=15)
     elif payment_terms == 'net_30':
@@ -161,10 +176,12 @@ def calculate_due_date(payment_terms: str) -> str:
     return due_date.isoformat()
 
 # Interface Routes
+STATUS_TYPES_RESPONSE = PrecomputedResponse(INVOICE_STATUSES)
+
 @invoices_bp.route('/status_types', methods=['GET'])
 def get_status_types():
     """Get all valid invoice status types"""
-    return jsonify(INVOICE_STATUSES)
+    return STATUS_TYPES_RESPONSE.response()
 
 @invoices_bp.route('/next_number', methods=['GET'])
 def get_next_number():
@@ -173,6 +190,7 @@ def get_next_number():
 
 # Operations Routes
 @invoices_bp.route('/create_invoice', methods=['POST'])
+@idempotent
 def create_invoice():
     """Create a new invoice"""
     try:
@@ -193,13 +211,17 @@ def create_invoice():
         data['updated_at'] = data['created_at']
         data['status'] = 'draft'
         data['payments'] = []
+        error = receivables.link_customer(data)
+        if error:
+            return jsonify({'message': error}), 400
         
         # Create invoice object and validate
         invoice = Invoice.from_dict(data)
         
         # Save invoice
         invoices_data = load_invoices()
-        invoices_data['invoices'].append(invoice.to_dict())
+        stored = invoice.to_dict()
+        invoices_data['invoices'].append(stored)
         
         # Create initial transaction when invoice is created (if not draft)
         if data.get('status') != 'draft':
@@ -229,8 +251,9 @@ def create_invoice():
         # Update summary
         invoices_data['summary'] = update_summary(invoices_data['invoices']).to_dict()
         
-        if not save_invoices(invoices_data):
+        if not save_invoices(invoices_data, lambda r: r.put_invoice(stored)):
             return jsonify({'message': 'Failed to save invoice'}), 500
+        record_change('invoice', invoice_id, 'create')
             
         return jsonify(invoice.to_dict()), 201
         
@@ -245,34 +268,37 @@ def update_invoice(id):
         
         # Load invoice
         invoices_data = load_invoices()
-        invoice_index = None
-        invoice = None
-        
-        for i, inv in enumerate(invoices_data['invoices']):
-            if inv['id'] == id:
-                invoice_index = i
-                invoice = inv
-                break
-                
+        invoice = next((inv for inv in invoices_data['invoices'] if inv['id'] == id), None)
         if invoice is None:
             return jsonify({'message': 'Invoice not found'}), 404
             
-        # Check if amount is being modified
-        old_amount = invoice.get('total_amount', 0)
-        new_amount = data.get('total_amount', old_amount)
-        amount_changed = abs(new_amount - old_amount) > 0.01  # Using 0.01 to handle floating point precision
+        old_cents = money.cents_of(invoice, 'total_amount')
         
         # Check if status is being changed from draft to active
         old_status = invoice.get('status', 'draft')
         new_status = data.get('status', old_status)
         becoming_active = old_status == 'draft' and new_status == 'posted'  # Only create transaction when status becomes 'posted'
         
-        # Update invoice data
+        # A new customer id or name is linked afresh
+        if 'customer_id' in data or 'customer_name' in data:
+            customer = {'customer_id': data.get('customer_id'), 'customer_name': data.get('customer_name', invoice.get('customer_name'))}
+            error = receivables.link_customer(customer)
+            if error:
+                return jsonify({'message': error}), 400
+            data = {**data, **customer}
+        
+        # Update invoice data in place; totals are only recomputed when lines or payments change
+        invoice_view = InvoiceView(invoice)
         deep_update(invoice, data)
-        invoice['updated_at'] = datetime.utcnow().isoformat()
+        if any(key in data for key in InvoiceView.TOTAL_FIELDS):
+            invoice_view.refresh_totals()
+        # Edited dates are normalized and get fresh ordinals
+        invoice_view.set(**{f: invoice[f] for f in InvoiceView.date_fields if f in data})
         
-        # Create invoice object to validate
-        invoice_obj = Invoice.from_dict(invoice)
+        # Check if amount is being modified; cents compare exactly
+        new_cents = money.cents_of(invoice, 'total_amount')
+        new_amount = money.from_cents(new_cents)
+        amount_changed = new_cents != old_cents
         
         # Handle transaction modifications
         try:
@@ -304,10 +330,10 @@ def update_invoice(id):
                 try:
                     response = create_transaction_direct(transaction_data)
                     if not isinstance(response, dict) or 'id' not in response:
-                        print(f"Error creating transaction: {response}")
+                        logger.error("Error creating transaction: %s", response)
                         raise Exception("Failed to create transaction")
                 except Exception as e:
-                    print(f"Error creating transaction: {str(e)}")
+                    logger.exception("Error creating transaction: %s", e)
                     raise Exception(f"Failed to create transaction: {str(e)}")
                 
             # Case 2: Amount changed on active invoice - modify existing transaction
@@ -323,13 +349,12 @@ def update_invoice(id):
                 if transaction:
                     # Update transaction amounts
                     for entry in transaction['entries']:
-                        if entry['accountId'] == ACCOUNTS_RECEIVABLE_ID:
-                            entry['amount'] = new_amount
-                        elif entry['accountId'] == SALES_REVENUE_ID:
-                            entry['amount'] = new_amount
+                        if entry['accountId'] in (ACCOUNTS_RECEIVABLE_ID, SALES_REVENUE_ID):
+                            entry['amount'], entry['amount_cents'] = new_amount, new_cents
                             
                     transaction['updated_at'] = datetime.utcnow().isoformat()
-                    save_transactions(transactions_data)
+                    if save_transactions(transactions_data):
+                        record_change('transaction', transaction['id'], 'update')
                     
             # Case 3: Invoice being voided - reverse the transaction
             if new_status == 'void' and old_status != 'void':
@@ -359,22 +384,21 @@ def update_invoice(id):
                 transaction['status'] = 'void'
                 transaction['voided_at'] = datetime.utcnow().isoformat()
                 transaction['voided_by'] = 'system'
-                save_transactions(transactions_data)
+                if save_transactions(transactions_data):
+                    record_change('transaction', transaction['id'], 'update')
                     
         except Exception as e:
-            print(f"Error handling transactions: {str(e)}")
+            logger.exception("Error handling transactions: %s", e)
             # Continue with invoice update even if transaction handling fails
             
-        # Update invoice in data
-        invoices_data['invoices'][invoice_index] = invoice
-        
         # Update summary
         invoices_data['summary'] = update_summary(invoices_data['invoices']).to_dict()
         
-        if not save_invoices(invoices_data):
+        if not save_invoices(invoices_data, lambda r: r.put_invoice(invoice)):
             return jsonify({'message': 'Failed to save invoice'}), 500
+        record_change('invoice', id, 'update')
             
-        return jsonify(invoice_obj.to_dict())
+        return jsonify(invoice_view.to_dict())
         
     except Exception as e:
         return jsonify({'message': f'Error updating invoice: {str(e)}'}), 500
@@ -411,7 +435,7 @@ def delete_invoice(id):
         if invoice.get('status', '').lower() != 'draft':
             payments = invoice.get('payments', [])
             if payments:
-                payment_amount = sum(payment.get('amount', 0) for payment in payments)
+                payment_amount = money.from_cents(sum(money.cents_of(payment, 'amount') for payment in payments))
                 return jsonify({
                     'message': f'Cannot delete invoice {invoice.get("invoice_no")} because it has {len(payments)} payment(s) totaling {payment_amount}. Please void the invoice instead.',
                     'error_code': 'HAS_PAYMENTS',
@@ -458,10 +482,11 @@ def delete_invoice(id):
                         invoice_transaction['status'] = 'void'
                         invoice_transaction['voided_at'] = datetime.utcnow().isoformat()
                         invoice_transaction['voided_by'] = 'system'
-                        save_transactions(transactions_data)
+                        if save_transactions(transactions_data):
+                            record_change('transaction', invoice_transaction['id'], 'update')
                     
             except Exception as e:
-                print(f"Error handling transactions during deletion: {str(e)}")
+                logger.exception("Error handling transactions during deletion: %s", e)
                 # Continue with invoice deletion even if transaction handling fails
                 
         # Remove invoice
@@ -471,11 +496,12 @@ def delete_invoice(id):
         invoices_data['summary'] = update_summary(invoices_data['invoices']).to_dict()
         
         # Save changes
-        if not save_invoices(invoices_data):
+        if not save_invoices(invoices_data, lambda r: r.remove_invoice(id)):
             return jsonify({
                 'message': 'Failed to save changes after deletion. Please try again.',
                 'error_code': 'SAVE_FAILED'
             }), 500
+        record_change('invoice', id, 'delete')
             
         return jsonify({
             'message': f'Invoice {invoice.get("invoice_no", id)} deleted successfully',
@@ -484,7 +510,7 @@ def delete_invoice(id):
         })
         
     except Exception as e:
-        print(f"Error in delete_invoice: {str(e)}")
+        logger.exception("Error in delete_invoice: %s", e)
         return jsonify({
             'message': f'Error deleting invoice: {str(e)}',
             'error_code': 'UNKNOWN_ERROR'
@@ -551,6 +577,7 @@ def get_summary():
         return jsonify({'message': str(e)}), 400
 
 @invoices_bp.route('/add_payment/<string:id>', methods=['POST'])
+@idempotent
 def add_payment(id):
     """Add a payment to an invoice"""
     try:
@@ -597,10 +624,8 @@ def add_payment(id):
         }
         
         # Create the transaction
-        transaction_response = create_transaction_direct(transaction_data)
-        if transaction_response.status_code == 201:
-            transaction_data = transaction_response.get_json()
-            payment.transaction_id = transaction_data.get('id')
+        transaction = create_transaction_direct(transaction_data)
+        payment.transaction_id = transaction['id']
         
         # Add payment to invoice
         if 'payments' not in invoice:
@@ -613,8 +638,9 @@ def add_payment(id):
         # Update summary
         invoices_data['summary'] = update_summary(invoices_data['invoices']).to_dict()
         
-        if not save_invoices(invoices_data):
+        if not save_invoices(invoices_data, lambda r: r.put_invoice(invoice)):
             return jsonify({'message': 'Failed to save payment'}), 500
+        record_change('invoice', id, 'update')
             
         return jsonify(payment.to_dict()), 201
         
@@ -632,12 +658,12 @@ def get_payments(id):
             
         return jsonify({
             "payments": invoice.get('payments', []),
-            "total_paid": sum(payment['amount'] for payment in invoice.get('payments', [])),
+            "total_paid": money.from_cents(sum(money.cents_of(p, 'amount') for p in invoice.get('payments', []))),
             "balance_due": invoice['balance_due']
         }), 200
         
     except Exception as e:
-        print(f"Error getting payments: {str(e)}")
+        logger.exception("Error getting payments: %s", e)
         return jsonify({"error": "Failed to get payments"}), 500
 
 @invoices_bp.route('/void_invoice/<string:id>', methods=['POST'])
@@ -737,10 +763,11 @@ def void_invoice(id):
             invoice_transaction['status'] = 'void'
             invoice_transaction['voided_at'] = datetime.utcnow().isoformat()
             invoice_transaction['voided_by'] = 'system'
-            save_transactions(transactions_data)
+            if save_transactions(transactions_data) and invoice_transaction.get('id'):
+                record_change('transaction', invoice_transaction['id'], 'update')
                     
         except Exception as e:
-            print(f"Error handling transactions during void: {str(e)}")
+            logger.exception("Error handling transactions during void: %s", e)
             # Continue with invoice void even if transaction handling fails
             
         # Update invoice status
@@ -752,11 +779,12 @@ def void_invoice(id):
         invoices_data['summary'] = update_summary(invoices_data['invoices']).to_dict()
         
         # Save changes
-        if not save_invoices(invoices_data):
+        if not save_invoices(invoices_data, lambda r: r.put_invoice(invoice)):
             return jsonify({
                 'message': 'Failed to save changes after voiding. Please try again.',
                 'error_code': 'SAVE_FAILED'
             }), 500
+        record_change('invoice', id, 'update')
             
         return jsonify({
             'message': f'Invoice {invoice.get("invoice_no", id)} voided successfully',
@@ -765,7 +793,7 @@ def void_invoice(id):
         })
         
     except Exception as e:
-        print(f"Error in void_invoice: {str(e)}")
+        logger.exception("Error in void_invoice: %s", e)
         return jsonify({
             'message': f'Error voiding invoice: {str(e)}',
             'error_code': 'UNKNOWN_ERROR'
@@ -0,0 +1,168 @@
+"""Columnar ledger of posted transaction entries
+
+transactions.json holds each transaction as a dict with a nested list of
+entry dicts, so any report over it walks both. The Ledger keeps one row per
+entry of every posted or voided transaction in parallel arrays:
+
+    txn      index into Ledger.transaction_ids
+    account  index into Ledger.account_ids (account ids are interned)
+    amount   signed cents, debits positive and credits negative
+    day      date ordinal of the transaction, 0 when it has none
+    status   POSTED or VOID, or REMOVED for rows of a deleted transaction
+
+Balances and filters run over those arrays with no dict lookups. When NumPy
+is installed they run as vectorized operations on zero-copy views of the
+same memory.
+
+The ledger is kept on the tenant as a derived object of transactions.json
+(see storage.Tenant). Writers that know what they changed pass an update to
+save_transactions; any other write rebuilds it on next use. An update is
+made to a copy, so a published ledger never changes while it is read.
+"""
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app import dates, money, storage
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover - optional dependency
+    numpy = None
+
+POSTED = 1
+VOID = 2
+REMOVED = 0
+
+STATUSES = {'posted': POSTED, 'void': VOID}
+
+class Ledger:
+    """Posted and voided transaction entries as parallel arrays"""
+
+    def __init__(self):
+        self.transaction_ids: List[str] = []
+        self.account_ids: List[str] = []
+        self.txn = array('i')
+        self.account = array('i')
+        self.amount = array('q')
+        self.day = array('i')
+        self.status = array('b')
+        self._accounts: Dict[str, int] = {}
+        # Transaction id -> (index, first row, row after the last)
+        self._transactions: Dict[str, Tuple[int, int, int]] = {}
+
+    @classmethod
+    def build(cls, transactions: Iterable[Dict]) -> 'Ledger':
+        ledger = cls()
+        for transaction in transactions:
+            ledger.add(transaction)
+        return ledger
+
+    def copy(self) -> 'Ledger':
+        """A ledger with its own columns, to change while readers keep using this one"""
+        ledger = Ledger.__new__(Ledger)
+        ledger.transaction_ids = list(self.transaction_ids)
+        ledger.account_ids = list(self.account_ids)
+        for column in ('txn', 'account', 'amount', 'day', 'status'):
+            setattr(ledger, column, getattr(self, column)[:])
+        ledger._accounts = dict(self._accounts)
+        ledger._transactions = dict(self._transactions)
+        return ledger
+
+    def __len__(self) -> int:
+        return len(self.amount)
+
+    def intern(self, account_id: str) -> int:
+        """The small integer standing for an account id"""
+        index = self._accounts.get(account_id)
+        if index is None:
+            index = self._accounts[account_id] = len(self.account_ids)
+            self.account_ids.append(account_id)
+        return index
+
+    def add(self, transaction: Dict) -> None:
+        """Append the entries of a posted or voided transaction; drafts are not part of the ledger"""
+        status = STATUSES.get(transaction.get('status'))
+        if status is None:
+            return
+        if transaction['id'] in self._transactions:
+            self.remove(transaction['id'])
+        index = len(self.transaction_ids)
+        self.transaction_ids.append(transaction['id'])
+        day = dates.day_of(transaction, 'date') or 0
+        start = len(self.amount)
+        for entry in transaction.get('entries', []):
+            cents = money.cents_of(entry, 'amount')
+            self.txn.append(index)
+            self.account.append(self.intern(entry.get('accountId', '')))
+            self.amount.append(cents if entry.get('type') == 'debit' else -cents)
+            self.day.append(day)
+            self.status.append(status)
+        self._transactions[transaction['id']] = (index, start, len(self.amount))
+
+    def _set_status(self, transaction_id: str, status: int) -> None:
+        _, start, stop = self._transactions[transaction_id]
+        for row in range(start, stop):
+            self.status[row] = status
+
+    def void(self, transaction_id: str) -> None:
+        if transaction_id in self._transactions:
+            self._set_status(transaction_id, VOID)
+
+    def remove(self, transaction_id: str) -> None:
+        """Drop a transaction's rows from every result; the rows stay in place until the next rebuild"""
+        if transaction_id in self._transactions:
+            self._set_status(transaction_id, REMOVED)
+            del self._transactions[transaction_id]
+
+    def rows(self, account_id: Optional[str] = None, start: Optional[int] = None, end: Optional[int] = None,
+             status: int = POSTED) -> List[int]:
+        """Rows of one status, optionally for one account and within inclusive day bounds"""
+        account = self._accounts.get(account_id, -1) if account_id is not None else None
+        if numpy is not None:
+            return self._mask(account, start, end, status).nonzero()[0].tolist()
+        return [
+            row for row, (a, d, s) in enumerate(zip(self.account, self.day, self.status))
+            if s == status and (account is None or a == account)
+            and (start is None or d >= start) and (end is None or d <= end)
+        ]
+
+    def balances(self, start: Optional[int] = None, end: Optional[int] = None,
+                 status: int = POSTED) -> Dict[str, int]:
+        """Net debit-positive cents per account, over rows within inclusive day bounds"""
+        if numpy is not None:
+            mask = self._mask(None, start, end, status)
+            totals = numpy.zeros(len(self.account_ids), dtype=numpy.int64)
+            numpy.add.at(totals, self._view(self.account, numpy.int32)[mask], self._view(self.amount, numpy.int64)[mask])
+            totals = totals.tolist()
+            touched = numpy.bincount(self._view(self.account, numpy.int32)[mask], minlength=len(self.account_ids)).tolist()
+        else:
+            totals = [0] * len(self.account_ids)
+            touched = [0] * len(self.account_ids)
+            for a, amount, d, s in zip(self.account, self.amount, self.day, self.status):
+                if s == status and (start is None or d >= start) and (end is None or d <= end):
+                    totals[a] += amount
+                    touched[a] += 1
+        return {self.account_ids[a]: totals[a] for a in range(len(totals)) if touched[a]}
+
+    @staticmethod
+    def _view(column: array, dtype):
+        return numpy.frombuffer(column, dtype=dtype) if len(column) else numpy.zeros(0, dtype=dtype)
+
+    def _mask(self, account: Optional[int], start: Optional[int], end: Optional[int], status: int):
+        mask = self._view(self.status, numpy.int8) == status
+        if account is not None:
+            mask &= self._view(self.account, numpy.int32) == account
+        if start is not None or end is not None:
+            day = self._view(self.day, numpy.int32)
+            if start is not None:
+                mask &= day >= start
+            if end is not None:
+                mask &= day <= end
+        return mask
+
+KIND = 'ledger'
+
+def current_ledger() -> Ledger:
+    """The ledger of the current tenant's transactions"""
+    from app.transactions.routes import TRANSACTIONS_FILE, iter_transactions
+    return storage.derived(KIND, (TRANSACTIONS_FILE,), lambda: Ledger.build(iter_transactions()))
@@ -0,0 +1,169 @@
+import atexit
+import contextvars
+import copy
+import json
+import logging
+import queue
+import re
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+
+from flask import Flask, g, request
+
+from app import storage
+
+# Every logger under this name is routed through the queue
+ROOT_LOGGER = 'app'
+
+# Client supplied request ids are only echoed back when they look sane
+REQUEST_ID_PATTERN = re.compile(r'^[A-Za-z0-9._:-]{1,128}$')
+
+# Attributes every LogRecord has; anything else came from extra={...}
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'request_id', 'tenant'}
+
+_request_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar('request_id', default=None)
+
+_listener: Optional[QueueListener] = None
+
+def current_request_id() -> Optional[str]:
+    """Return the id of the request being handled, if any"""
+    return _request_id.get()
+
+class JsonFormatter(logging.Formatter):
+    """Format a record as one JSON object per line"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        request_id = getattr(record, 'request_id', None)
+        if request_id:
+            entry['request_id'] = request_id
+        tenant = getattr(record, 'tenant', None)
+        if tenant:
+            entry['tenant'] = tenant
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+class ContextFilter(logging.Filter):
+    """Stamp records with the request id and company of the calling thread"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = _request_id.get()
+        record.tenant = storage.current_tenant().id
+        return True
+
+class _QueueHandler(QueueHandler):
+    """Hand records to the listener thread; only the message is resolved here
+
+    JSON formatting and the write itself happen on the listener thread, so a
+    slow terminal or pipe never blocks a request.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        # Tracebacks hold frames of the calling thread, so render them now
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+def configure(level: str = 'INFO', levels: Optional[Dict[str, str]] = None, stream=None) -> None:
+    """Route the app's loggers through a background writer; later calls only change levels"""
+    global _listener
+    logger = logging.getLogger(ROOT_LOGGER)
+    logger.setLevel(level)
+    for name, module_level in (levels or {}).items():
+        logging.getLogger(name).setLevel(module_level)
+    if _listener is not None:
+        return
+
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    handler = _QueueHandler(records)
+    handler.addFilter(ContextFilter())
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(JsonFormatter())
+
+    logger.addHandler(handler)
+    logger.propagate = False
+    _listener = QueueListener(records, output)
+    _listener.start()
+    atexit.register(shutdown)
+
+def shutdown() -> None:
+    """Write out everything still queued and stop the writer thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+class Logging:
+    """Structured JSON logs with request ids
+
+    Each request gets an id, taken from REQUEST_ID_HEADER when the client
+    sends one, which is attached to every record logged while handling it
+    and returned in the same header. Operations inside /api/batch share the
+    id of the batch request. Debug output is off unless a level says so.
+
+    Configuration keys (all optional):
+        LOG_LEVEL         - level of the app loggers, default INFO
+        LOG_LEVELS        - per module levels, e.g. {'app.invoices': 'DEBUG'}
+        REQUEST_ID_HEADER - header carrying the request id, default X-Request-Id
+    """
+
+    def __init__(self, app: Optional[Flask] = None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app: Flask) -> None:
+        app.config.setdefault('LOG_LEVEL', 'INFO')
+        app.config.setdefault('LOG_LEVELS', {})
+        app.config.setdefault('REQUEST_ID_HEADER', 'X-Request-Id')
+        configure(app.config['LOG_LEVEL'], app.config['LOG_LEVELS'])
+
+        self.header = app.config['REQUEST_ID_HEADER']
+        self.access = logging.getLogger(ROOT_LOGGER + '.access')
+        app.extensions['logging'] = self
+        app.before_request(self.before_request)
+        app.after_request(self.after_request)
+        app.teardown_request(self.teardown_request)
+
+    def before_request(self) -> None:
+        g._log_started = time.perf_counter()
+        # Batch operations keep the id of the batch request
+        if _request_id.get() is not None:
+            return
+        request_id = request.headers.get(self.header, '')
+        if not REQUEST_ID_PATTERN.match(request_id):
+            request_id = uuid.uuid4().hex
+        g._request_id_token = _request_id.set(request_id)
+
+    def after_request(self, response):
+        request_id = _request_id.get()
+        if request_id is not None and '_request_id_token' in g:
+            response.headers[self.header] = request_id
+        if self.access.isEnabledFor(logging.DEBUG):
+            self.access.debug('%s %s %s', request.method, request.path, response.status_code, extra={
+                'duration_ms': round((time.perf_counter() - g.get('_log_started', 0.0)) * 1000, 3)
+            })
+        return response
+
+    def teardown_request(self, exc=None) -> None:
+        token = g.pop('_request_id_token', None)
+        if token is not None:
+            _request_id.reset(token)
@@ -0,0 +1,5 @@
+from flask import Blueprint
+
+meta_bp = Blueprint('meta', __name__)
+
+# Routes are attached when app.blueprints imports the routes module
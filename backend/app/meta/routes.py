@@ -0,0 +1,24 @@
+from app.advanced.models import ADVANCED_ENUMS
+from app.chart_of_accounts.models import ACCOUNT_TYPE_DETAILS
+from app.company.models import COMPANY_ENUMS
+from app.estimates.models import ESTIMATE_STATUSES
+from app.invoices.models import INVOICE_STATUSES, PAYMENT_METHODS, PAYMENT_TERMS
+from app.precomputed import PrecomputedResponse
+from . import meta_bp
+
+# Every enumeration a form may need, encoded once at import
+META_RESPONSE = PrecomputedResponse({
+    'account_types': list(ACCOUNT_TYPE_DETAILS.keys()),
+    'detail_types': ACCOUNT_TYPE_DETAILS,
+    'invoice_statuses': INVOICE_STATUSES,
+    'payment_methods': PAYMENT_METHODS,
+    'payment_terms': PAYMENT_TERMS,
+    'estimate_statuses': ESTIMATE_STATUSES,
+    'company': COMPANY_ENUMS,
+    'advanced': ADVANCED_ENUMS
+})
+
+@meta_bp.route('', methods=['GET'])
+def get_meta():
+    """Get all reference data used by the forms in one response"""
+    return META_RESPONSE.response()
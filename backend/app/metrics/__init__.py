@@ -0,0 +1,5 @@
+from flask import Blueprint
+
+metrics_bp = Blueprint('metrics', __name__)
+
+# Routes are attached when app.blueprints imports the routes module
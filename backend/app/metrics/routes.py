@@ -0,0 +1,150 @@
+import logging
+from typing import Dict, List, Tuple
+
+from flask import Response, current_app, jsonify
+
+from app import storage
+from app.customers.models import CustomerRepository
+from app.instrumentation import unrecorded
+from . import metrics_bp
+
+logger = logging.getLogger(__name__)
+
+# Collection name -> (document, key of the list inside it)
+COLLECTIONS: Dict[str, Tuple[str, str]] = {
+    'invoices': ('invoices.json', 'invoices'),
+    'transactions': ('transactions.json', 'transactions'),
+    'accounts': ('chart_of_accounts.json', 'accounts'),
+    'customers': ('customers.json', 'customers'),
+    'estimates': ('estimates.json', 'estimates')
+}
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+def escape(value: str) -> str:
+    """Escape a label value for the text exposition format"""
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def format_value(value: float) -> str:
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+class Exposition:
+    """Build a Prometheus text format page one metric family at a time"""
+
+    def __init__(self):
+        self.lines: List[str] = []
+
+    def family(self, name: str, kind: str, help_text: str) -> None:
+        self.lines.append(f'# HELP {name} {help_text}')
+        self.lines.append(f'# TYPE {name} {kind}')
+
+    def sample(self, name: str, value: float, **labels: str) -> None:
+        if labels:
+            label_text = ','.join(f'{key}="{escape(str(val))}"' for key, val in labels.items())
+            self.lines.append(f'{name}{{{label_text}}} {format_value(value)}')
+        else:
+            self.lines.append(f'{name} {format_value(value)}')
+
+    def text(self) -> str:
+        return '\n'.join(self.lines) + '\n'
+
+def count(document: str, key: str) -> int:
+    data = storage.load_json(document)
+    return len(data.get(key, [])) if isinstance(data, dict) else 0
+
+def collection_sizes() -> Dict[str, int]:
+    """Number of records in each collection of the current company
+
+    Customers are counted in the customer repository, and every other
+    collection once per change to its document. The loads this takes are
+    left out of the storage and cache counters.
+    """
+    sizes = {}
+    with unrecorded():
+        for name, (document, key) in COLLECTIONS.items():
+            try:
+                if name == 'customers':
+                    sizes[name] = len(CustomerRepository.current().records)
+                else:
+                    sizes[name] = storage.derived('count:' + name, (document,), lambda: count(document, key), size=0)
+            except Exception as e:
+                logger.exception("Error counting %s for metrics: %s", name, e)
+    return sizes
+
+def ratio(hits: int, misses: int) -> float:
+    total = hits + misses
+    return hits / total if total else 0.0
+
+@metrics_bp.route('', methods=['GET'])
+def get_metrics():
+    """Expose request, storage, cache and collection metrics in Prometheus text format"""
+    instrumentation = current_app.extensions.get('instrumentation')
+    if instrumentation is None or not current_app.config.get('INSTRUMENTATION'):
+        return jsonify({'error': 'Instrumentation is disabled'}), 404
+
+    registry = instrumentation.metrics
+    snapshot = registry.snapshot()
+    out = Exposition()
+
+    out.family('http_request_duration_seconds', 'histogram', 'Time spent handling requests, by route')
+    for (endpoint, method), histogram in sorted(snapshot['latency'].items()):
+        for bound, count in zip(registry.buckets, histogram['buckets']):
+            out.sample('http_request_duration_seconds_bucket', count,
+                       endpoint=endpoint, method=method, le=format_value(bound))
+        out.sample('http_request_duration_seconds_bucket', histogram['count'],
+                   endpoint=endpoint, method=method, le='+Inf')
+        out.sample('http_request_duration_seconds_sum', histogram['sum'], endpoint=endpoint, method=method)
+        out.sample('http_request_duration_seconds_count', histogram['count'], endpoint=endpoint, method=method)
+
+    out.family('http_requests_total', 'counter', 'Requests handled, by route and status')
+    for (endpoint, method, status), count in sorted(snapshot['statuses'].items()):
+        out.sample('http_requests_total', count, endpoint=endpoint, method=method, status=str(status))
+
+    out.family('http_requests_in_flight', 'gauge', 'Requests currently being handled')
+    out.sample('http_requests_in_flight', snapshot['in_flight'])
+
+    counters = snapshot['storage']
+    out.family('storage_loads_total', 'counter', 'Documents loaded')
+    out.sample('storage_loads_total', counters['loads'])
+    out.family('storage_saves_total', 'counter', 'Documents written to disk')
+    out.sample('storage_saves_total', counters['saves'])
+    out.family('storage_read_bytes_total', 'counter', 'Size of the documents loaded')
+    out.sample('storage_read_bytes_total', counters['bytes_read'])
+    out.family('storage_written_bytes_total', 'counter', 'Bytes written to disk')
+    out.sample('storage_written_bytes_total', counters['bytes_written'])
+    out.family('storage_seconds_total', 'counter', 'Time spent in full-file I/O, by phase')
+    for phase, seconds in snapshot['storage_seconds'].items():
+        out.sample('storage_seconds_total', seconds, phase=phase)
+
+    # Hits and misses are exported as counters too, so ratios can be taken over any window
+    caches = {'document': (counters['cache_hits'], counters['loads'] - counters['cache_hits'])}
+    tenants = current_app.extensions.get('tenants')
+    if tenants is not None:
+        pool = tenants.pool.stats()
+        caches['tenant_pool'] = (pool['hits'], pool['misses'])
+    compress = current_app.extensions.get('compress')
+    if compress is not None:
+        caches['compression'] = (compress.cache.hits, compress.cache.misses)
+    out.family('cache_hits_total', 'counter', 'Cache lookups that were served from the cache')
+    for cache, (hits, _) in caches.items():
+        out.sample('cache_hits_total', hits, cache=cache)
+    out.family('cache_misses_total', 'counter', 'Cache lookups that fell through to the source')
+    for cache, (_, misses) in caches.items():
+        out.sample('cache_misses_total', misses, cache=cache)
+    out.family('cache_hit_ratio', 'gauge', 'Share of lookups served from the cache since start-up')
+    for cache, (hits, misses) in caches.items():
+        out.sample('cache_hit_ratio', ratio(hits, misses), cache=cache)
+
+    if tenants is not None:
+        out.family('tenant_pool_tenants', 'gauge', 'Companies with loaded state')
+        out.sample('tenant_pool_tenants', pool['tenants'])
+        out.family('tenant_pool_cached_bytes', 'gauge', 'Bytes of cached documents across companies')
+        out.sample('tenant_pool_cached_bytes', pool['cached_bytes'])
+
+    out.family('collection_size', 'gauge', 'Records in each collection of the selected company')
+    for collection, size in collection_sizes().items():
+        out.sample('collection_size', size, collection=collection)
+
+    return Response(out.text(), content_type=CONTENT_TYPE)
@@ -0,0 +1,48 @@
+"""Money as integer cents
+
+Amounts stay plain numbers in dollars in the API and in the stored fields
+the frontend reads. Each stored amount is written from a whole number of
+cents, which is also saved beside it under <field>_cents. Totals, balances,
+comparisons and summaries work on those integers, so they are exact and
+never build up float error. Records saved before cents existed have none,
+and cents_of derives them.
+"""
+from typing import Any, Dict
+
+SUFFIX = '_cents'
+
+def whole(cents: float) -> int:
+    """Round a float number of cents to an int, halves away from zero"""
+    # Rounding to 6 places first drops float noise, e.g. 1.005 * 100 == 100.49999999999999
+    cents = round(cents, 6)
+    return int(cents + 0.5) if cents >= 0 else -int(0.5 - cents)
+
+def to_cents(value: Any) -> int:
+    """Dollars (a number or numeric string) as whole cents"""
+    if value is None or value == '':
+        return 0
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value * 100
+    return whole(float(value) * 100)
+
+def from_cents(cents: int) -> float:
+    """The float nearest to a number of cents in dollars; to_cents gives the same cents back"""
+    return cents / 100
+
+def scale(cents: int, factor: float) -> int:
+    """Cents multiplied by a quantity or rate, rounded to whole cents"""
+    return cents if factor == 1 else whole(cents * factor)
+
+def stamp(record: Dict[str, Any], *fields: str) -> None:
+    """Round the given amount fields of a record to cents in place and write their _cents"""
+    for field in fields:
+        if field in record:
+            cents = record[field + SUFFIX] = to_cents(record[field])
+            record[field] = from_cents(cents)
+
+def cents_of(record: Dict[str, Any], field: str) -> int:
+    """The stored cents of an amount field, derived from the amount for records saved without them"""
+    cents = record.get(field + SUFFIX)
+    if cents is None:
+        return to_cents(record.get(field))
+    return cents
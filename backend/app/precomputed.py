@@ -0,0 +1,28 @@
+import hashlib
+import json
+from typing import Any
+
+from flask import Response, request
+
+# Reference data only changes with a deploy, which also changes the ETag
+DEFAULT_MAX_AGE = 24 * 60 * 60
+
+class PrecomputedResponse:
+    """A constant JSON body encoded once, served with a fixed ETag and cache headers"""
+
+    def __init__(self, data: Any, max_age: int = DEFAULT_MAX_AGE):
+        self.body = json.dumps(data, separators=(',', ':'), sort_keys=True).encode('utf-8')
+        self.etag = hashlib.sha256(self.body).hexdigest()[:32]
+        self.max_age = max_age
+
+    def response(self) -> Response:
+        """Build the response, or a 304 when the client already has this version"""
+        # Compressed responses carry a weak version of the same ETag
+        if request.if_none_match.contains_weak(self.etag):
+            response = Response(status=304)
+        else:
+            response = Response(self.body, mimetype='application/json')
+        response.set_etag(self.etag)
+        response.cache_control.public = True
+        response.cache_control.max_age = self.max_age
+        return response
@@ -0,0 +1,5 @@
+from flask import Blueprint
+
+profiles_bp = Blueprint('profiles', __name__)
+
+# Routes are attached when app.blueprints imports the routes module
@@ -0,0 +1,59 @@
+from typing import Optional, Tuple
+
+from flask import current_app, jsonify, request, send_from_directory
+
+from app.profiling import SORT_KEYS
+from . import profiles_bp
+
+def summary_args() -> Tuple[Optional[int], Optional[str], Optional[str]]:
+    """Parse limit and sort, returning (limit, sort, error)"""
+    try:
+        limit = int(request.args.get('limit', 10))
+    except ValueError:
+        return None, None, 'limit must be an integer'
+    if limit < 1:
+        return None, None, 'limit must be at least 1'
+    sort = request.args.get('sort', 'tottime')
+    if sort not in SORT_KEYS:
+        return None, None, f"sort must be one of: {', '.join(SORT_KEYS)}"
+    return limit, sort, None
+
+@profiles_bp.route('', methods=['GET'])
+def list_profiles():
+    """List profiled endpoints, slowest first, with their most expensive functions"""
+    profiler = current_app.extensions.get('profiler')
+    if profiler is None:
+        return jsonify({'error': 'Profiling is not configured'}), 404
+    limit, sort, error = summary_args()
+    if error:
+        return jsonify({'error': error}), 400
+
+    summaries = [profiler.summary(endpoint, limit, sort) for endpoint in profiler.endpoints()]
+    summaries = [s for s in summaries if s is not None]
+    summaries.sort(key=lambda s: s['avg_ms'], reverse=True)
+    return jsonify({'profiling': current_app.config['PROFILING'], 'endpoints': summaries})
+
+@profiles_bp.route('/<endpoint>', methods=['GET'])
+def get_endpoint_profiles(endpoint):
+    """Get the most expensive functions of one endpoint and its profile files"""
+    profiler = current_app.extensions.get('profiler')
+    if profiler is None:
+        return jsonify({'error': 'Profiling is not configured'}), 404
+    limit, sort, error = summary_args()
+    if error:
+        return jsonify({'error': error}), 400
+
+    summary = profiler.summary(endpoint, limit, sort)
+    if summary is None:
+        return jsonify({'error': 'No profiles for this endpoint'}), 404
+    summary['files'] = [path.rsplit('/', 1)[-1] for path in profiler.profile_files(endpoint)]
+    return jsonify(summary)
+
+@profiles_bp.route('/<endpoint>/<name>', methods=['GET'])
+def download_profile(endpoint, name):
+    """Download a raw profile for pstats or snakeviz"""
+    profiler = current_app.extensions.get('profiler')
+    if profiler is None:
+        return jsonify({'error': 'Profiling is not configured'}), 404
+    # send_from_directory refuses paths that escape the directory
+    return send_from_directory(profiler.endpoint_dir(endpoint), name, mimetype='application/octet-stream')
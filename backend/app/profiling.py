@@ -0,0 +1,166 @@
+import cProfile
+import logging
+import os
+import pstats
+import random
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from flask import Flask, g, request
+
+from app import storage
+
+logger = logging.getLogger(__name__)
+
+SORT_KEYS = ('tottime', 'cumtime', 'calls')
+
+# Endpoint names become directory names; a leading dot would allow '.' and '..'
+_UNSAFE = re.compile(r'^\.|[^A-Za-z0-9_.-]')
+
+class Profiler:
+    """Run a sample of requests under cProfile and keep the profiles per endpoint
+
+    Nothing is registered unless PROFILING is True, so the code can stay
+    deployed at no cost. When enabled, PROFILE_SAMPLE_RATE of requests are
+    profiled, plus any request that sends PROFILE_HEADER. Profiles are
+    written as PROFILE_DIR/<endpoint>/<timestamp>.prof (readable with
+    pstats or snakeviz) and summarised by /api/profiles.
+
+    At most one request is profiled at a time in a process. From Python 3.12
+    cProfile holds the one sys.monitoring profiler slot, so a second
+    profile cannot start while one runs. A request sampled meanwhile just
+    runs unprofiled. On 3.12+ the running profile also records any calls
+    other threads make while it is active.
+
+    Configuration keys (all optional):
+        PROFILING           - enable profiling, default False
+        PROFILE_SAMPLE_RATE - fraction of requests profiled, default 0.01
+        PROFILE_HEADER      - header that forces profiling, default X-Profile
+        PROFILE_DIR         - where profiles are written
+        PROFILE_KEEP        - profiles kept per endpoint, oldest removed first
+    """
+
+    def __init__(self, app: Optional[Flask] = None):
+        self.directory: Optional[str] = None
+        # Held by the request being profiled
+        self._active = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app: Flask) -> None:
+        app.config.setdefault('PROFILING', False)
+        app.config.setdefault('PROFILE_SAMPLE_RATE', 0.01)
+        app.config.setdefault('PROFILE_HEADER', 'X-Profile')
+        app.config.setdefault('PROFILE_DIR', os.path.join(storage.BASE_DIR, 'profiles'))
+        app.config.setdefault('PROFILE_KEEP', 50)
+
+        self.directory = app.config['PROFILE_DIR']
+        self.sample_rate = app.config['PROFILE_SAMPLE_RATE']
+        self.header = app.config['PROFILE_HEADER']
+        self.keep = app.config['PROFILE_KEEP']
+        app.extensions['profiler'] = self
+
+        if not app.config['PROFILING']:
+            return
+        app.before_request(self.before_request)
+        app.after_request(self.after_request)
+        app.teardown_request(self.teardown_request)
+
+    def should_profile(self) -> bool:
+        if request.endpoint is None:
+            return False
+        return self.header in request.headers or random.random() < self.sample_rate
+
+    def before_request(self) -> None:
+        # Batch operations fail to acquire too, and run inside the batch request's profile
+        if not self.should_profile() or not self._active.acquire(blocking=False):
+            return
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError as e:
+            # Another tool, e.g. a debugger or coverage, holds the profiler slot
+            logger.warning("Cannot profile request: %s", e)
+            self._active.release()
+            return
+        g._profile = profile
+
+    def _stop(self, profile: cProfile.Profile) -> None:
+        profile.disable()
+        self._active.release()
+
+    def after_request(self, response):
+        profile = g.pop('_profile', None)
+        if profile is None:
+            return response
+        self._stop(profile)
+        try:
+            name = self.save(request.endpoint, profile)
+            response.headers['X-Profile-Saved'] = name
+        except Exception as e:
+            logger.exception("Error saving profile: %s", e)
+        return response
+
+    def teardown_request(self, exc=None) -> None:
+        # Requests that failed before after_request still stop profiling
+        profile = g.pop('_profile', None)
+        if profile is not None:
+            self._stop(profile)
+
+    def endpoint_dir(self, endpoint: str) -> str:
+        """The directory of an endpoint's profiles, always inside PROFILE_DIR"""
+        return os.path.join(self.directory, _UNSAFE.sub('_', endpoint))
+
+    def save(self, endpoint: str, profile: cProfile.Profile) -> str:
+        """Write a profile and drop the oldest beyond PROFILE_KEEP; returns its file name"""
+        directory = self.endpoint_dir(endpoint)
+        os.makedirs(directory, exist_ok=True)
+        name = f'{time.time_ns()}.prof'
+        profile.dump_stats(os.path.join(directory, name))
+
+        names = sorted(f for f in os.listdir(directory) if f.endswith('.prof'))
+        for old in names[:max(0, len(names) - self.keep)]:
+            try:
+                os.remove(os.path.join(directory, old))
+            except OSError:
+                pass
+        return name
+
+    def profile_files(self, endpoint: str) -> List[str]:
+        directory = self.endpoint_dir(endpoint)
+        if not os.path.isdir(directory):
+            return []
+        return sorted(os.path.join(directory, f) for f in os.listdir(directory) if f.endswith('.prof'))
+
+    def endpoints(self) -> List[str]:
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(d for d in os.listdir(self.directory) if os.path.isdir(os.path.join(self.directory, d)))
+
+    def summary(self, endpoint: str, limit: int = 10, sort: str = 'tottime') -> Optional[Dict[str, Any]]:
+        """Merge an endpoint's profiles and list its most expensive functions"""
+        files = self.profile_files(endpoint)
+        if not files:
+            return None
+        stats = pstats.Stats(*files)
+        functions = []
+        for (filename, line, function), (primitive, calls, tottime, cumtime, _) in stats.stats.items():
+            functions.append({
+                'function': function,
+                'file': filename,
+                'line': line,
+                'calls': calls,
+                'primitive_calls': primitive,
+                'tottime_ms': round(tottime * 1000, 3),
+                'cumtime_ms': round(cumtime * 1000, 3)
+            })
+        key = {'tottime': 'tottime_ms', 'cumtime': 'cumtime_ms', 'calls': 'calls'}[sort]
+        functions.sort(key=lambda f: f[key], reverse=True)
+        return {
+            'endpoint': _UNSAFE.sub('_', endpoint),
+            'profiles': len(files),
+            'avg_ms': round(stats.total_tt * 1000 / len(files), 3),
+            'functions': functions[:limit]
+        }
@@ -0,0 +1,182 @@
+"""Invoices and estimates by customer, with each customer's receivable balance
+
+Invoices and estimates carry the id of the customer they are for. The
+Receivables index keeps, for every customer, a statement line per invoice
+and estimate (ids, numbers, dates, status and amounts) and the total still
+owed on their open invoices. A customer statement reads straight from it,
+however many invoices exist.
+
+Records saved before customer ids existed are linked by matching
+customer_name against customers' full and company names; a name that
+matches no customer, or several, stays unlinked.
+
+The index is kept on the tenant as a derived object of invoices.json and
+estimates.json (see storage.Tenant). Writers that know which document they
+changed pass an update to save_invoices or save_estimates. When the
+customers change, only the records linked by name are linked again.
+"""
+from typing import Any, Dict, List, Optional
+
+from app import money, storage
+from app.customers.models import CustomerRepository
+
+KIND = 'receivables'
+INVOICES_FILE = 'invoices.json'
+ESTIMATES_FILE = 'estimates.json'
+FILES = (INVOICES_FILE, ESTIMATES_FILE)
+
+# Invoices in these statuses are not owed
+CLOSED_STATUSES = ('draft', 'void')
+
+INVOICE_LINE_FIELDS = (
+    'id', 'invoice_no', 'invoice_date', 'invoice_date_ordinal', 'due_date', 'due_date_ordinal',
+    'status', 'total_amount', 'total_amount_cents', 'balance_due', 'balance_due_cents'
+)
+ESTIMATE_LINE_FIELDS = (
+    'id', 'estimate_no', 'estimate_date', 'estimate_date_ordinal', 'status', 'total_amount', 'total_amount_cents'
+)
+
+def link_customer(record: Dict[str, Any]) -> Optional[str]:
+    """Set the customer_id of an invoice or estimate being written
+
+    A given customer_id must exist, and fills in customer_name when that is
+    empty. Otherwise customer_name is resolved to a customer where it can
+    be. Returns an error message, or None.
+    """
+    repository = CustomerRepository.current()
+    customer_id = record.get('customer_id')
+    if customer_id:
+        customer = repository.by_id.get(customer_id)
+        if customer is None:
+            return f'Customer {customer_id} not found'
+        if not record.get('customer_name'):
+            record['customer_name'] = customer.display_name
+        return None
+    customer = repository.resolve(record.get('customer_name', ''))
+    record['customer_id'] = customer.id if customer is not None else None
+    return None
+
+def open_cents(line: Dict[str, Any]) -> int:
+    """What the customer still owes on an invoice"""
+    return 0 if line['status'] in CLOSED_STATUSES else line['balance_due_cents']
+
+class Receivables:
+    """Statement lines and open balance of every customer with invoices or estimates"""
+
+    def __init__(self, repository: CustomerRepository):
+        self.repository = repository
+        # Customer id -> document id -> statement line
+        self.invoices: Dict[str, Dict[str, Dict]] = {}
+        self.estimates: Dict[str, Dict[str, Dict]] = {}
+        # Document id -> customer id
+        self._invoice_customer: Dict[str, str] = {}
+        self._estimate_customer: Dict[str, str] = {}
+        # Customer id -> cents owed on open invoices
+        self.balances: Dict[str, int] = {}
+        # Document id -> line and customer_name of records without a customer_id
+        self._named_invoices: Dict[str, Dict] = {}
+        self._named_estimates: Dict[str, Dict] = {}
+
+    @classmethod
+    def build(cls, invoices: List[Dict], estimates: List[Dict], repository: CustomerRepository) -> 'Receivables':
+        receivables = cls(repository)
+        for invoice in invoices:
+            receivables.put_invoice(invoice)
+        for estimate in estimates:
+            receivables.put_estimate(estimate)
+        return receivables
+
+    def copy(self) -> 'Receivables':
+        receivables = Receivables(self.repository)
+        receivables.invoices = {customer_id: dict(lines) for customer_id, lines in self.invoices.items()}
+        receivables.estimates = {customer_id: dict(lines) for customer_id, lines in self.estimates.items()}
+        receivables._invoice_customer = dict(self._invoice_customer)
+        receivables._estimate_customer = dict(self._estimate_customer)
+        receivables.balances = dict(self.balances)
+        receivables._named_invoices = dict(self._named_invoices)
+        receivables._named_estimates = dict(self._named_estimates)
+        return receivables
+
+    def relink(self, repository: CustomerRepository) -> None:
+        """Resolve the records linked by name against changed customers"""
+        self.repository = repository
+        for invoice in list(self._named_invoices.values()):
+            self.put_invoice(invoice)
+        for estimate in list(self._named_estimates.values()):
+            self.put_estimate(estimate)
+
+    def customer_of(self, record: Dict[str, Any]) -> Optional[str]:
+        customer_id = record.get('customer_id')
+        if customer_id:
+            return customer_id
+        customer = self.repository.resolve(record.get('customer_name', ''))
+        return customer.id if customer is not None else None
+
+    def put_invoice(self, invoice: Dict[str, Any]) -> None:
+        """Add or replace an invoice's line and its share of the balance"""
+        self.remove_invoice(invoice['id'])
+        line = {field: invoice.get(field) for field in INVOICE_LINE_FIELDS}
+        line['total_amount_cents'] = money.cents_of(invoice, 'total_amount')
+        line['balance_due_cents'] = money.cents_of(invoice, 'balance_due')
+        if not invoice.get('customer_id'):
+            self._named_invoices[invoice['id']] = dict(line, customer_name=invoice.get('customer_name', ''))
+        customer_id = self.customer_of(invoice)
+        if customer_id is None:
+            return
+        self.invoices.setdefault(customer_id, {})[invoice['id']] = line
+        self._invoice_customer[invoice['id']] = customer_id
+        self.balances[customer_id] = self.balances.get(customer_id, 0) + open_cents(line)
+
+    def remove_invoice(self, invoice_id: str) -> None:
+        self._named_invoices.pop(invoice_id, None)
+        customer_id = self._invoice_customer.pop(invoice_id, None)
+        if customer_id is None:
+            return
+        line = self.invoices[customer_id].pop(invoice_id)
+        self.balances[customer_id] -= open_cents(line)
+
+    def put_estimate(self, estimate: Dict[str, Any]) -> None:
+        self.remove_estimate(estimate['id'])
+        line = {field: estimate.get(field) for field in ESTIMATE_LINE_FIELDS}
+        line['total_amount_cents'] = money.cents_of(estimate, 'total_amount')
+        if not estimate.get('customer_id'):
+            self._named_estimates[estimate['id']] = dict(line, customer_name=estimate.get('customer_name', ''))
+        customer_id = self.customer_of(estimate)
+        if customer_id is None:
+            return
+        self.estimates.setdefault(customer_id, {})[estimate['id']] = line
+        self._estimate_customer[estimate['id']] = customer_id
+
+    def remove_estimate(self, estimate_id: str) -> None:
+        self._named_estimates.pop(estimate_id, None)
+        customer_id = self._estimate_customer.pop(estimate_id, None)
+        if customer_id is not None:
+            del self.estimates[customer_id][estimate_id]
+
+    def statement(self, customer_id: str) -> Dict[str, Any]:
+        """A customer's invoices and estimates, oldest first, and what they owe"""
+        invoices = sorted(self.invoices.get(customer_id, {}).values(), key=lambda l: l['invoice_date_ordinal'] or 0)
+        estimates = sorted(self.estimates.get(customer_id, {}).values(), key=lambda l: l['estimate_date_ordinal'] or 0)
+        balance_cents = self.balances.get(customer_id, 0)
+        return {
+            'invoices': invoices,
+            'estimates': estimates,
+            'open_invoice_count': sum(1 for line in invoices if open_cents(line)),
+            'balance': money.from_cents(balance_cents),
+            'balance_cents': balance_cents
+        }
+
+def _build() -> Receivables:
+    from app.estimates.routes import load_estimates
+    from app.invoices.routes import load_invoices
+    return Receivables.build(
+        load_invoices().get('invoices', []), load_estimates().get('estimates', []), CustomerRepository.current()
+    )
+
+def current() -> Receivables:
+    """The current tenant's index"""
+    receivables = storage.derived(KIND, FILES, _build)
+    repository = CustomerRepository.current()
+    if receivables.repository is not repository:
+        receivables = storage.revise_derived(KIND, receivables, lambda r: r.relink(repository))
+    return receivables
@@ -0,0 +1,39 @@
+"""Lazy views over stored records
+
+Routes work on the plain dicts storage hands back. A view wraps one of
+those dicts in place instead of converting it to a model and back: reads
+go straight to the dict, derived values are computed only when asked for,
+and writes change just the fields being edited.
+"""
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+from app import dates
+
+class RecordView:
+    """Attribute access over a stored record, which the view shares rather than copies"""
+    __slots__ = ('data',)
+
+    # Field stamped on every write, or None for records without one
+    touch: Optional[str] = 'updated_at'
+    # Date fields normalized, with their ordinals, whenever they are written
+    date_fields: Tuple[str, ...] = ()
+
+    def __init__(self, data: Dict[str, Any]):
+        self.data = data
+
+    def __getattr__(self, name: str) -> Any:
+        try:
+            return self.data[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def set(self, **changes: Any) -> None:
+        """Write only the given fields"""
+        dates.stamp(changes, *self.date_fields)
+        self.data.update(changes)
+        if self.touch:
+            self.data[self.touch] = datetime.utcnow().isoformat()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return self.data
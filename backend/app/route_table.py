@@ -0,0 +1,107 @@
+"""URL rules of every blueprint, as declared in its routes module
+
+Generated by scripts/generate_route_table.py from the route decorators, so
+create_app can add the rules without importing any routes module. Run the
+script again after adding, removing or changing a route.
+"""
+from typing import Dict, List, Optional, Tuple
+
+# Routes module -> (rule within the blueprint, view function, methods) of each route
+ROUTES: Dict[str, List[Tuple[str, str, Optional[List[str]]]]] = {
+    'app.advanced.routes': [
+        ('/get_advanced', 'get_advanced', ['GET']),
+        ('/create_advanced', 'create_advanced', ['POST']),
+        ('/update_advanced', 'update_advanced', ['PATCH']),
+        ('/delete_advanced', 'delete_advanced', ['DELETE']),
+        ('/get_field_options', 'get_field_options', ['GET']),
+    ],
+    'app.batch.routes': [
+        ('', 'run_batch', ['POST']),
+    ],
+    'app.chart_of_accounts.routes': [
+        ('/create_account', 'create_account', ['POST']),
+        ('/list_accounts', 'list_accounts', ['GET']),
+        ('/get/<account_id>', 'get_account', ['GET']),
+        ('/update/<account_id>', 'update_account', ['PATCH']),
+        ('/delete_account/<account_id>', 'delete_account', ['DELETE']),
+        ('/account_types', 'get_account_types', ['GET']),
+        ('/detail-types/<account_type>', 'get_detail_types', ['GET']),
+        ('/update-balance/<account_id>', 'update_account_balance', ['POST']),
+        ('/validate-transaction/<account_id>', 'validate_account_transaction', ['POST']),
+    ],
+    'app.changes.routes': [
+        ('', 'list_changes', ['GET']),
+    ],
+    'app.company.routes': [
+        ('/create_company', 'create_company', ['POST']),
+        ('/get_company', 'get_company', ['GET']),
+        ('/update_company', 'update_company', ['PATCH']),
+        ('/delete_company', 'delete_company', ['DELETE']),
+        ('/get_field_options', 'get_field_options', ['GET']),
+    ],
+    'app.customers.routes': [
+        ('/list_customers', 'get_customers', ['GET']),
+        ('/get_customer/<customer_id>', 'get_customer', ['GET']),
+        ('/create_customer', 'create_customer', ['POST']),
+        ('/update_customer/<customer_id>', 'update_customer', ['PUT']),
+        ('/delete_customer/<customer_id>', 'delete_customer', ['DELETE']),
+        ('/<customer_id>/statement', 'get_customer_statement', ['GET']),
+        ('/next_number', 'get_next_customer_number', ['GET']),
+        ('/summary', 'get_customer_summary', ['GET']),
+    ],
+    'app.estimates.routes': [
+        ('/status_types', 'get_status_types', ['GET']),
+        ('/next_number', 'get_next_number', ['GET']),
+        ('/create_estimate', 'create_estimate', ['POST']),
+        ('/list_estimates', 'list_estimates', ['GET']),
+        ('/get_estimate/<id>', 'get_estimate', ['GET']),
+        ('/update_estimate/<id>', 'update_estimate', ['PATCH']),
+        ('/delete_estimate/<id>', 'delete_estimate', ['DELETE']),
+        ('/convert_to_invoice/<id>', 'convert_to_invoice', ['POST']),
+    ],
+    'app.events.routes': [
+        ('/stream', 'stream_events', ['GET']),
+    ],
+    'app.invoices.routes': [
+        ('/status_types', 'get_status_types', ['GET']),
+        ('/next_number', 'get_next_number', ['GET']),
+        ('/create_invoice', 'create_invoice', ['POST']),
+        ('/update_invoice/<string:id>', 'update_invoice', ['PATCH']),
+        ('/delete_invoice/<string:id>', 'delete_invoice', ['DELETE']),
+        ('/get_invoice/<string:id>', 'get_invoice', ['GET']),
+        ('/list_invoices', 'list_invoices', ['GET']),
+        ('/get_summary', 'get_summary', ['GET']),
+        ('/add_payment/<string:id>', 'add_payment', ['POST']),
+        ('/get_payments/<string:id>', 'get_payments', ['GET']),
+        ('/void_invoice/<string:id>', 'void_invoice', ['POST']),
+    ],
+    'app.meta.routes': [
+        ('', 'get_meta', ['GET']),
+    ],
+    'app.profiles.routes': [
+        ('', 'list_profiles', ['GET']),
+        ('/<endpoint>', 'get_endpoint_profiles', ['GET']),
+        ('/<endpoint>/<name>', 'download_profile', ['GET']),
+    ],
+    'app.search.routes': [
+        ('/suggest', 'get_suggestions', ['GET']),
+    ],
+    'app.stats.routes': [
+        ('', 'get_stats', ['GET']),
+        ('', 'reset_stats', ['DELETE']),
+    ],
+    'app.transactions.routes': [
+        ('/list', 'list_transactions', ['GET']),
+        ('/export', 'export_transactions', ['GET']),
+        ('/balances', 'get_balances', ['GET']),
+        ('/create', 'create_transaction', ['POST']),
+        ('/get/<transaction_id>', 'get_transaction', ['GET']),
+        ('/patch/<transaction_id>', 'patch_transaction', ['PATCH']),
+        ('/delete/<transaction_id>', 'delete_transaction', ['DELETE']),
+        ('/post/<transaction_id>', 'post_transaction', ['POST']),
+        ('/void/<transaction_id>', 'void_transaction', ['POST']),
+    ],
+    'app.metrics.routes': [
+        ('', 'get_metrics', ['GET']),
+    ],
+}
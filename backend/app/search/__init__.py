@@ -0,0 +1,5 @@
+from flask import Blueprint
+
+search_bp = Blueprint('search', __name__)
+
+# Routes are attached when app.blueprints imports the routes module
@@ -0,0 +1,130 @@
+"""Prefix indexes for typeahead over customers, accounts and document numbers
+
+Each source has one PrefixIndex: sorted lowercase keys with a parallel list
+of the suggestion each key belongs to. Keys are a suggestion's label and
+every later word of it, plus any other text it may be looked up by, so "lee"
+finds "Ann Lee" and "acme" finds her through her company. A query is two
+bisects into the keys and a walk over the run of keys that start with the
+query, which stops as soon as enough suggestions are found.
+
+Each source's index is kept on the tenant as a derived object of its
+document (see storage.Tenant), so a write re-indexes that source alone.
+"""
+import bisect
+import heapq
+import itertools
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Tuple
+
+from app import storage
+from app.customers.models import Customer, CustomerRepository
+
+# Suggestion type -> (document it is built from, function listing (texts, suggestion) pairs)
+Source = Tuple[str, Callable[[], Iterable[Tuple[Iterable[str], Dict[str, Any]]]]]
+
+def normalize(text: str) -> str:
+    """Lowercase with single spaces, as keys and queries are compared"""
+    return ' '.join(str(text).lower().split())
+
+def word_keys(text: str) -> List[str]:
+    """The normalized text and the part of it starting at each later word"""
+    text = normalize(text)
+    keys = [text] if text else []
+    for position, char in enumerate(text):
+        if char == ' ':
+            keys.append(text[position + 1:])
+    return keys
+
+class PrefixIndex:
+    """Suggestions found by any prefix of their keys"""
+
+    def __init__(self, items: Iterable[Tuple[Iterable[str], Dict[str, Any]]]):
+        self.suggestions: List[Dict[str, Any]] = []
+        pairs = []
+        for texts, suggestion in items:
+            position = len(self.suggestions)
+            self.suggestions.append(suggestion)
+            keys = set()
+            for text in texts:
+                if text:
+                    keys.update(word_keys(text))
+            pairs.extend((key, position) for key in keys)
+        pairs.sort()
+        self.keys = [key for key, _ in pairs]
+        self.positions = [position for _, position in pairs]
+
+    def __len__(self) -> int:
+        return len(self.suggestions)
+
+    def matches(self, prefix: str) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """(key, suggestion) for every suggestion with a key starting with prefix, in key order"""
+        start = bisect.bisect_left(self.keys, prefix)
+        # Every key starting with prefix sorts before prefix followed by the highest code point
+        stop = bisect.bisect_left(self.keys, prefix + '\U0010ffff', start)
+        seen = set()
+        for i in range(start, stop):
+            position = self.positions[i]
+            if position not in seen:
+                seen.add(position)
+                yield self.keys[i], self.suggestions[position]
+
+def _customers():
+    for customer in CustomerRepository.current().by_id.values():
+        yield (customer.display_name, customer.company_name, customer.email, customer.customer_no), {
+            'type': 'customer',
+            'id': customer.id,
+            'label': customer.display_name,
+            'detail': customer.company_name or customer.email
+        }
+
+def _accounts():
+    from app.chart_of_accounts.routes import load_accounts
+    for account in load_accounts().get('accounts', []):
+        yield (account.get('name'), account.get('id')), {
+            'type': 'account',
+            'id': account.get('id'),
+            'label': account.get('name'),
+            'detail': account.get('accountType'),
+            'active': account.get('active', True)
+        }
+
+def _invoices():
+    from app.invoices.routes import load_invoices
+    for invoice in load_invoices().get('invoices', []):
+        yield (invoice.get('invoice_no'),), {
+            'type': 'invoice',
+            'id': invoice.get('id'),
+            'label': invoice.get('invoice_no'),
+            'detail': invoice.get('customer_name'),
+            'status': invoice.get('status')
+        }
+
+def _estimates():
+    from app.estimates.routes import load_estimates
+    for estimate in load_estimates().get('estimates', []):
+        yield (estimate.get('estimate_no'),), {
+            'type': 'estimate',
+            'id': estimate.get('id'),
+            'label': estimate.get('estimate_no'),
+            'detail': estimate.get('customer_name'),
+            'status': estimate.get('status')
+        }
+
+SOURCES: Dict[str, Source] = {
+    'customer': (Customer.DATA_FILE, _customers),
+    'account': ('chart_of_accounts.json', _accounts),
+    'invoice': ('invoices.json', _invoices),
+    'estimate': ('estimates.json', _estimates),
+}
+
+def index_for(kind: str) -> PrefixIndex:
+    """The current tenant's index of one suggestion type"""
+    name, items = SOURCES[kind]
+    return storage.derived('search:' + kind, (name,), lambda: PrefixIndex(items()))
+
+def suggest(query: str, kinds: Iterable[str], limit: int) -> List[Dict[str, Any]]:
+    """Up to limit suggestions of the given types with a key starting with query, in key order"""
+    prefix = normalize(query)
+    if not prefix:
+        return []
+    merged = heapq.merge(*(index_for(kind).matches(prefix) for kind in kinds), key=lambda match: match[0])
+    return [suggestion for _, suggestion in itertools.islice(merged, limit)]
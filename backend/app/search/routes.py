@@ -0,0 +1,23 @@
+from flask import jsonify, request
+
+from . import search_bp
+from .index import SOURCES, suggest
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+
+@search_bp.route('/suggest', methods=['GET'])
+def get_suggestions():
+    """Typeahead: customers, accounts, invoices and estimates with a name, email or number starting with q"""
+    query = request.args.get('q', '')
+    kinds = [kind.strip() for kind in request.args.get('types', ','.join(SOURCES)).split(',') if kind.strip()]
+    unknown = [kind for kind in kinds if kind not in SOURCES]
+    if unknown:
+        return jsonify({'error': f"Unknown suggestion types: {', '.join(unknown)}; expected {', '.join(SOURCES)}"}), 400
+    try:
+        limit = int(request.args.get('limit', DEFAULT_LIMIT))
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+    limit = max(1, min(limit, MAX_LIMIT))
+
+    return jsonify({'query': query, 'suggestions': suggest(query, kinds, limit)})
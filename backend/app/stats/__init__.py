@@ -0,0 +1,5 @@
+from flask import Blueprint
+
+stats_bp = Blueprint('stats', __name__)
+
+# Routes are attached when app.blueprints imports the routes module
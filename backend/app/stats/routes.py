@@ -0,0 +1,31 @@
+from flask import current_app, jsonify
+
+from . import stats_bp
+
+@stats_bp.route('', methods=['GET'])
+def get_stats():
+    """Get per endpoint time, I/O and model totals since start-up or the last reset"""
+    instrumentation = current_app.extensions.get('instrumentation')
+    if instrumentation is None or not current_app.config.get('INSTRUMENTATION'):
+        return jsonify({'error': 'Instrumentation is disabled'}), 404
+
+    stats = {
+        'since': instrumentation.endpoints.since.isoformat(),
+        'endpoints': instrumentation.endpoints.snapshot()
+    }
+    tenants = current_app.extensions.get('tenants')
+    if tenants is not None:
+        stats['tenant_pool'] = tenants.pool.stats()
+    compress = current_app.extensions.get('compress')
+    if compress is not None:
+        stats['compression_cache'] = {'hits': compress.cache.hits, 'misses': compress.cache.misses}
+    return jsonify(stats)
+
+@stats_bp.route('', methods=['DELETE'])
+def reset_stats():
+    """Reset the per endpoint totals"""
+    instrumentation = current_app.extensions.get('instrumentation')
+    if instrumentation is None:
+        return jsonify({'error': 'Instrumentation is disabled'}), 404
+    instrumentation.endpoints.reset()
+    return jsonify({'message': 'Stats reset'})
@@ -0,0 +1,487 @@
+import contextvars
+import json
+import logging
+import os
+import pickle
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+from app.instrumentation import record_load, record_save, record_serialize
+
+logger = logging.getLogger(__name__)
+
+# Default data directory, used when no tenant is selected
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(BASE_DIR, 'data')
+
+# Lock held by a request that writes, from its first load to its last save; see Tenant.lock
+ALL_DOCUMENTS = '*'
+
+# Documents larger than this are parsed on every load instead of cached
+DEFAULT_MAX_CACHED_DOCUMENT = 16 * 1024 * 1024
+
+# The mtime and size of each document a derived object was built from
+FilesKey = Tuple[Optional[Tuple[int, int]], ...]
+
+class Tenant:
+    """A company's data directory and a cache of its parsed documents
+
+    Documents are cached as pickles, which load several times faster than
+    JSON and always hand out a fresh object, so handlers can keep mutating
+    what they load. An entry is only used while the file's mtime and size
+    are unchanged.
+
+    The tenant also keeps derived objects, such as the ledger and the
+    customer indexes, each under a kind and with the documents it was built
+    from. One is used while none of those documents changed, and counts
+    toward size with the combined size of its documents.
+    """
+
+    def __init__(self, tenant_id: Optional[str], root: str, max_cached_document: int = DEFAULT_MAX_CACHED_DOCUMENT):
+        self.id = tenant_id
+        self.root = root
+        self.max_cached_document = max_cached_document
+        self.size = 0
+        self.on_resize: Optional[Callable[['Tenant', int], None]] = None
+        self._documents: Dict[str, Tuple[Tuple[int, int], bytes]] = {}
+        self._lock = threading.Lock()
+        # Kind -> (documents it was built from, their FilesKey, object, bytes it counts for or None)
+        self._derived: Dict[str, Tuple[Tuple[str, ...], FilesKey, Any, Optional[int]]] = {}
+        self._derived_lock = threading.RLock()
+        self._locks: Dict[str, threading.Lock] = {}
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.root, name)
+
+    def file_key(self, name: str) -> Optional[Tuple[int, int]]:
+        """The mtime and size of a document on disk, or None when it does not exist"""
+        try:
+            stat = os.stat(self.path(name))
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def files_key(self, names: Tuple[str, ...]) -> FilesKey:
+        return tuple(self.file_key(name) for name in names)
+
+    def _resize(self, delta: int) -> None:
+        if delta and self.on_resize is not None:
+            self.on_resize(self, delta)
+
+    def _store(self, name: str, key: Optional[Tuple[int, int]], blob: Optional[bytes]) -> None:
+        with self._lock:
+            previous = self._documents.pop(name, None)
+            delta = -len(previous[1]) if previous else 0
+            if key is not None and blob is not None and len(blob) <= self.max_cached_document:
+                self._documents[name] = (key, blob)
+                delta += len(blob)
+            self.size += delta
+        self._resize(delta)
+
+    def read(self, name: str) -> Any:
+        key = self.file_key(name)
+        if key is None:
+            return None
+        entry = self._documents.get(name)
+        if entry is not None and entry[0] == key:
+            started = time.perf_counter()
+            data = pickle.loads(entry[1])
+            record_load(key[1], 0.0, time.perf_counter() - started, cached=True)
+            return data
+        started = time.perf_counter()
+        with open(self.path(name), 'rb') as f:
+            raw = f.read()
+        read_at = time.perf_counter()
+        data = json.loads(raw)
+        record_load(len(raw), read_at - started, time.perf_counter() - read_at, cached=False)
+        self._store(name, key, pickle.dumps(data, pickle.HIGHEST_PROTOCOL))
+        return data
+
+    def stage(self, name: str, text: str) -> str:
+        """Write a document's new text to a file beside it, for replace() to put in place"""
+        path = self.path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        started = time.perf_counter()
+        try:
+            with open(temp, 'w') as f:
+                f.write(text)
+        except BaseException:
+            self.discard(temp)
+            raise
+        record_save(len(text), time.perf_counter() - started)
+        return temp
+
+    def replace(self, name: str, temp: str) -> None:
+        os.replace(temp, self.path(name))
+        # Re-parsed on the next load so the cache always matches the JSON on disk
+        self._store(name, None, None)
+
+    @staticmethod
+    def discard(temp: str) -> None:
+        try:
+            os.remove(temp)
+        except OSError:
+            pass
+
+    def write(self, name: str, text: str) -> None:
+        """Replace a document; readers see its old or its new text, never part of either"""
+        self.replace(name, self.stage(name, text))
+
+    def _set_derived(self, kind: str, entry: Optional[Tuple[Tuple[str, ...], FilesKey, Any, Optional[int]]]) -> None:
+        with self._derived_lock:
+            previous = self._derived.pop(kind, None)
+            delta = -_charge(previous) if previous else 0
+            if entry is not None:
+                self._derived[kind] = entry
+                delta += _charge(entry)
+            with self._lock:
+                self.size += delta
+        self._resize(delta)
+
+    def derived(self, kind: str, names: Tuple[str, ...], build: Callable[[], Any], size: Optional[int] = None) -> Any:
+        """The object of a kind built from some documents, rebuilt if any of them changed since it was built
+
+        size is the bytes the object counts for, when not the combined size of its documents.
+        """
+        key = self.files_key(names)
+        with self._derived_lock:
+            entry = self._derived.get(kind)
+            if entry is not None and entry[1] == key:
+                return entry[2]
+        value = build()
+        # A write during the build may have been missed
+        if key == self.files_key(names):
+            self._set_derived(kind, (names, key, value, size))
+        return value
+
+    def update_derived(self, kind: str, name: str, before: Optional[Tuple[int, int]],
+                       update: Callable[[Any], None]) -> None:
+        """Apply a writer's change to a derived object, if it was built from the document the writer replaced
+
+        The change is made to the object's copy(), which then replaces it, so
+        readers still holding the object never see it half changed.
+        """
+        with self._derived_lock:
+            entry = self._derived.get(kind)
+            if entry is None:
+                return
+            names, key, value, size = entry
+            position = names.index(name)
+            if before is None or key[position] != before:
+                # Something else wrote the document in between; rebuild on next use
+                self._set_derived(kind, None)
+                return
+            try:
+                value = value.copy()
+                update(value)
+            except Exception as e:
+                logger.exception("Error updating %s, it will be rebuilt: %s", kind, e)
+                self._set_derived(kind, None)
+                return
+            key = key[:position] + (self.file_key(name),) + key[position + 1:]
+            self._set_derived(kind, (names, key, value, size))
+
+    def revise_derived(self, kind: str, value: Any, update: Callable[[Any], None]) -> Any:
+        """Apply a change to a copy of a derived object; the copy replaces the object if that is still kept"""
+        changed = value.copy()
+        update(changed)
+        with self._derived_lock:
+            entry = self._derived.get(kind)
+            if entry is not None and entry[2] is value:
+                self._set_derived(kind, (entry[0], entry[1], changed, entry[3]))
+        return changed
+
+    def forget_derived(self, kind: str) -> None:
+        self._set_derived(kind, None)
+
+    def append(self, name: str, text: str) -> None:
+        """Add text to the end of a document, creating it if needed"""
+        path = self.path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        started = time.perf_counter()
+        with open(path, 'a') as f:
+            f.write(text)
+        record_save(len(text), time.perf_counter() - started)
+        self._store(name, None, None)
+
+    def lock(self, name: str) -> threading.Lock:
+        """The lock writers of one of this tenant's documents hold while they read and write it
+
+        ALL_DOCUMENTS names the lock a request that writes holds for its whole run.
+        """
+        with self._lock:
+            return self._locks.setdefault(name, threading.Lock())
+
+    def clear(self) -> None:
+        """Drop every cached document and derived object"""
+        with self._derived_lock:
+            self._derived.clear()
+            with self._lock:
+                delta, self.size = -self.size, 0
+                self._documents.clear()
+        self._resize(delta)
+
+def _charge(entry: Tuple[Tuple[str, ...], FilesKey, Any, Optional[int]]) -> int:
+    """Bytes a derived object counts for: its given size, or the combined size of its documents"""
+    if entry[3] is not None:
+        return entry[3]
+    return sum(file[1] for file in entry[1] if file is not None)
+
+_default_tenant = Tenant(None, DATA_DIR)
+
+_current_tenant: contextvars.ContextVar[Optional[Tenant]] = contextvars.ContextVar(
+    'storage_tenant', default=None
+)
+
+_current_unit: contextvars.ContextVar[Optional['UnitOfWork']] = contextvars.ContextVar(
+    'storage_unit_of_work', default=None
+)
+
+def current_tenant() -> Tenant:
+    """Return the tenant selected for this request, or the default data directory"""
+    tenant = _current_tenant.get()
+    return tenant if tenant is not None else _default_tenant
+
+@contextmanager
+def use_tenant(tenant: Tenant) -> Iterator[Tenant]:
+    """Route every load and save in the enclosed block to a tenant's directory"""
+    token = _current_tenant.set(tenant)
+    try:
+        yield tenant
+    finally:
+        _current_tenant.reset(token)
+
+def data_path(name: str) -> str:
+    """Absolute path of a document in the current tenant's data directory"""
+    return current_tenant().path(name)
+
+def _read(name: str) -> Any:
+    return current_tenant().read(name)
+
+def _write(name: str, text: str) -> None:
+    current_tenant().write(name, text)
+
+def exists(name: str) -> bool:
+    """Check whether a document exists (including unsaved batch writes)"""
+    unit = _current_unit.get()
+    if unit is not None and name in unit.pending:
+        return True
+    return os.path.exists(data_path(name))
+
+def load_json(name: str) -> Any:
+    """Load a JSON document, returning None when it does not exist"""
+    unit = _current_unit.get()
+    if unit is not None:
+        return unit.load(name)
+    return _read(name)
+
+def save_json(name: str, data: Any, indent: Optional[int] = 2) -> None:
+    """Serialize and save a JSON document, raising on failure"""
+    started = time.perf_counter()
+    text = json.dumps(data, indent=indent)
+    record_serialize(time.perf_counter() - started)
+    unit = _current_unit.get()
+    if unit is not None:
+        unit.save(name, data, text)
+    else:
+        _write(name, text)
+
+def after_commit(callback: Callable[[], None]) -> None:
+    """Run a callback once the current writes have reached disk"""
+    unit = _current_unit.get()
+    if unit is not None:
+        unit.callbacks.append(callback)
+    else:
+        callback()
+
+def on_discard(callback: Callable[[], None]) -> None:
+    """Run a callback if the current writes are thrown away instead of committed
+
+    Outside a unit of work writes are never thrown away, so it never runs.
+    """
+    unit = _current_unit.get()
+    if unit is not None:
+        unit.discards.append(callback)
+
+def current_unit_of_work() -> Optional['UnitOfWork']:
+    """Return the active unit of work, if any"""
+    return _current_unit.get()
+
+def derived(kind: str, names: Tuple[str, ...], build: Callable[[], Any], size: Optional[int] = None) -> Any:
+    """The current tenant's object of a kind, built from some documents; see Tenant.derived"""
+    unit = _current_unit.get()
+    if unit is not None:
+        return unit.derived(kind, names, build)
+    return current_tenant().derived(kind, names, build, size)
+
+def before_save(kind: str, name: str) -> Callable[[Callable[[Any], None]], None]:
+    """Note the state of a document about to be saved; call the result with the change to the object of a kind
+
+    The change is applied once the document is on disk.
+    """
+    tenant = current_tenant()
+    before = tenant.file_key(name)
+
+    def saved(update: Callable[[Any], None]) -> None:
+        after_commit(lambda: tenant.update_derived(kind, name, before, update))
+    return saved
+
+def revise_derived(kind: str, value: Any, update: Callable[[Any], None]) -> Any:
+    """Change the current tenant's object of a kind outside of a save; see Tenant.revise_derived"""
+    unit = _current_unit.get()
+    if unit is not None:
+        return unit.revise_derived(kind, value, update)
+    return current_tenant().revise_derived(kind, value, update)
+
+def forget_derived(kind: str) -> None:
+    """Drop the current tenant's object of a kind, so the next use rebuilds it"""
+    unit = _current_unit.get()
+    if unit is not None:
+        unit.derived_objects.pop(kind, None)
+    current_tenant().forget_derived(kind)
+
+class UnitOfWork:
+    """Share loaded documents between operations and defer writes until commit
+
+    Documents loaded inside a unit of work are parsed once and handed out as
+    the same object to every later load, so several operations can build on
+    each other without re-reading the file. Saves are serialized immediately
+    but only written to disk on commit().
+
+    Derived objects are built from the unit's documents and kept until one
+    of those documents is saved or discarded.
+    """
+
+    def __init__(self):
+        self.cache: Dict[str, Any] = {}
+        self.pending: Dict[str, str] = {}
+        self.touched: Set[str] = set()
+        self.callbacks: List[Callable[[], None]] = []
+        # Run instead of callbacks when the writes are thrown away
+        self.discards: List[Callable[[], None]] = []
+        # Kind -> (documents it was built from, object)
+        self.derived_objects: Dict[str, Tuple[Tuple[str, ...], Any]] = {}
+        # Pending writes and callbacks as they were when the current operation began
+        self._pending_before: Dict[str, str] = {}
+        self._callbacks_before = 0
+        self._discards_before = 0
+
+    def load(self, name: str) -> Any:
+        self.touched.add(name)
+        if name in self.cache:
+            return self.cache[name]
+        if name in self.pending:
+            started = time.perf_counter()
+            data = json.loads(self.pending[name])
+            record_load(len(self.pending[name]), 0.0, time.perf_counter() - started, cached=True)
+        else:
+            data = _read(name)
+        if data is not None:
+            self.cache[name] = data
+        return data
+
+    def save(self, name: str, data: Any, text: str) -> None:
+        self.touched.add(name)
+        self.pending[name] = text
+        self.cache[name] = data
+        self._forget_derived({name})
+
+    def derived(self, kind: str, names: Tuple[str, ...], build: Callable[[], Any]) -> Any:
+        entry = self.derived_objects.get(kind)
+        if entry is not None:
+            return entry[1]
+        value = build()
+        self.derived_objects[kind] = (names, value)
+        return value
+
+    def revise_derived(self, kind: str, value: Any, update: Callable[[Any], None]) -> Any:
+        changed = value.copy()
+        update(changed)
+        entry = self.derived_objects.get(kind)
+        if entry is not None and entry[1] is value:
+            self.derived_objects[kind] = (entry[0], changed)
+        return changed
+
+    def _forget_derived(self, names: Set[str]) -> None:
+        for kind, entry in list(self.derived_objects.items()):
+            if names.intersection(entry[0]):
+                del self.derived_objects[kind]
+
+    def begin_operation(self) -> None:
+        """Start tracking the documents used by one operation"""
+        self.touched = set()
+        self._pending_before = dict(self.pending)
+        self._callbacks_before = len(self.callbacks)
+        self._discards_before = len(self.discards)
+
+    def discard_operation(self) -> None:
+        """Undo everything one operation did: its writes, its after-commit callbacks and its loaded documents
+
+        Documents are re-read from the state before the operation on next load.
+        """
+        self.pending = self._pending_before
+        self._pending_before = dict(self.pending)
+        del self.callbacks[self._callbacks_before:]
+        self._run_discards(self._discards_before)
+        for name in self.touched:
+            self.cache.pop(name, None)
+        self._forget_derived(self.touched)
+        self.touched = set()
+
+    def commit(self) -> None:
+        """Write every pending document to disk, then run after-commit callbacks
+
+        Every document is written out beside its file before any is put in
+        place, so a failed write leaves all of them as they were.
+        """
+        tenant = current_tenant()
+        staged: List[Tuple[str, str]] = []
+        try:
+            for name, text in self.pending.items():
+                staged.append((name, tenant.stage(name, text)))
+        except BaseException:
+            for _, temp in staged:
+                tenant.discard(temp)
+            raise
+        for name, temp in staged:
+            tenant.replace(name, temp)
+        self.pending.clear()
+        self.discards = []
+        callbacks, self.callbacks = self.callbacks, []
+        for callback in callbacks:
+            callback()
+
+    def rollback(self) -> None:
+        """Drop all pending writes and cached documents"""
+        self.pending.clear()
+        self.cache.clear()
+        self.derived_objects.clear()
+        self.touched = set()
+        self.callbacks = []
+        self._pending_before = {}
+        self._callbacks_before = 0
+        self._run_discards(0)
+
+    def _run_discards(self, start: int) -> None:
+        discards = self.discards[start:]
+        del self.discards[start:]
+        for callback in discards:
+            callback()
+
+@contextmanager
+def unit_of_work() -> Iterator[UnitOfWork]:
+    """Run the enclosed block inside a fresh unit of work
+
+    The caller decides whether to commit() or rollback(); anything left
+    uncommitted when the block exits is discarded.
+    """
+    unit = UnitOfWork()
+    token = _current_unit.set(unit)
+    try:
+        yield unit
+    finally:
+        _current_unit.reset(token)
+        unit._run_discards(0)
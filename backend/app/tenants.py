@@ -0,0 +1,181 @@
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from flask import Flask, jsonify
+
+from app import storage
+
+TENANT_ID_PATTERN = re.compile(r'^[A-Za-z0-9][A-Za-z0-9_-]{0,63}$')
+PATH_PREFIX = '/t/'
+# Requests with these methods may write, and run one at a time per tenant
+WRITE_METHODS = ('POST', 'PUT', 'PATCH', 'DELETE')
+
+class TenantPool:
+    """LRU of loaded tenants, bounded by cached bytes and by tenant count
+
+    Tenants are created lazily on their first request and evicted least
+    recently used first. An evicted tenant only loses its document cache;
+    its files stay on disk and it is reloaded on the next request.
+    """
+
+    def __init__(self, root: str, default_root: str, max_bytes: int, max_tenants: int):
+        self.root = root
+        self.default_root = default_root
+        self.max_bytes = max_bytes
+        self.max_tenants = max_tenants
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._tenants: 'OrderedDict[Optional[str], storage.Tenant]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, tenant_id: Optional[str]) -> storage.Tenant:
+        """Return the tenant for an id, or the default data directory for None"""
+        with self._lock:
+            tenant = self._tenants.get(tenant_id)
+            if tenant is not None:
+                self._tenants.move_to_end(tenant_id)
+                self.hits += 1
+                return tenant
+            self.misses += 1
+            if tenant_id is None:
+                tenant = storage.Tenant(None, self.default_root)
+            else:
+                tenant = storage.Tenant(tenant_id, os.path.join(self.root, tenant_id))
+            tenant.on_resize = lambda t, delta, key=tenant_id: self._resized(key, t, delta)
+            self._tenants[tenant_id] = tenant
+            self._evict()
+            return tenant
+
+    def _resized(self, key: Optional[str], tenant: storage.Tenant, delta: int) -> None:
+        with self._lock:
+            # Evicted tenants still finishing a request are no longer counted
+            if self._tenants.get(key) is not tenant:
+                return
+            self.size += delta
+            self._evict()
+
+    def _evict(self) -> None:
+        # The most recently used tenant is never evicted
+        while len(self._tenants) > 1 and (len(self._tenants) > self.max_tenants or self.size > self.max_bytes):
+            _, tenant = self._tenants.popitem(last=False)
+            tenant.on_resize = None
+            self.size -= tenant.size
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'tenants': len(self._tenants),
+                'cached_bytes': self.size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
+
+def split_tenant_path(path: str) -> Tuple[Optional[str], str]:
+    """Split /t/<tenant>/rest into (tenant, /rest); other paths have no tenant"""
+    if not path.startswith(PATH_PREFIX):
+        return None, path
+    tenant_id, _, rest = path[len(PATH_PREFIX):].partition('/')
+    return tenant_id, '/' + rest
+
+class Tenants:
+    """Select the company whose books a request reads and writes
+
+    The tenant comes from the /t/<tenant>/ path prefix or the TENANT_HEADER
+    request header; requests with neither use DATA_DIR as before. Each
+    tenant's documents live in TENANTS_DIR/<tenant>/. Requests that may
+    write hold the tenant's ALL_DOCUMENTS lock while they run.
+
+    Configuration keys (all optional):
+        DATA_DIR                - data directory of the default tenant
+        TENANTS_DIR             - parent directory of the tenant directories
+        TENANT_HEADER           - header naming the tenant, default X-Company-Id
+        TENANT_REQUIRED         - reject requests that name no tenant
+        TENANT_POOL_MAX_BYTES   - cached document bytes kept across all tenants
+        TENANT_POOL_MAX_TENANTS - tenants kept loaded at once
+    """
+
+    def __init__(self, app: Optional[Flask] = None):
+        self.pool: Optional[TenantPool] = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app: Flask) -> None:
+        app.config.setdefault('DATA_DIR', storage.DATA_DIR)
+        app.config.setdefault('TENANTS_DIR', os.path.join(app.config['DATA_DIR'], 'tenants'))
+        app.config.setdefault('TENANT_HEADER', 'X-Company-Id')
+        app.config.setdefault('TENANT_REQUIRED', False)
+        app.config.setdefault('TENANT_POOL_MAX_BYTES', 256 * 1024 * 1024)
+        app.config.setdefault('TENANT_POOL_MAX_TENANTS', 10000)
+
+        self.pool = TenantPool(
+            app.config['TENANTS_DIR'],
+            app.config['DATA_DIR'],
+            app.config['TENANT_POOL_MAX_BYTES'],
+            app.config['TENANT_POOL_MAX_TENANTS']
+        )
+        self.header_key = 'HTTP_' + app.config['TENANT_HEADER'].upper().replace('-', '_')
+        self.required = app.config['TENANT_REQUIRED']
+        self.app = app
+
+        app.extensions['tenants'] = self
+        app.wsgi_app = self._middleware(app.wsgi_app)
+
+    def _error(self, environ, start_response, message: str, status: int):
+        with self.app.app_context():
+            response = jsonify({'error': message})
+        response.status_code = status
+        return response(environ, start_response)
+
+    def _middleware(self, wsgi_app):
+        def middleware(environ, start_response):
+            tenant_id, path = split_tenant_path(environ.get('PATH_INFO', ''))
+            if tenant_id is not None:
+                environ['PATH_INFO'] = path
+                environ['SCRIPT_NAME'] = environ.get('SCRIPT_NAME', '') + PATH_PREFIX + tenant_id
+            else:
+                tenant_id = environ.get(self.header_key) or None
+
+            if tenant_id is None and self.required and environ.get('REQUEST_METHOD') != 'OPTIONS':
+                return self._error(environ, start_response, 'A company must be selected for this request', 400)
+            if tenant_id is not None and not TENANT_ID_PATTERN.match(tenant_id):
+                return self._error(environ, start_response, 'Invalid company id', 400)
+
+            tenant = self.pool.get(tenant_id)
+            environ['app.tenant'] = tenant.id
+            with storage.use_tenant(tenant):
+                if environ.get('REQUEST_METHOD') in WRITE_METHODS:
+                    # Handlers load, change and save whole documents; two at once would lose one's changes
+                    with tenant.lock(storage.ALL_DOCUMENTS):
+                        iterable = wsgi_app(environ, start_response)
+                else:
+                    iterable = wsgi_app(environ, start_response)
+            return _TenantIterable(iterable, tenant)
+        return middleware
+
+class _TenantIterable:
+    """Keep the tenant selected while a streamed response body is produced"""
+
+    def __init__(self, iterable, tenant: storage.Tenant):
+        self._iterable = iterable
+        self._iterator = iter(iterable)
+        self._tenant = tenant
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        with storage.use_tenant(self._tenant):
+            return next(self._iterator)
+
+    def close(self):
+        close = getattr(self._iterable, 'close', None)
+        if close is not None:
+            with storage.use_tenant(self._tenant):
+                close()
@@ -2,4 +2,4 @@ from flask import Blueprint
 
 transactions_bp = Blueprint('transactions', __name__, url_prefix='/api/transactions')
 
-from . import routes
\ No newline at end of file
+# Routes are attached when app.blueprints imports the routes module
@@ -2,6 +2,9 @@ from dataclasses import dataclass
 from typing import Optional, Dict, Any, List
 from datetime import datetime, date
 from enum import Enum, auto
+from app import dates, money
+from app.instrumentation import timed
+from app.records import RecordView
 
 class TransactionType(Enum):
     """Types of transactions"""
@@ -13,15 +16,23 @@ class TransactionType(Enum):
     TRANSFER = 'transfer'
     OTHER = 'other'
 
-@dataclass
+@dataclass(slots=True)
 class TransactionEntry:
     """Represents a single entry in a transaction (debit or credit)"""
     accountId: str
     amount: float
     type: str  # 'debit' or 'credit'
     description: Optional[str] = None
+    amount_cents: Optional[int] = None  # amount in cents; see app/money.py
+
+    def __post_init__(self):
+        """Round the amount to whole cents"""
+        if self.amount_cents is None:
+            self.amount_cents = money.to_cents(self.amount)
+            self.amount = money.from_cents(self.amount_cents)
 
     @classmethod
+    @timed('model')
     def from_dict(cls, data: Dict[str, Any]) -> 'TransactionEntry':
         """Create a TransactionEntry instance from a dictionary"""
         return cls(
@@ -31,16 +42,26 @@ class TransactionEntry:
             description=data.get('description')
         )
 
+    @classmethod
+    def from_stored(cls, data: Dict[str, Any]) -> 'TransactionEntry':
+        """Create a TransactionEntry from a saved entry, which has every key; falls back to from_dict"""
+        try:
+            return cls(data['accountId'], data['amount'], data['type'], data['description'], data['amount_cents'])
+        except KeyError:
+            return cls.from_dict(data)
+
+    @timed('model')
     def to_dict(self) -> Dict[str, Any]:
         """Convert TransactionEntry instance to dictionary"""
         return {
             'accountId': self.accountId,
             'amount': self.amount,
+            'amount_cents': self.amount_cents,
             'type': self.type,
             'description': self.description
         }
 
-@dataclass
+@dataclass(slots=True)
 class Transaction:
     """Represents a complete transaction with multiple entries"""
     id: str
@@ -59,16 +80,20 @@ class Transaction:
     updated_by: Optional[str] = None
     posted_by: Optional[str] = None
     voided_by: Optional[str] = None
+    date_ordinal: Optional[int] = None  # Day number of date; see app/dates.py
 
     def __post_init__(self):
-        """Set timestamps if not provided"""
+        """Set timestamps if not provided and normalize the date"""
         now = datetime.utcnow().isoformat()
         if not self.created_at:
             self.created_at = now
         if not self.updated_at:
             self.updated_at = now
+        if self.date_ordinal is None:
+            self.date, self.date_ordinal = dates.normalize(self.date)
 
     @classmethod
+    @timed('model')
     def from_dict(cls, data: Dict[str, Any]) -> 'Transaction':
         """Create a Transaction instance from a dictionary"""
         # Convert entries
@@ -100,11 +125,46 @@ class Transaction:
             voided_by=data.get('voided_by')
         )
 
+    @classmethod
+    @timed('model')
+    def from_stored(cls, data: Dict[str, Any]) -> 'Transaction':
+        """Create a Transaction from a record read back from storage
+
+        Records the app saved carry every key to_dict writes, so this skips
+        from_dict's per-field defaulting and passes fields positionally.
+        Anything older or partial, including records saved before dates
+        had ordinals, falls back to from_dict.
+        """
+        try:
+            return cls(
+                data['id'],
+                data['date'],
+                [TransactionEntry.from_stored(e) for e in data['entries']],
+                data['status'],
+                data['description'],
+                TransactionType(data['transaction_type']),
+                data['reference_type'],
+                data['reference_id'],
+                data['created_at'],
+                data['updated_at'],
+                data['posted_at'],
+                data['voided_at'],
+                data['created_by'],
+                data['updated_by'],
+                data['posted_by'],
+                data['voided_by'],
+                data['date_ordinal']
+            )
+        except KeyError:
+            return cls.from_dict(data)
+
+    @timed('model')
     def to_dict(self) -> Dict[str, Any]:
         """Convert Transaction instance to dictionary"""
         return {
             'id': self.id,
             'date': self.date,
+            'date_ordinal': self.date_ordinal,
             'entries': [e.to_dict() for e in self.entries],
             'status': self.status,
             'description': self.description,
@@ -123,15 +183,37 @@ class Transaction:
 
     def validate(self) -> tuple[bool, Optional[str]]:
         """Validate the transaction"""
-        if not self.entries or len(self.entries) < 2:
-            return False, "Transaction must have at least 2 entries"
+        return validate_totals(
+            len(self.entries),
+            sum(entry.amount_cents for entry in self.entries if entry.type == 'debit'),
+            sum(entry.amount_cents for entry in self.entries if entry.type == 'credit')
+        )
+
+def validate_totals(count: int, debit_cents: int, credit_cents: int) -> tuple[bool, Optional[str]]:
+    """Rules shared by Transaction.validate and validate_entries"""
+    if count < 2:
+        return False, "Transaction must have at least 2 entries"
 
-        # Calculate total debits and credits
-        total_debits = sum(entry.amount for entry in self.entries if entry.type == 'debit')
-        total_credits = sum(entry.amount for entry in self.entries if entry.type == 'credit')
+    # Check if transaction is balanced; totals are in cents, so exactly
+    if debit_cents != credit_cents:
+        return False, "Transaction is not balanced. Debits must equal credits."
 
-        # Check if transaction is balanced
-        if abs(total_debits - total_credits) > 0.01:  # Using 0.01 to handle floating point precision
-            return False, "Transaction is not balanced. Debits must equal credits."
+    return True, None
 
-        return True, None
+def validate_entries(entries: List[Dict[str, Any]]) -> tuple[bool, Optional[str]]:
+    """Validate stored entry dicts without building TransactionEntry objects"""
+    debits = credits = 0
+    for entry in entries:
+        if entry['type'] == 'debit':
+            debits += money.cents_of(entry, 'amount')
+        elif entry['type'] == 'credit':
+            credits += money.cents_of(entry, 'amount')
+    return validate_totals(len(entries), debits, credits)
+
+class TransactionView(RecordView):
+    """A stored transaction, validated and updated in place"""
+    __slots__ = ()
+    date_fields = ('date',)
+
+    def validate(self) -> tuple[bool, Optional[str]]:
+        return validate_entries(self.data.get('entries', []))
@@ -1,20 +1,23 @@
-from flask import jsonify, request
+from flask import Response, jsonify, request
+import csv
+import io
 import json
+import logging
 import os
-from typing import Dict, List, Optional
+from typing import Any, Callable, Dict, Iterator, List, Optional, TextIO
 from datetime import datetime
 import random
 
+from app import dates, ledger, money, storage
+from app.changes.routes import record_change
+from app.idempotency import idempotent
 from . import transactions_bp
-from .models import Transaction, TransactionEntry
+from .models import Transaction, TransactionEntry, TransactionView, validate_entries
 
-# File path handling
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-DATA_DIR = os.path.join(BASE_DIR, 'data')
-TRANSACTIONS_FILE = os.path.join(DATA_DIR, 'transactions.json')
+logger = logging.getLogger(__name__)
 
-# Ensure data directory exists
-os.makedirs(DATA_DIR, exist_ok=True)
+# File path handling
+TRANSACTIONS_FILE = 'transactions.json'
 
 def generate_transaction_id() -> str:
     """Generate a random transaction ID"""
@@ -23,21 +26,89 @@ def generate_transaction_id() -> str:
 def load_transactions() -> Dict:
     """Load transactions data from JSON file"""
     try:
-        if os.path.exists(TRANSACTIONS_FILE):
-            with open(TRANSACTIONS_FILE, 'r') as f:
-                return json.load(f)
+        data = storage.load_json(TRANSACTIONS_FILE)
+        if data is not None:
+            return data
     except Exception as e:
-        print(f"Error loading transactions data: {str(e)}")
+        logger.exception("Error loading transactions data: %s", e)
     return {'transactions': []}
 
-def save_transactions(data: Dict) -> bool:
-    """Save transactions data to JSON file"""
+def iter_transactions(chunk_size: int = 64 * 1024) -> Iterator[Dict]:
+    """Yield stored transactions one at a time without loading the whole file
+
+    The file is opened before this returns. Saves put a new file in place
+    of transactions.json rather than rewrite it, so the transactions come
+    from the version stored at the call, however many saves follow while
+    they are read.
+    """
+    if storage.current_unit_of_work() is not None:
+        # Inside a batch the latest state may not be on disk yet
+        return iter(load_transactions().get('transactions', []))
+    try:
+        f = open(storage.data_path(TRANSACTIONS_FILE), 'r')
+    except FileNotFoundError:
+        return iter(())
+    return _parse_transactions(f, chunk_size)
+
+def _parse_transactions(f: TextIO, chunk_size: int) -> Iterator[Dict]:
+    decoder = json.JSONDecoder()
+    with f:
+        buffer = ''
+
+        def read_more() -> bool:
+            nonlocal buffer
+            chunk = f.read(chunk_size)
+            if not chunk:
+                return False
+            buffer += chunk
+            return True
+
+        # Find the start of the transactions array
+        while True:
+            key = buffer.find('"transactions"')
+            start = buffer.find('[', key) if key != -1 else -1
+            if start != -1:
+                break
+            if not read_more():
+                return
+        pos = start + 1
+
+        while True:
+            # Skip separators between array items
+            while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+                pos += 1
+            if pos >= len(buffer):
+                buffer, pos = '', 0
+                if not read_more():
+                    raise ValueError('Unexpected end of transactions file')
+                continue
+            if buffer[pos] == ']':
+                return
+            try:
+                transaction, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # Item spans the chunk boundary, keep the tail and read on
+                buffer, pos = buffer[pos:], 0
+                if not read_more():
+                    raise
+                continue
+            yield transaction
+            pos = end
+
+def save_transactions(data: Dict, ledger_update: Optional[Callable[[ledger.Ledger], None]] = None) -> bool:
+    """Save transactions data to JSON file
+
+    ledger_update, when given, brings the in-memory ledger in line with this
+    save; without it the ledger is rebuilt the next time it is used.
+    """
     try:
-        with open(TRANSACTIONS_FILE, 'w') as f:
-            json.dump(data, f, indent=2)
+        saved = storage.before_save(ledger.KIND, TRANSACTIONS_FILE)
+        storage.save_json(TRANSACTIONS_FILE, data)
+        if ledger_update is not None:
+            saved(ledger_update)
         return True
     except Exception as e:
-        print(f"Error saving transactions data: {str(e)}")
+        logger.exception("Error saving transactions data: %s", e)
         return False
 
 def create_transaction_direct(transaction_data: dict):
@@ -61,16 +132,75 @@ def create_transaction_direct(transaction_data: dict):
         
         # Save transaction
         transactions_data = load_transactions()
-        transactions_data['transactions'].append(transaction.to_dict())
-        if not save_transactions(transactions_data):
+        stored = transaction.to_dict()
+        transactions_data['transactions'].append(stored)
+        if not save_transactions(transactions_data, lambda l: l.add(stored)):
             raise Exception('Failed to save transaction')
+        record_change('transaction', transaction_id, 'create')
         
         return transaction.to_dict()
         
     except Exception as e:
-        print(f"Error in create_transaction_direct: {str(e)}")
+        logger.exception("Error in create_transaction_direct: %s", e)
         raise
 
+def get_transaction_filters() -> Dict[str, Any]:
+    """Read the list/export filters from the query string, ignoring spec placeholders
+
+    Date bounds come back as day ordinals; a bound that is not a date raises ValueError.
+    """
+    placeholders = {
+        'start_date': '<date>',
+        'end_date': '<date>',
+        'status': '<string>',
+        'account_id': '<string>'
+    }
+    filters = {}
+    for name, placeholder in placeholders.items():
+        value = request.args.get(name)
+        filters[name] = value if value and value != placeholder else None
+    filters['start_date'] = dates.to_ordinal(filters['start_date'])
+    filters['end_date'] = dates.to_ordinal(filters['end_date'])
+    return filters
+
+def matches_filters(transaction: Dict, filters: Dict[str, Any]) -> bool:
+    """Check a transaction against start_date, end_date, status and account_id filters"""
+    start, end = filters['start_date'], filters['end_date']
+    if (start is not None or end is not None) and not dates.in_range(dates.day_of(transaction, 'date'), start, end):
+        return False
+    if filters['status'] and transaction['status'] != filters['status']:
+        return False
+    if filters['account_id'] and not any(
+            e['accountId'] == filters['account_id'] for e in transaction['entries']):
+        return False
+    return True
+
+EXPORT_COLUMNS = [
+    'transaction_id', 'date', 'status', 'transaction_type', 'reference_type',
+    'reference_id', 'description', 'line', 'account_id', 'entry_type',
+    'debit', 'credit', 'entry_description'
+]
+
+def flatten_transaction(transaction: Dict) -> Iterator[Dict]:
+    """Yield one row per debit or credit line of a transaction"""
+    for line, entry in enumerate(transaction.get('entries', []), start=1):
+        is_debit = entry.get('type') == 'debit'
+        yield {
+            'transaction_id': transaction.get('id'),
+            'date': transaction.get('date'),
+            'status': transaction.get('status'),
+            'transaction_type': transaction.get('transaction_type'),
+            'reference_type': transaction.get('reference_type'),
+            'reference_id': transaction.get('reference_id'),
+            'description': transaction.get('description'),
+            'line': line,
+            'account_id': entry.get('accountId'),
+            'entry_type': entry.get('type'),
+            'debit': entry.get('amount', 0) if is_debit else 0,
+            'credit': entry.get('amount', 0) if not is_debit else 0,
+            'entry_description': entry.get('description')
+        }
+
 @transactions_bp.route('/list', methods=['GET'])
 def list_transactions():
     """Get a paginated list of transactions with optional filters"""
@@ -78,26 +208,17 @@ def list_transactions():
         # Get query parameters
         page = int(request.args.get('page', 1))
         per_page = int(request.args.get('per_page', 20))
-        start_date = request.args.get('start_date')
-        end_date = request.args.get('end_date')
-        status = request.args.get('status')
-        account_id = request.args.get('account_id')
+        try:
+            filters = get_transaction_filters()
+        except ValueError as e:
+            return jsonify({'message': str(e)}), 400
 
         # Load transactions
         data = load_transactions()
         transactions = data.get('transactions', [])
 
         # Apply filters
-        filtered_transactions = transactions
-        if start_date and start_date != '<date>':
-            filtered_transactions = [t for t in filtered_transactions if t['date'] >= start_date]
-        if end_date and end_date != '<date>':
-            filtered_transactions = [t for t in filtered_transactions if t['date'] <= end_date]
-        if status and status != '<string>':
-            filtered_transactions = [t for t in filtered_transactions if t['status'] == status]
-        if account_id and account_id != '<string>':
-            filtered_transactions = [t for t in filtered_transactions 
-                                  if any(e['accountId'] == account_id for e in t['entries'])]
+        filtered_transactions = [t for t in transactions if matches_filters(t, filters)]
 
         # Calculate pagination
         total = len(filtered_transactions)
@@ -119,7 +240,87 @@ def list_transactions():
     except Exception as e:
         return jsonify({'message': f'Error listing transactions: {str(e)}'}), 500
 
+@transactions_bp.route('/export', methods=['GET'])
+def export_transactions():
+    """Stream transactions as NDJSON or CSV using the same filters as /list"""
+    export_format = request.args.get('format', 'ndjson').lower()
+    flatten = request.args.get('flatten', 'false').lower() in ('1', 'true', 'yes')
+    if export_format not in ('ndjson', 'csv'):
+        return jsonify({'message': 'format must be ndjson or csv'}), 400
+
+    try:
+        filters = get_transaction_filters()
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    def matching_rows():
+        for transaction in iter_transactions():
+            if not matches_filters(transaction, filters):
+                continue
+            # CSV is always one row per debit or credit line
+            if flatten or export_format == 'csv':
+                yield from flatten_transaction(transaction)
+            else:
+                yield transaction
+
+    def generate_ndjson():
+        lines = []
+        for row in matching_rows():
+            lines.append(json.dumps(row))
+            # Hand rows to the server in modest batches
+            if len(lines) == 500:
+                yield '\n'.join(lines) + '\n'
+                lines = []
+        if lines:
+            yield '\n'.join(lines) + '\n'
+
+    def generate_csv():
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS)
+        writer.writeheader()
+        for count, row in enumerate(matching_rows(), start=1):
+            writer.writerow(row)
+            # Hand rows to the server in modest batches
+            if count % 500 == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+
+    if export_format == 'csv':
+        response = Response(generate_csv(), mimetype='text/csv')
+    else:
+        response = Response(generate_ndjson(), mimetype='application/x-ndjson')
+    response.headers['Content-Disposition'] = f'attachment; filename=transactions.{export_format}'
+    return response
+
+@transactions_bp.route('/balances', methods=['GET'])
+def get_balances():
+    """Net debit balance of every account over posted (or voided) entries, from the in-memory ledger"""
+    try:
+        filters = get_transaction_filters()
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    status = ledger.STATUSES.get(filters['status'] or 'posted')
+    if status is None:
+        return jsonify({'message': 'status must be posted or void'}), 400
+
+    try:
+        balances = ledger.current_ledger().balances(filters['start_date'], filters['end_date'], status)
+        if filters['account_id']:
+            balances = {k: v for k, v in balances.items() if k == filters['account_id']}
+        return jsonify({
+            'balances': [
+                {'account_id': account_id, 'balance': money.from_cents(cents), 'balance_cents': cents}
+                for account_id, cents in sorted(balances.items())
+            ],
+            'total': len(balances)
+        })
+    except Exception as e:
+        return jsonify({'message': f'Error calculating balances: {str(e)}'}), 500
+
 @transactions_bp.route('/create', methods=['POST'])
+@idempotent
 def create_transaction():
     """Create a new transaction via HTTP endpoint"""
     try:
@@ -172,25 +373,26 @@ def patch_transaction(transaction_id):
         if transaction_index is None:
             return jsonify({'message': 'Transaction not found'}), 404
             
-        # Update fields
+        # Only new entries need normalizing; the rest of the record is left as stored
         patch_data = request.get_json()
-        current_transaction = transactions[transaction_index]
-        current_transaction.update({
+        changes = {
             k: v for k, v in patch_data.items()
             if k in ['date', 'description', 'reference', 'entries']
-        })
-        current_transaction['updated_at'] = datetime.utcnow().isoformat()
-        
-        # Validate updated transaction
-        transaction = Transaction.from_dict(current_transaction)
-        is_valid, error = transaction.validate()
+        }
+        if 'entries' in changes:
+            changes['entries'] = [TransactionEntry.from_dict(e).to_dict() for e in changes['entries']]
+        transaction = TransactionView(transactions[transaction_index])
+
+        # Validate before touching the stored record
+        is_valid, error = validate_entries(changes.get('entries', transaction.data.get('entries', [])))
         if not is_valid:
             return jsonify({'message': error}), 400
+        transaction.set(**changes)
             
-        # Save changes
-        transactions[transaction_index] = transaction.to_dict()
-        if not save_transactions(data):
+        # Save changes; drafts are not in the ledger, so it stays as it is
+        if not save_transactions(data, lambda l: None):
             return jsonify({'message': 'Failed to save changes'}), 500
+        record_change('transaction', transaction_id, 'update')
             
         return jsonify(transaction.to_dict())
         
@@ -222,9 +424,10 @@ def delete_transaction(transaction_id):
         # Remove transaction
         transactions.pop(transaction_index)
         
-        # Save changes
-        if not save_transactions(data):
+        # Save changes; drafts are not in the ledger, so it stays as it is
+        if not save_transactions(data, lambda l: None):
             return jsonify({'message': 'Failed to save changes'}), 500
+        record_change('transaction', transaction_id, 'delete')
             
         return jsonify({'message': 'Transaction deleted successfully'})
         
@@ -254,21 +457,18 @@ def post_transaction(transaction_id):
             return jsonify({'message': 'Transaction not found'}), 404
             
         # Validate transaction
-        transaction = Transaction.from_dict(transactions[transaction_index])
+        transaction = TransactionView(transactions[transaction_index])
         is_valid, error = transaction.validate()
         if not is_valid:
             return jsonify({'message': error}), 400
             
         # Update status
-        now = datetime.utcnow()
-        transaction.status = 'posted'
-        transaction.posted_at = now
-        transaction.updated_at = now
+        transaction.set(status='posted', posted_at=datetime.utcnow().isoformat())
         
         # Save changes
-        transactions[transaction_index] = transaction.to_dict()
-        if not save_transactions(data):
+        if not save_transactions(data, lambda l: l.add(transaction.data)):
             return jsonify({'message': 'Failed to save changes'}), 500
+        record_change('transaction', transaction_id, 'update')
             
         return jsonify(transaction.to_dict())
         
@@ -283,11 +483,8 @@ def void_transaction(transaction_id):
         data = load_transactions()
         transactions = data.get('transactions', [])
         
-        # Get void reason
-        void_data = request.get_json()
-        if not void_data or 'reason' not in void_data:
-            return jsonify({'message': 'Void reason is required'}), 400
-            
+        # The void reason is required by the API spec (app/validation.py)
+
         # Find transaction
         transaction_index = None
         for i, t in enumerate(transactions):
@@ -303,16 +500,13 @@ def void_transaction(transaction_id):
             return jsonify({'message': 'Transaction not found'}), 404
             
         # Update status
-        now = datetime.utcnow()
-        transaction = Transaction.from_dict(transactions[transaction_index])
-        transaction.status = 'void'
-        transaction.voided_at = now
-        transaction.updated_at = now
+        transaction = TransactionView(transactions[transaction_index])
+        transaction.set(status='void', voided_at=datetime.utcnow().isoformat())
         
         # Save changes
-        transactions[transaction_index] = transaction.to_dict()
-        if not save_transactions(data):
+        if not save_transactions(data, lambda l: l.void(transaction_id)):
             return jsonify({'message': 'Failed to save changes'}), 500
+        record_change('transaction', transaction_id, 'update')
             
         return jsonify(transaction.to_dict())
         
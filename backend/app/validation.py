@@ -0,0 +1,313 @@
+"""Request body validation compiled from the OpenAPI specs
+
+Every YAML file in API Specs is read once, when the first request with a
+body arrives, so starting the app parses nothing. Each operation's JSON
+request body schema is compiled into a plain Python function the first
+time its route is called, with $refs to components resolved at compile
+time. Before a view runs, the function for its route checks the body. A
+bad payload gets a 400 before the handler loads or saves anything.
+
+A spec file with x-unrouted: true at the top describes endpoints the
+backend does not serve yet, and its operations are skipped.
+
+The compiler covers the part of OpenAPI 3.0 the specs use: type,
+nullable, enum, required, properties, items, minItems/maxItems,
+minLength/maxLength, pattern, minimum/maximum, allOf and $ref.
+additionalProperties is not enforced. format is treated as an annotation,
+as JSON Schema does by default; constraints that matter use pattern.
+"""
+import glob
+import logging
+import os
+import re
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from flask import Flask, jsonify, request
+
+from app import storage
+
+logger = logging.getLogger(__name__)
+
+SPEC_DIR = os.path.join(storage.BASE_DIR, 'API Specs')
+BODY_METHODS = ('POST', 'PUT', 'PATCH')
+
+# Returns the first problem found, or None when the value is valid
+Check = Callable[[Any, str], Optional[str]]
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+TYPE_CHECKS = {
+    'object': lambda v: isinstance(v, dict),
+    'array': lambda v: isinstance(v, list),
+    'string': lambda v: isinstance(v, str),
+    'number': _is_number,
+    'integer': lambda v: isinstance(v, int) and not isinstance(v, bool),
+    'boolean': lambda v: isinstance(v, bool),
+}
+
+def _at(path: str, key) -> str:
+    return f'{path}[{key}]' if isinstance(key, int) else f'{path}.{key}'
+
+class SchemaCompiler:
+    """Compile the schemas of one spec file, sharing compiled components between operations"""
+
+    def __init__(self, components: Dict[str, Dict]):
+        self.components = components
+        self._refs: Dict[str, Optional[Check]] = {}
+
+    def compile(self, schema: Dict) -> Check:
+        if '$ref' in schema:
+            return self._ref(schema['$ref'])
+
+        checks = [self.compile(part) for part in schema.get('allOf', [])]
+
+        expected = schema.get('type')
+        if expected in TYPE_CHECKS:
+            is_type = TYPE_CHECKS[expected]
+
+            def check_type(value, path):
+                if not is_type(value):
+                    return f'{path} must be of type {expected}'
+            checks.append(check_type)
+
+        if 'enum' in schema:
+            allowed = schema['enum']
+            allowed_set = frozenset(allowed)
+
+            def check_enum(value, path):
+                try:
+                    if value in allowed_set:
+                        return None
+                except TypeError:
+                    pass
+                return f"{path} must be one of {', '.join(repr(a) for a in allowed)}"
+            checks.append(check_enum)
+
+        checks.extend(self._object_checks(schema))
+        checks.extend(self._array_checks(schema))
+        checks.extend(self._string_checks(schema))
+        checks.extend(self._number_checks(schema))
+
+        nullable = schema.get('nullable', False)
+        if not checks:
+            return lambda value, path: None
+        if len(checks) == 1 and not nullable:
+            return checks[0]
+
+        def check(value, path):
+            if value is None and nullable:
+                return None
+            for each in checks:
+                error = each(value, path)
+                if error:
+                    return error
+            return None
+        return check
+
+    def _ref(self, ref: str) -> Check:
+        name = ref.rsplit('/', 1)[-1]
+        if name not in self._refs:
+            if name not in self.components:
+                raise ValueError(f'Unknown schema reference {ref}')
+            # Placeholder first, so a schema that refers to itself compiles
+            self._refs[name] = None
+            self._refs[name] = self.compile(self.components[name])
+        compiled = self._refs[name]
+        if compiled is None:
+            return lambda value, path: self._refs[name](value, path)
+        return compiled
+
+    def _object_checks(self, schema: Dict):
+        required = tuple(schema.get('required', ()))
+        properties = tuple(
+            (key, self.compile(sub)) for key, sub in schema.get('properties', {}).items()
+        )
+        if not required and not properties:
+            return []
+
+        def check_object(value, path):
+            if not isinstance(value, dict):
+                return None
+            for key in required:
+                if key not in value:
+                    return f'{_at(path, key)} is required'
+            for key, check in properties:
+                if key in value:
+                    error = check(value[key], _at(path, key))
+                    if error:
+                        return error
+            return None
+        return [check_object]
+
+    def _array_checks(self, schema: Dict):
+        min_items = schema.get('minItems')
+        max_items = schema.get('maxItems')
+        items = self.compile(schema['items']) if 'items' in schema else None
+        if min_items is None and max_items is None and items is None:
+            return []
+
+        def check_array(value, path):
+            if not isinstance(value, list):
+                return None
+            if min_items is not None and len(value) < min_items:
+                return f'{path} must have at least {min_items} items'
+            if max_items is not None and len(value) > max_items:
+                return f'{path} must have at most {max_items} items'
+            if items is not None:
+                for index, item in enumerate(value):
+                    error = items(item, _at(path, index))
+                    if error:
+                        return error
+            return None
+        return [check_array]
+
+    def _string_checks(self, schema: Dict):
+        min_length = schema.get('minLength')
+        max_length = schema.get('maxLength')
+        pattern = re.compile(schema['pattern']) if 'pattern' in schema else None
+        if min_length is None and max_length is None and pattern is None:
+            return []
+
+        def check_string(value, path):
+            if not isinstance(value, str):
+                return None
+            if min_length is not None and len(value) < min_length:
+                return f'{path} must be at least {min_length} characters'
+            if max_length is not None and len(value) > max_length:
+                return f'{path} must be at most {max_length} characters'
+            if pattern is not None and not pattern.search(value):
+                return f'{path} does not match the expected format'
+            return None
+        return [check_string]
+
+    def _number_checks(self, schema: Dict):
+        minimum = schema.get('minimum')
+        maximum = schema.get('maximum')
+        if minimum is None and maximum is None:
+            return []
+
+        def check_number(value, path):
+            if not _is_number(value):
+                return None
+            if minimum is not None and value < minimum:
+                return f'{path} must be at least {minimum}'
+            if maximum is not None and value > maximum:
+                return f'{path} must be at most {maximum}'
+            return None
+        return [check_number]
+
+class Operation:
+    """The request body check of one method and path, compiled on first use"""
+    __slots__ = ('schema', 'compiler', '_check', 'body_required', 'source')
+
+    def __init__(self, schema: Dict, compiler: SchemaCompiler, body_required: bool, source: str):
+        self.schema = schema
+        self.compiler = compiler
+        self._check: Optional[Check] = None
+        self.body_required = body_required
+        self.source = source
+
+    @property
+    def check(self) -> Check:
+        # Compiling twice from two threads is harmless, both give the same check
+        if self._check is None:
+            self._check = self.compiler.compile(self.schema)
+        return self._check
+
+def route_key(method: str, path: str) -> Tuple[str, str]:
+    """Normalize an OpenAPI path ({id}) or Flask rule (<string:id>) so the two compare equal"""
+    return method.upper(), re.sub(r'\{[^}]*\}|<[^>]*>', '{}', path)
+
+def load_operations(spec_dir: str) -> Dict[Tuple[str, str], Operation]:
+    """Read the request body schema of every operation in every served spec file"""
+    # Imported here, as only the first request with a body needs it
+    import yaml
+    loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+    operations = {}
+    for path in sorted(glob.glob(os.path.join(spec_dir, '*.yaml'))):
+        name = os.path.basename(path)
+        try:
+            with open(path, 'r') as f:
+                spec = yaml.load(f, Loader=loader) or {}
+        except Exception as e:
+            logger.exception("Error loading API spec %s: %s", name, e)
+            continue
+        if spec.get('x-unrouted'):
+            continue
+        compiler = SchemaCompiler(spec.get('components', {}).get('schemas', {}))
+        for route, methods in (spec.get('paths') or {}).items():
+            for method, operation in methods.items():
+                if not isinstance(operation, dict) or 'requestBody' not in operation:
+                    continue
+                body = operation['requestBody']
+                schema = body.get('content', {}).get('application/json', {}).get('schema')
+                if schema is None:
+                    continue
+                operations[route_key(method, route)] = Operation(
+                    schema, compiler, body.get('required', False), name
+                )
+    return operations
+
+class RequestValidation:
+    """Reject JSON bodies that do not match the API specs before the view runs
+
+    Configuration keys (all optional):
+        REQUEST_VALIDATION - on by default
+        API_SPEC_DIR       - directory of OpenAPI YAML files, default backend/API Specs
+    """
+
+    def __init__(self, app: Optional[Flask] = None):
+        self.spec_dir = SPEC_DIR
+        self._operations: Optional[Dict[Tuple[str, str], Operation]] = None
+        self._lock = threading.Lock()
+        # Flask rule -> compiled operation (or None), filled on first use of each route
+        self._by_rule: Dict[Tuple[str, str], Optional[Operation]] = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app: Flask) -> None:
+        app.config.setdefault('REQUEST_VALIDATION', True)
+        app.config.setdefault('API_SPEC_DIR', SPEC_DIR)
+        app.extensions['request_validation'] = self
+        if not app.config['REQUEST_VALIDATION']:
+            return
+
+        self.spec_dir = app.config['API_SPEC_DIR']
+        app.before_request(self._validate)
+
+    @property
+    def operations(self) -> Dict[Tuple[str, str], Operation]:
+        """Every operation with a request body, read from the specs on first use"""
+        if self._operations is None:
+            with self._lock:
+                if self._operations is None:
+                    self._operations = load_operations(self.spec_dir)
+        return self._operations
+
+    def operation_for(self, method: str, rule: str) -> Optional[Operation]:
+        key = (method, rule)
+        try:
+            return self._by_rule[key]
+        except KeyError:
+            operation = self._by_rule[key] = self.operations.get(route_key(method, rule))
+            return operation
+
+    def _validate(self):
+        if request.method not in BODY_METHODS or request.url_rule is None:
+            return None
+        operation = self.operation_for(request.method, request.url_rule.rule)
+        if operation is None:
+            return None
+
+        body = request.get_json(silent=True)
+        if body is None:
+            error = 'body must be JSON' if operation.body_required else None
+        else:
+            error = operation.check(body, 'body')
+        if error is None:
+            return None
+        # Handlers here report problems under either key, so send both
+        return jsonify({'error_code': 'INVALID_REQUEST', 'message': error, 'error': error}), 400
@@ -0,0 +1,72 @@
+import argparse
+import json
+import shutil
+import sys
+import tempfile
+import time
+
+from app import create_app
+from .generator import SCALES, Scale, generate_books
+from .runner import format_table, run_scenario
+from .scenarios import SCENARIOS, Fixtures
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks',
+        description='Generate seeded books and time every endpoint against them through the Flask test client'
+    )
+    parser.add_argument('--scale', choices=sorted(SCALES), default='10k', help='preset number of invoices')
+    parser.add_argument('--records', type=int, help='number of invoices, overrides --scale')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--iterations', type=int, default=50, help='requests per scenario')
+    parser.add_argument('--max-seconds', type=float, default=10.0, help='time budget per scenario')
+    parser.add_argument('--only', help='comma separated scenario name prefixes, e.g. invoices,coa.list')
+    parser.add_argument('--reads-only', action='store_true', help='skip scenarios that change data')
+    parser.add_argument('--data-dir', help='generate into this directory and keep it')
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args()
+
+    scale = Scale.for_records(args.records) if args.records else SCALES[args.scale]
+    directory = args.data_dir or tempfile.mkdtemp(prefix='books-')
+
+    started = time.perf_counter()
+    sizes = generate_books(directory, scale, args.seed)
+    print(f"Generated {scale} in {time.perf_counter() - started:.1f}s into {directory}")
+    for name, size in sorted(sizes.items()):
+        print(f"  {name:<24}{size / 1024 / 1024:>10.2f} MB")
+
+    scenarios = SCENARIOS
+    if args.only:
+        prefixes = tuple(p.strip() for p in args.only.split(',') if p.strip())
+        scenarios = [s for s in scenarios if s.name.startswith(prefixes)]
+    if args.reads_only:
+        scenarios = [s for s in scenarios if not s.writes]
+    # Reads first, so they see the books exactly as generated
+    scenarios = [s for s in scenarios if not s.writes] + [s for s in scenarios if s.writes]
+
+    app = create_app({'DATA_DIR': directory})
+    client = app.test_client()
+    fixtures = Fixtures(directory, args.seed)
+
+    results = []
+    try:
+        for scenario in scenarios:
+            print(f"  running {scenario.name}...", file=sys.stderr)
+            results.append(run_scenario(client, scenario, fixtures, args.iterations, args.max_seconds))
+    finally:
+        if not args.data_dir:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    print()
+    print(format_table(results))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({
+                'scale': scale.__dict__,
+                'seed': args.seed,
+                'file_sizes': sizes,
+                'results': [r.to_dict() for r in results]
+            }, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,340 @@
+import json
+import os
+import random
+import shutil
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Set
+
+from app import dates, money, storage
+from app.chart_of_accounts.models import ACCOUNT_TYPE_DETAILS
+from app.chart_of_accounts.routes import update_summary as accounts_summary
+from app.estimates.routes import update_summary as estimates_summary
+from app.invoices.routes import (
+    ACCOUNTS_RECEIVABLE_ID, CASH_AND_BANK_ID, SALES_REVENUE_ID, update_summary as invoices_summary
+)
+from app.invoices.models import PAYMENT_METHODS, Product
+
+FIRST_NAMES = ['Ava', 'Liam', 'Maya', 'Noah', 'Priya', 'Omar', 'Sofia', 'Chen', 'Lucas', 'Zara', 'Ethan', 'Aisha']
+LAST_NAMES = ['Patel', 'Nguyen', 'Garcia', 'Smith', 'Khan', 'Kim', 'Rossi', 'Okafor', 'Silva', 'Muller', 'Cohen', 'Sato']
+CITIES = [('Austin', 'TX'), ('Denver', 'CO'), ('Seattle', 'WA'), ('Boston', 'MA'), ('Phoenix', 'AZ'), ('Atlanta', 'GA')]
+STREETS = ['Main St', 'Oak Ave', 'Pine Rd', 'Maple Dr', 'Cedar Ln', 'Elm St', 'Lake Blvd']
+PRODUCTS = [
+    ('Consulting', 'Hourly consulting', 150.0),
+    ('Design', 'Design work', 95.0),
+    ('Support plan', 'Monthly support', 49.0),
+    ('Hardware', 'Equipment', 420.0),
+    ('Training', 'On-site training session', 800.0),
+    ('License', 'Annual software license', 1200.0),
+]
+PAYMENT_TERMS_DAYS = {'due_on_receipt': 0, 'net_15': 15, 'net_30': 30, 'net_60': 60}
+
+# Share of invoices per status; posted and overdue invoices may be part paid
+INVOICE_STATUSES = [('draft', 0.10), ('posted', 0.45), ('paid', 0.30), ('overdue', 0.10), ('void', 0.05)]
+
+DEFAULT_ACCOUNTS = os.path.join(storage.DATA_DIR, 'default_accounts.json')
+
+@dataclass
+class Scale:
+    """How many records of each kind to generate"""
+    invoices: int
+    customers: int
+    estimates: int
+    accounts: int
+    expenses: int
+    max_products: int = 5
+
+    @classmethod
+    def for_records(cls, records: int) -> 'Scale':
+        """Scale everything from a number of invoices; transactions end up at about twice that"""
+        return cls(
+            invoices=records,
+            customers=max(1, records // 20),
+            estimates=max(1, records // 4),
+            accounts=21 + records // 500,
+            expenses=records // 2
+        )
+
+SCALES = {
+    'tiny': Scale.for_records(200),
+    '10k': Scale.for_records(10_000),
+    '100k': Scale.for_records(100_000),
+    '1m': Scale.for_records(1_000_000),
+}
+
+class _Ids:
+    """Unique ids in the repo's NNNN-NNNN format, drawn from a seeded generator"""
+
+    def __init__(self, rng: random.Random):
+        self.rng = rng
+        self.seen: Set[str] = set()
+
+    def next(self) -> str:
+        while True:
+            value = f'{self.rng.randint(1000, 9999)}-{self.rng.randint(1000, 9999)}'
+            if value not in self.seen:
+                self.seen.add(value)
+                return value
+
+class BooksGenerator:
+    """Build a consistent set of books: every posted invoice and payment has a balanced transaction"""
+
+    def __init__(self, scale: Scale, seed: int = 1, start: date = date(2023, 1, 1), days: int = 730):
+        self.scale = scale
+        self.rng = random.Random(seed)
+        self.ids = _Ids(self.rng)
+        self.start = start
+        self.days = days
+        self.transactions: List[Dict] = []
+
+    def _date(self) -> date:
+        return self.start + timedelta(days=self.rng.randrange(self.days))
+
+    def _timestamp(self, day: date) -> str:
+        moment = datetime.combine(day, datetime.min.time()) + timedelta(seconds=self.rng.randrange(86400))
+        return moment.isoformat()
+
+    def _transaction(self, day: str, description: str, transaction_type: str, debit: str, credit: str,
+                     amount: float, reference_type: Optional[str] = None, reference_id: Optional[str] = None,
+                     status: str = 'posted') -> Dict:
+        created = f'{day}T12:00:00'
+        transaction = {
+            'id': f'TXN-{len(self.transactions) + 100000}',
+            'date': day,
+            'entries': [
+                {'accountId': debit, 'amount': amount, 'type': 'debit', 'description': description},
+                {'accountId': credit, 'amount': amount, 'type': 'credit', 'description': description}
+            ],
+            'status': status,
+            'description': description,
+            'transaction_type': transaction_type,
+            'reference_type': reference_type,
+            'reference_id': reference_id,
+            'created_at': created,
+            'updated_at': created,
+            'posted_at': created if status == 'posted' else None,
+            'voided_at': None,
+            'created_by': None,
+            'updated_by': None,
+            'posted_by': None,
+            'voided_by': None
+        }
+        dates.stamp(transaction, 'date')
+        for entry in transaction['entries']:
+            money.stamp(entry, 'amount')
+        self.transactions.append(transaction)
+        return transaction
+
+    def accounts(self) -> Dict:
+        with open(DEFAULT_ACCOUNTS, 'r') as f:
+            accounts = json.load(f)['accounts']
+        for account in accounts:
+            account['currentBalance'] = account.get('openingBalance', 0.0)
+        account_types = list(ACCOUNT_TYPE_DETAILS)
+        for number in range(len(accounts), self.scale.accounts):
+            account_type = self.rng.choice(account_types)
+            opening = round(self.rng.uniform(0, 50000), 2)
+            accounts.append({
+                'id': self.ids.next(),
+                'name': f'{account_type} {number}',
+                'accountType': account_type,
+                'detailType': self.rng.choice(ACCOUNT_TYPE_DETAILS[account_type]),
+                'description': f'Generated {account_type.lower()} account',
+                'openingBalance': opening,
+                'currentBalance': opening,
+                'quickbooksBalance': 0.0,
+                'active': self.rng.random() > 0.05,
+                'isDefault': False
+            })
+        return {'accounts': accounts, 'summary': accounts_summary(accounts).to_dict()}
+
+    def customers(self) -> Dict:
+        customers = []
+        for number in range(1, self.scale.customers + 1):
+            first = self.rng.choice(FIRST_NAMES)
+            # The number keeps names unique, which customer creation requires
+            last = f'{self.rng.choice(LAST_NAMES)}-{number}'
+            city, state = self.rng.choice(CITIES)
+            created = self._timestamp(self._date())
+            customers.append({
+                'id': self.ids.next(),
+                'customer_no': f'CUST-2024-{number:03d}',
+                'first_name': first,
+                'last_name': last,
+                'company_name': f'{last} Holdings' if self.rng.random() < 0.4 else '',
+                'email': f'{first.lower()}.{last.lower()}@example.com',
+                'phone': f'555{self.rng.randint(1000000, 9999999)}',
+                'website': '',
+                'billing_address': {
+                    'street': f'{self.rng.randint(1, 9999)} {self.rng.choice(STREETS)}',
+                    'city': city,
+                    'state': state,
+                    'postal_code': f'{self.rng.randint(10000, 99999)}',
+                    'country': 'United States'
+                },
+                'shipping_address': None,
+                'use_billing_for_shipping': True,
+                'created_at': created,
+                'updated_at': created
+            })
+        return {'customers': customers}
+
+    def _products(self, with_quantity: bool) -> List[Dict]:
+        products = []
+        for _ in range(self.rng.randint(1, self.scale.max_products)):
+            name, description, price = self.rng.choice(PRODUCTS)
+            if with_quantity:
+                quantity = float(self.rng.randint(1, 10))
+                tax_rate = self.rng.choice([0.0, 0.0, 5.0, 8.25])
+                # The model works out tax and total in cents, as the app does
+                products.append(Product(name, description, price, quantity, tax_rate).to_dict())
+            else:
+                products.append({'name': name, 'description': description, 'price': price})
+        return products
+
+    def estimates(self, customer_names: List[str]) -> Dict:
+        estimates = []
+        for number in range(1, self.scale.estimates + 1):
+            day = self._date()
+            products = self._products(with_quantity=False)
+            created = self._timestamp(day)
+            estimates.append({
+                'id': self.ids.next(),
+                'estimate_no': f'EST-2024-{number:03d}',
+                'estimate_date': day.isoformat(),
+                'customer_name': self.rng.choice(customer_names),
+                'status': self.rng.choice(['Draft', 'Sent', 'Accepted', 'Declined']),
+                'products': products,
+                'total_amount': round(sum(p['price'] for p in products), 2),
+                'created_at': created,
+                'updated_at': created
+            })
+            dates.stamp(estimates[-1], 'estimate_date')
+            money.stamp(estimates[-1], 'total_amount')
+        return {'estimates': estimates, 'summary': estimates_summary(estimates).to_dict()}
+
+    def _status(self) -> str:
+        roll = self.rng.random()
+        for status, share in INVOICE_STATUSES:
+            if roll < share:
+                return status
+            roll -= share
+        return INVOICE_STATUSES[-1][0]
+
+    def invoices(self, customer_names: List[str]) -> Dict:
+        invoices = []
+        for number in range(1, self.scale.invoices + 1):
+            day = self._date()
+            terms = self.rng.choice(list(PAYMENT_TERMS_DAYS))
+            products = self._products(with_quantity=True)
+            total = money.from_cents(sum(p['total_cents'] for p in products))
+            status = self._status()
+            invoice_id = self.ids.next()
+            invoice_no = f'INV-2024-{number:03d}'
+            created = self._timestamp(day)
+            invoice = {
+                'id': invoice_id,
+                'invoice_no': invoice_no,
+                'invoice_date': day.isoformat(),
+                'due_date': (day + timedelta(days=PAYMENT_TERMS_DAYS[terms])).isoformat(),
+                'customer_name': self.rng.choice(customer_names),
+                'status': status,
+                'products': products,
+                'total_amount': total,
+                'balance_due': total,
+                'payments': [],
+                'payment_terms': terms,
+                'notes': None,
+                'created_at': created,
+                'updated_at': created,
+                'last_payment_date': None,
+                'converted_from_estimate': None
+            }
+            dates.stamp(invoice, 'invoice_date', 'due_date')
+
+            if status != 'draft':
+                self._transaction(
+                    invoice['invoice_date'], f'Invoice {invoice_no} posted', 'invoice',
+                    ACCOUNTS_RECEIVABLE_ID, SALES_REVENUE_ID, total, 'invoice', invoice_id,
+                    status='void' if status == 'void' else 'posted'
+                )
+
+            if status == 'paid':
+                amounts = [total] if self.rng.random() < 0.7 else [round(total / 2, 2), round(total - round(total / 2, 2), 2)]
+            elif status in ('posted', 'overdue') and self.rng.random() < 0.3:
+                amounts = [round(total * self.rng.uniform(0.1, 0.9), 2)]
+            else:
+                amounts = []
+            for amount in amounts:
+                payment_day = min(day + timedelta(days=self.rng.randint(0, 45)), self.start + timedelta(days=self.days))
+                payment_id = self.ids.next()
+                transaction = self._transaction(
+                    payment_day.isoformat(), f'Payment for Invoice {invoice_no}', 'payment',
+                    CASH_AND_BANK_ID, ACCOUNTS_RECEIVABLE_ID, amount, 'invoice_payment', f'{invoice_id}_{payment_id}'
+                )
+                invoice['payments'].append({
+                    'id': payment_id,
+                    'date': payment_day.isoformat(),
+                    'amount': amount,
+                    'payment_method': self.rng.choice(PAYMENT_METHODS),
+                    'reference': None,
+                    'notes': None,
+                    'created_at': self._timestamp(payment_day),
+                    'transaction_id': transaction['id']
+                })
+                dates.stamp(invoice['payments'][-1], 'date')
+                money.stamp(invoice['payments'][-1], 'amount')
+            if invoice['payments']:
+                invoice['balance_due'] = money.from_cents(money.to_cents(total) - sum(map(money.to_cents, amounts)))
+                invoice['last_payment_date'] = max(p['date'] for p in invoice['payments'])
+            money.stamp(invoice, 'total_amount', 'balance_due')
+            invoices.append(invoice)
+        return {'invoices': invoices, 'summary': invoices_summary(invoices).to_dict()}
+
+    def expenses(self, accounts: List[Dict]) -> None:
+        expense_ids = [a['id'] for a in accounts if a['accountType'] in ('Expense', 'Other Expense', 'Cost of Goods Sold')]
+        bank_ids = [a['id'] for a in accounts if a['accountType'] == 'Bank']
+        if not expense_ids or not bank_ids:
+            return
+        for _ in range(self.scale.expenses):
+            day = self._date().isoformat()
+            # A few are left as drafts so post, patch and delete have something to work on
+            self._transaction(
+                day, 'Generated expense', 'expense',
+                self.rng.choice(expense_ids), self.rng.choice(bank_ids), round(self.rng.uniform(5, 2500), 2),
+                status='draft' if self.rng.random() < 0.05 else 'posted'
+            )
+
+def _write(directory: str, name: str, data) -> int:
+    path = os.path.join(directory, name)
+    with open(path, 'w') as f:
+        # Same layout as storage.save_json, so file sizes match real books
+        json.dump(data, f, indent=2)
+    return os.path.getsize(path)
+
+def generate_books(directory: str, scale: Scale, seed: int = 1) -> Dict[str, int]:
+    """Write a full set of data files into directory; returns the size of each file in bytes"""
+    os.makedirs(directory, exist_ok=True)
+    generator = BooksGenerator(scale, seed)
+    sizes = {}
+
+    accounts = generator.accounts()
+    sizes['chart_of_accounts.json'] = _write(directory, 'chart_of_accounts.json', accounts)
+
+    customers = generator.customers()
+    sizes['customers.json'] = _write(directory, 'customers.json', customers)
+    names = [f"{c['first_name']} {c['last_name']}" for c in customers['customers']]
+    del customers
+
+    sizes['estimates.json'] = _write(directory, 'estimates.json', generator.estimates(names))
+    sizes['invoices.json'] = _write(directory, 'invoices.json', generator.invoices(names))
+    generator.expenses(accounts['accounts'])
+    sizes['transactions.json'] = _write(directory, 'transactions.json', {'transactions': generator.transactions})
+
+    # Settings documents are small and not scaled; copy them when present
+    for name in ('company.json', 'advanced.json'):
+        source = os.path.join(storage.DATA_DIR, name)
+        if os.path.exists(source):
+            shutil.copyfile(source, os.path.join(directory, name))
+            sizes[name] = os.path.getsize(source)
+    return sizes
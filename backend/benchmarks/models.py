@@ -0,0 +1,122 @@
+"""Memory and construction time of the ledger models
+
+Builds a full in-memory ledger (every transaction and invoice the
+generator produces) as parsed dicts, as slotted models through from_dict
+and from_stored, and as unslotted copies of the same dataclasses for
+comparison:
+
+    python -m benchmarks.models --records 100000
+"""
+import argparse
+import dataclasses
+import gc
+import json
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+
+from app.invoices.models import Invoice, Payment, Product
+from app.transactions.models import Transaction, TransactionEntry
+from .generator import BooksGenerator, Scale
+
+def unslotted(cls):
+    """The same dataclass without slots, i.e. with a per-instance __dict__"""
+    return dataclasses.make_dataclass(cls.__name__, [
+        (f.name, f.type, dataclasses.field(default=f.default, default_factory=f.default_factory))
+        for f in dataclasses.fields(cls)
+    ])
+
+PlainEntry = unslotted(TransactionEntry)
+PlainTransaction = unslotted(Transaction)
+PlainProduct = unslotted(Product)
+PlainPayment = unslotted(Payment)
+PlainInvoice = unslotted(Invoice)
+
+def _values(obj) -> List:
+    return [getattr(obj, f.name) for f in dataclasses.fields(obj)]
+
+def plain_transaction(t: Transaction):
+    values = _values(t)
+    values[2] = [PlainEntry(*_values(e)) for e in t.entries]
+    return PlainTransaction(*values)
+
+def plain_invoice(i: Invoice):
+    values = _values(i)
+    values[6] = [PlainProduct(*_values(p)) for p in i.products]
+    values[9] = [PlainPayment(*_values(p)) for p in i.payments]
+    return PlainInvoice(*values)
+
+def measure(build: Callable[[], object]) -> Dict[str, float]:
+    """Seconds to build without tracing, then bytes still held by the result with tracing on"""
+    gc.collect()
+    started = time.perf_counter()
+    result = build()
+    seconds = time.perf_counter() - started
+    del result
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = build()
+        held = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del result
+    return {'seconds': seconds, 'bytes': held}
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks.models',
+        description='Compare memory and construction time of dicts, slotted models and unslotted models'
+    )
+    parser.add_argument('--records', type=int, default=100000, help='number of invoices to generate')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args()
+
+    generator = BooksGenerator(Scale.for_records(args.records), args.seed)
+    accounts = generator.accounts()['accounts']
+    names = [f"{c['first_name']} {c['last_name']}" for c in generator.customers()['customers']]
+    invoices_text = json.dumps(generator.invoices(names)['invoices'])
+    generator.expenses(accounts)
+    transactions_text = json.dumps(generator.transactions)
+    del generator
+
+    transactions = json.loads(transactions_text)
+    invoices = json.loads(invoices_text)
+    counts = {'transactions': len(transactions), 'invoices': len(invoices)}
+    entries = sum(len(t['entries']) for t in transactions)
+    del transactions, invoices
+
+    # Every variant starts from the JSON text, so each holds its own strings
+    cases = [
+        ('transactions', 'dicts', lambda: json.loads(transactions_text)),
+        ('transactions', 'slots, from_dict', lambda: [Transaction.from_dict(t) for t in json.loads(transactions_text)]),
+        ('transactions', 'slots, from_stored', lambda: [Transaction.from_stored(t) for t in json.loads(transactions_text)]),
+        ('transactions', 'no slots', lambda: [
+            plain_transaction(Transaction.from_stored(t)) for t in json.loads(transactions_text)
+        ]),
+        ('invoices', 'dicts', lambda: json.loads(invoices_text)),
+        ('invoices', 'slots, from_dict', lambda: [Invoice.from_dict(i) for i in json.loads(invoices_text)]),
+        ('invoices', 'slots, from_stored', lambda: [Invoice.from_stored(i) for i in json.loads(invoices_text)]),
+        ('invoices', 'no slots', lambda: [plain_invoice(Invoice.from_stored(i)) for i in json.loads(invoices_text)]),
+    ]
+
+    print(f"{counts['transactions']} transactions with {entries} entries, {counts['invoices']} invoices")
+    print("Times include parsing; 'no slots' also copies from slotted instances, so only its memory compares\n")
+    header = f"{'model':<14}{'variant':<22}{'records':>10}{'seconds':>10}{'MB':>10}{'bytes/rec':>12}"
+    print(header)
+    print('-' * len(header))
+    results = []
+    for model, variant, build in cases:
+        count = counts[model]
+        m = measure(build)
+        results.append({'model': model, 'variant': variant, 'records': count, **m})
+        print(f"{model:<14}{variant:<22}{count:>10}{m['seconds']:>10.3f}"
+              f"{m['bytes'] / 1024 / 1024:>10.1f}{m['bytes'] / max(count, 1):>12.0f}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'records': args.records, 'seed': args.seed, 'entries': entries, 'results': results}, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+import math
+import time
+import tracemalloc
+from collections import Counter
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from .scenarios import Fixtures, Scenario
+
+@dataclass
+class Result:
+    """Timings of one scenario; latencies are in milliseconds"""
+    name: str
+    method: str
+    requests: int
+    errors: int
+    ops_per_sec: float
+    p50_ms: float
+    p99_ms: float
+    max_ms: float
+    peak_kb: Optional[float]
+    statuses: Dict[int, int] = field(default_factory=dict)
+    note: str = ''
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+def percentile(ordered: List[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not ordered:
+        return 0.0
+    index = max(0, min(len(ordered) - 1, math.ceil(q / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+def prepare(scenario: Scenario, fixtures: Fixtures) -> Optional[Tuple[str, object]]:
+    """Path and body of the next request, or None once the scenario's pool is used up"""
+    record_id = None
+    if scenario.pool is not None:
+        record_id = fixtures.take(scenario.pool) if scenario.consume else fixtures.pick(scenario.pool)
+        if record_id is None:
+            return None
+    path = scenario.path.replace('{id}', record_id) if record_id is not None else scenario.path
+    body = scenario.body(fixtures, record_id) if scenario.body is not None else None
+    return path, body
+
+def issue(client, scenario: Scenario, path: str, body) -> int:
+    """Send one request and read the whole body, as a real client would"""
+    response = client.open(path, method=scenario.method, json=body)
+    try:
+        if scenario.stream:
+            for count, _ in enumerate(response.response, start=1):
+                if scenario.max_chunks is not None and count >= scenario.max_chunks:
+                    break
+        else:
+            response.get_data()
+        return response.status_code
+    finally:
+        response.close()
+
+def run_scenario(client, scenario: Scenario, fixtures: Fixtures, iterations: int, max_seconds: float) -> Result:
+    """Time up to iterations requests, then measure peak allocation of one more"""
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    note = ''
+    started = time.perf_counter()
+    for _ in range(iterations):
+        request = prepare(scenario, fixtures)
+        if request is None:
+            note = f'fixture pool {scenario.pool} exhausted'
+            break
+        before = time.perf_counter()
+        statuses[issue(client, scenario, *request)] += 1
+        latencies.append(time.perf_counter() - before)
+        if time.perf_counter() - started > max_seconds:
+            note = f'stopped after {max_seconds:g}s'
+            break
+    elapsed = time.perf_counter() - started
+
+    # Tracing slows everything down, so memory gets its own untimed request
+    peak_kb = None
+    request = prepare(scenario, fixtures)
+    if request is not None:
+        tracemalloc.start()
+        try:
+            statuses[issue(client, scenario, *request)] += 1
+            peak_kb = tracemalloc.get_traced_memory()[1] / 1024
+        finally:
+            tracemalloc.stop()
+
+    ordered = sorted(latency * 1000 for latency in latencies)
+    return Result(
+        name=scenario.name,
+        method=scenario.method,
+        requests=len(latencies),
+        errors=sum(count for status, count in statuses.items() if status >= 400),
+        ops_per_sec=len(latencies) / elapsed if elapsed and latencies else 0.0,
+        p50_ms=percentile(ordered, 50),
+        p99_ms=percentile(ordered, 99),
+        max_ms=ordered[-1] if ordered else 0.0,
+        peak_kb=peak_kb,
+        statuses=dict(statuses),
+        note=note
+    )
+
+def format_table(results: List[Result]) -> str:
+    header = f"{'scenario':<32}{'reqs':>6}{'errors':>8}{'ops/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}{'peak KB':>10}  note"
+    lines = [header, '-' * len(header)]
+    for r in results:
+        peak = f'{r.peak_kb:.0f}' if r.peak_kb is not None else '-'
+        lines.append(
+            f'{r.name:<32}{r.requests:>6}{r.errors:>8}{r.ops_per_sec:>10.1f}'
+            f'{r.p50_ms:>10.2f}{r.p99_ms:>10.2f}{r.max_ms:>10.2f}{peak:>10}  {r.note}'
+        )
+    return '\n'.join(lines)
@@ -0,0 +1,234 @@
+import json
+import os
+import random
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+PRODUCT = {'name': 'Consulting', 'description': 'Hourly consulting', 'price': 150.0, 'quantity': 2}
+
+class Fixtures:
+    """Ids drawn from the generated books, for paths that need an existing record
+
+    Pools of records a scenario changes for good (deleted, voided, posted)
+    are handed out once, so every scenario works on records no other
+    scenario has touched.
+    """
+
+    def __init__(self, directory: str, seed: int = 1):
+        self.rng = random.Random(seed)
+        self.pools: Dict[str, List[str]] = {}
+        self._counter = 0
+
+        def load(name: str, key: str) -> List[Dict]:
+            path = os.path.join(directory, name)
+            if not os.path.exists(path):
+                return []
+            with open(path, 'r') as f:
+                return json.load(f).get(key, [])
+
+        invoices = load('invoices.json', 'invoices')
+        self.pools['invoice'] = [i['id'] for i in invoices]
+        self.pools['draft_invoice'] = [i['id'] for i in invoices if i['status'] == 'draft']
+        self.pools['open_invoice'] = [
+            i['id'] for i in invoices if i['status'] in ('posted', 'overdue') and not i['payments']
+        ]
+        self.balances = {i['id']: i['balance_due'] for i in invoices}
+        del invoices
+
+        estimates = load('estimates.json', 'estimates')
+        self.pools['estimate'] = [e['id'] for e in estimates]
+        self.pools['open_estimate'] = [e['id'] for e in estimates if not e.get('converted_to_invoice')]
+        del estimates
+
+        self.pools['customer'] = [c['id'] for c in load('customers.json', 'customers')]
+
+        accounts = load('chart_of_accounts.json', 'accounts')
+        self.pools['account'] = [a['id'] for a in accounts]
+        self.pools['removable_account'] = [a['id'] for a in accounts if not a.get('isDefault')]
+        del accounts
+
+        transactions = load('transactions.json', 'transactions')
+        self.pools['transaction'] = [t['id'] for t in transactions]
+        self.pools['draft_transaction'] = [t['id'] for t in transactions if t['status'] == 'draft']
+        self.pools['posted_transaction'] = [
+            t['id'] for t in transactions if t['status'] == 'posted' and t.get('transaction_type') == 'expense'
+        ]
+        del transactions
+
+        for pool in self.pools.values():
+            self.rng.shuffle(pool)
+
+    def pick(self, pool: str) -> Optional[str]:
+        """A random id from a pool, which stays available"""
+        ids = self.pools.get(pool)
+        return self.rng.choice(ids) if ids else None
+
+    def take(self, pool: str) -> Optional[str]:
+        """Remove and return an id, so no later request gets the same record"""
+        ids = self.pools.get(pool)
+        return ids.pop() if ids else None
+
+    def unique(self) -> int:
+        self._counter += 1
+        return self._counter
+
+@dataclass
+class Scenario:
+    """One endpoint call; path may contain {id}, filled from a fixture pool per request"""
+    name: str
+    method: str
+    path: str
+    pool: Optional[str] = None
+    consume: bool = False
+    body: Optional[Callable[[Fixtures, Optional[str]], Any]] = None
+    stream: bool = False
+    # For streams that never end, stop after this many chunks
+    max_chunks: Optional[int] = None
+
+    @property
+    def writes(self) -> bool:
+        return self.method != 'GET'
+
+def _customer_body(fixtures: Fixtures, _) -> Dict:
+    n = fixtures.unique()
+    return {
+        'first_name': 'Bench',
+        'last_name': f'Customer-{n}-{fixtures.rng.randint(0, 10**9)}',
+        'email': f'bench{n}@example.com',
+        'phone': '5550000000',
+        'billing_address': {
+            'street': '1 Main St', 'city': 'Austin', 'state': 'TX', 'postal_code': '78701', 'country': 'United States'
+        }
+    }
+
+def _invoice_body(fixtures: Fixtures, _) -> Dict:
+    return {
+        'customer_name': 'Bench Customer',
+        'invoice_date': '2024-06-01',
+        'payment_terms': 'net_30',
+        'products': [PRODUCT]
+    }
+
+def _estimate_body(fixtures: Fixtures, _) -> Dict:
+    return {
+        'customer_name': 'Bench Customer',
+        'estimate_date': '2024-06-01',
+        'status': 'Draft',
+        'products': [{'name': 'Design', 'description': 'Design work', 'price': 95.0}]
+    }
+
+def _account_body(fixtures: Fixtures, _) -> Dict:
+    return {
+        'name': f'Bench account {fixtures.unique()}-{fixtures.rng.randint(0, 10**9)}',
+        'accountType': 'Bank',
+        'detailType': 'Checking',
+        'openingBalance': 100.0
+    }
+
+def _transaction_body(fixtures: Fixtures, _) -> Dict:
+    return {
+        'date': '2024-06-01',
+        'description': 'Bench transfer',
+        'transaction_type': 'other',
+        'entries': [
+            {'accountId': '1000', 'amount': 25.0, 'type': 'debit', 'description': 'Bench'},
+            {'accountId': '4000', 'amount': 25.0, 'type': 'credit', 'description': 'Bench'}
+        ]
+    }
+
+def _payment_body(fixtures: Fixtures, invoice_id: Optional[str]) -> Dict:
+    # Paying the full balance keeps the invoice in a status the summary understands
+    return {'amount': fixtures.balances.get(invoice_id, 10.0), 'payment_method': 'check'}
+
+SCENARIOS: List[Scenario] = [
+    # Reference data
+    Scenario('meta', 'GET', '/api/meta'),
+    Scenario('coa.account_types', 'GET', '/api/coa/account_types'),
+    Scenario('coa.detail_types', 'GET', '/api/coa/detail-types/Bank'),
+    Scenario('invoices.status_types', 'GET', '/api/invoices/status_types'),
+    Scenario('estimates.status_types', 'GET', '/api/estimates/status_types'),
+    Scenario('company.field_options', 'GET', '/api/company/get_field_options'),
+    Scenario('advanced.field_options', 'GET', '/api/advanced/get_field_options'),
+    Scenario('search.suggest', 'GET', '/api/search/suggest?q=ca'),
+
+    # Chart of accounts
+    Scenario('coa.list', 'GET', '/api/coa/list_accounts'),
+    Scenario('coa.get', 'GET', '/api/coa/get/{id}', pool='account'),
+    Scenario('coa.create', 'POST', '/api/coa/create_account', body=_account_body),
+    Scenario('coa.update', 'PATCH', '/api/coa/update/{id}', pool='removable_account',
+             body=lambda f, _: {'description': f'Updated {f.unique()}'}),
+    Scenario('coa.update_balance', 'POST', '/api/coa/update-balance/{id}', pool='removable_account',
+             body=lambda f, _: {'amount': 10.0, 'type': 'debit'}),
+    Scenario('coa.validate_transaction', 'POST', '/api/coa/validate-transaction/{id}', pool='account',
+             body=lambda f, _: {'amount': 10.0, 'type': 'credit'}),
+    Scenario('coa.delete', 'DELETE', '/api/coa/delete_account/{id}', pool='removable_account', consume=True),
+
+    # Customers
+    Scenario('customers.list', 'GET', '/api/customers/list_customers'),
+    Scenario('customers.get', 'GET', '/api/customers/get_customer/{id}', pool='customer'),
+    Scenario('customers.statement', 'GET', '/api/customers/{id}/statement', pool='customer'),
+    Scenario('customers.summary', 'GET', '/api/customers/summary'),
+    Scenario('customers.next_number', 'GET', '/api/customers/next_number'),
+    Scenario('customers.create', 'POST', '/api/customers/create_customer', body=_customer_body),
+    Scenario('customers.update', 'PUT', '/api/customers/update_customer/{id}', pool='customer',
+             body=lambda f, _: {'phone': f'555{f.rng.randint(1000000, 9999999)}'}),
+    Scenario('customers.delete', 'DELETE', '/api/customers/delete_customer/{id}', pool='customer', consume=True),
+
+    # Estimates
+    Scenario('estimates.list', 'GET', '/api/estimates/list_estimates'),
+    Scenario('estimates.get', 'GET', '/api/estimates/get_estimate/{id}', pool='estimate'),
+    Scenario('estimates.next_number', 'GET', '/api/estimates/next_number'),
+    Scenario('estimates.create', 'POST', '/api/estimates/create_estimate', body=_estimate_body),
+    Scenario('estimates.update', 'PATCH', '/api/estimates/update_estimate/{id}', pool='open_estimate',
+             body=lambda f, _: {'status': 'Sent'}),
+    Scenario('estimates.convert', 'POST', '/api/estimates/convert_to_invoice/{id}', pool='open_estimate', consume=True),
+    Scenario('estimates.delete', 'DELETE', '/api/estimates/delete_estimate/{id}', pool='open_estimate', consume=True),
+
+    # Invoices
+    Scenario('invoices.list', 'GET', '/api/invoices/list_invoices'),
+    Scenario('invoices.get', 'GET', '/api/invoices/get_invoice/{id}', pool='invoice'),
+    Scenario('invoices.summary', 'GET', '/api/invoices/get_summary'),
+    Scenario('invoices.next_number', 'GET', '/api/invoices/next_number'),
+    Scenario('invoices.payments', 'GET', '/api/invoices/get_payments/{id}', pool='invoice'),
+    Scenario('invoices.create', 'POST', '/api/invoices/create_invoice', body=_invoice_body),
+    Scenario('invoices.update', 'PATCH', '/api/invoices/update_invoice/{id}', pool='draft_invoice',
+             body=lambda f, _: {'notes': f'Updated {f.unique()}'}),
+    Scenario('invoices.add_payment', 'POST', '/api/invoices/add_payment/{id}', pool='open_invoice', consume=True,
+             body=_payment_body),
+    Scenario('invoices.void', 'POST', '/api/invoices/void_invoice/{id}', pool='open_invoice', consume=True),
+    Scenario('invoices.delete', 'DELETE', '/api/invoices/delete_invoice/{id}', pool='draft_invoice', consume=True),
+
+    # Transactions
+    Scenario('transactions.list', 'GET', '/api/transactions/list'),
+    Scenario('transactions.get', 'GET', '/api/transactions/get/{id}', pool='transaction'),
+    Scenario('transactions.export_ndjson', 'GET', '/api/transactions/export?format=ndjson', stream=True),
+    Scenario('transactions.balances', 'GET', '/api/transactions/balances'),
+    Scenario('transactions.create', 'POST', '/api/transactions/create', body=_transaction_body),
+    Scenario('transactions.patch', 'PATCH', '/api/transactions/patch/{id}', pool='draft_transaction',
+             body=lambda f, _: {'description': f'Patched {f.unique()}'}),
+    Scenario('transactions.post', 'POST', '/api/transactions/post/{id}', pool='draft_transaction', consume=True),
+    Scenario('transactions.void', 'POST', '/api/transactions/void/{id}', pool='posted_transaction', consume=True,
+             body=lambda f, _: {'reason': 'Benchmark'}),
+    Scenario('transactions.delete', 'DELETE', '/api/transactions/delete/{id}', pool='draft_transaction', consume=True),
+
+    # Company and advanced settings
+    Scenario('company.get', 'GET', '/api/company/get_company'),
+    Scenario('company.update', 'PATCH', '/api/company/update_company',
+             body=lambda f, _: {
+                 'company_name_info': {'company_name': 'Bench Books'},
+                 'contact_info': {'company_phone': f'555{f.rng.randint(1000000, 9999999)}'}
+             }),
+    Scenario('advanced.get', 'GET', '/api/advanced/get_advanced'),
+
+    # Change feed, batch, events and operations endpoints
+    Scenario('changes.list', 'GET', '/api/changes?since=0&limit=500'),
+    Scenario('batch.reads', 'POST', '/api/batch', body=lambda f, _: {'requests': [
+        {'method': 'GET', 'path': '/api/invoices/get_summary'},
+        {'method': 'GET', 'path': '/api/customers/summary'},
+        {'method': 'GET', 'path': '/api/coa/list_accounts'}
+    ]}),
+    Scenario('events.first_snapshot', 'GET', '/api/events/stream?topics=invoice_summary,customer_summary',
+             stream=True, max_chunks=1),
+    Scenario('stats', 'GET', '/api/stats'),
+    Scenario('metrics', 'GET', '/metrics'),
+]
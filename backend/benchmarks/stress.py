@@ -0,0 +1,455 @@
+"""Concurrent mixed workload with lost-update checks
+
+Drives creates, payments and reads from many threads (and optionally
+processes) against a running server or the Flask test client, then reads
+the books back and checks that nothing a client was told succeeded went
+missing:
+
+    python -m benchmarks.stress --threads 8 --processes 2 --duration 20
+    python -m benchmarks.stress --url http://localhost:5000 --threads 16
+
+Exits with status 1 when an invariant is violated.
+"""
+import argparse
+import json
+import multiprocessing
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from app import money
+from .generator import Scale, generate_books
+from .runner import percentile
+from .scenarios import PRODUCT
+
+# Relative weight of each operation in the mix
+DEFAULT_MIX = {
+    'invoice.create': 20,
+    'invoice.pay': 15,
+    'transaction.create': 20,
+    'customer.create': 10,
+    'invoice.summary': 10,
+    'invoice.get': 10,
+    'transaction.list': 10,
+    'customer.list': 5,
+}
+
+class HttpClient:
+    """Talks to a running server over HTTP"""
+
+    def __init__(self, url: str):
+        import requests
+        self.url = url.rstrip('/')
+        self.session = requests.Session()
+
+    def call(self, method: str, path: str, body=None) -> Tuple[int, Optional[Dict]]:
+        response = self.session.request(method, self.url + path, json=body, timeout=120)
+        try:
+            return response.status_code, response.json()
+        except ValueError:
+            return response.status_code, None
+
+    def lines(self, path: str):
+        with self.session.get(self.url + path, stream=True, timeout=600) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if line:
+                    yield json.loads(line)
+
+class TestClient:
+    """Calls the app in process; each process builds its own app over the shared data directory"""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def call(self, method: str, path: str, body=None) -> Tuple[int, Optional[Dict]]:
+        response = self.client.open(path, method=method, json=body)
+        try:
+            return response.status_code, response.get_json(silent=True)
+        finally:
+            response.close()
+
+    def lines(self, path: str):
+        response = self.client.get(path)
+        try:
+            for line in response.get_data(as_text=True).splitlines():
+                if line:
+                    yield json.loads(line)
+        finally:
+            response.close()
+
+def make_app(data_dir: str):
+    from app import create_app
+    return create_app({'DATA_DIR': data_dir})
+
+@dataclass
+class Outcome:
+    """What one worker did, and every write the server acknowledged"""
+    latencies: Dict[str, List[float]] = field(default_factory=lambda: defaultdict(list))
+    statuses: Dict[str, Counter] = field(default_factory=lambda: defaultdict(Counter))
+    invoices: List[str] = field(default_factory=list)
+    customers: List[str] = field(default_factory=list)
+    transactions: List[str] = field(default_factory=list)
+    # (invoice id, payment id, amount, transaction id)
+    payments: List[Tuple[str, str, float, str]] = field(default_factory=list)
+
+    def merge(self, other: 'Outcome') -> None:
+        for op, values in other.latencies.items():
+            self.latencies[op].extend(values)
+        for op, counts in other.statuses.items():
+            self.statuses[op].update(counts)
+        self.invoices.extend(other.invoices)
+        self.customers.extend(other.customers)
+        self.transactions.extend(other.transactions)
+        self.payments.extend(other.payments)
+
+    def to_plain(self) -> Dict:
+        # defaultdicts of Counters do not cross process boundaries cleanly
+        return {
+            'latencies': dict(self.latencies),
+            'statuses': {op: dict(counts) for op, counts in self.statuses.items()},
+            'invoices': self.invoices,
+            'customers': self.customers,
+            'transactions': self.transactions,
+            'payments': self.payments,
+        }
+
+    @classmethod
+    def from_plain(cls, data: Dict) -> 'Outcome':
+        outcome = cls()
+        for op, values in data['latencies'].items():
+            outcome.latencies[op].extend(values)
+        for op, counts in data['statuses'].items():
+            outcome.statuses[op].update(counts)
+        outcome.invoices = list(data['invoices'])
+        outcome.customers = list(data['customers'])
+        outcome.transactions = list(data['transactions'])
+        outcome.payments = [tuple(p) for p in data['payments']]
+        return outcome
+
+class Worker:
+    """One client issuing a weighted random mix until its deadline or operation budget runs out"""
+
+    def __init__(self, client, mix: Dict[str, int], seed: int, tag: str):
+        self.client = client
+        self.rng = random.Random(seed)
+        self.ops = list(mix)
+        self.weights = [mix[op] for op in self.ops]
+        self.tag = tag
+        self.outcome = Outcome()
+        # Invoices this worker created and has not paid yet, with their totals
+        self.unpaid: List[Tuple[str, float]] = []
+        self.counter = 0
+
+    def run(self, deadline: float, operations: Optional[int]) -> Outcome:
+        done = 0
+        while time.time() < deadline and (operations is None or done < operations):
+            op = self.rng.choices(self.ops, self.weights)[0]
+            before = time.perf_counter()
+            status = getattr(self, '_' + op.replace('.', '_'))()
+            if status is None:
+                continue
+            self.outcome.latencies[op].append(time.perf_counter() - before)
+            self.outcome.statuses[op][status] += 1
+            done += 1
+        return self.outcome
+
+    def _unique(self) -> str:
+        self.counter += 1
+        return f'{self.tag}-{self.counter}'
+
+    # Writes
+    def _invoice_create(self) -> int:
+        status, body = self.client.call('POST', '/api/invoices/create_invoice', {
+            'customer_name': f'Stress {self._unique()}',
+            'invoice_date': '2024-06-01',
+            'payment_terms': 'net_30',
+            'products': [PRODUCT]
+        })
+        if status == 201 and body:
+            self.outcome.invoices.append(body['id'])
+            self.unpaid.append((body['id'], body['total_amount']))
+        return status
+
+    def _invoice_pay(self) -> Optional[int]:
+        if not self.unpaid:
+            return None
+        invoice_id, amount = self.unpaid.pop(self.rng.randrange(len(self.unpaid)))
+        # Pay in full: a partial payment leaves a status the invoice summary cannot count
+        status, body = self.client.call('POST', f'/api/invoices/add_payment/{invoice_id}', {
+            'amount': amount, 'payment_method': 'check', 'date': '2024-06-15'
+        })
+        if status == 201 and body:
+            self.outcome.payments.append((invoice_id, body['id'], body['amount'], body.get('transaction_id')))
+        return status
+
+    def _transaction_create(self) -> int:
+        amount = round(self.rng.uniform(1, 500), 2)
+        status, body = self.client.call('POST', '/api/transactions/create', {
+            'date': '2024-06-01',
+            'description': f'Stress transfer {self._unique()}',
+            'transaction_type': 'other',
+            'entries': [
+                {'accountId': '1000', 'amount': amount, 'type': 'debit', 'description': 'Stress'},
+                {'accountId': '4000', 'amount': amount, 'type': 'credit', 'description': 'Stress'}
+            ]
+        })
+        if status == 201 and body:
+            self.outcome.transactions.append(body['id'])
+        return status
+
+    def _customer_create(self) -> int:
+        name = self._unique()
+        status, body = self.client.call('POST', '/api/customers/create_customer', {
+            'first_name': 'Stress',
+            'last_name': name,
+            'email': f'stress-{name}@example.com',
+            'phone': '5550000000',
+            'billing_address': {
+                'street': '1 Main St', 'city': 'Austin', 'state': 'TX', 'postal_code': '78701',
+                'country': 'United States'
+            }
+        })
+        if status == 201 and body:
+            self.outcome.customers.append(body['customer']['id'])
+        return status
+
+    # Reads
+    def _invoice_summary(self) -> int:
+        return self.client.call('GET', '/api/invoices/get_summary')[0]
+
+    def _invoice_get(self) -> Optional[int]:
+        if not self.outcome.invoices:
+            return None
+        invoice_id = self.rng.choice(self.outcome.invoices)
+        return self.client.call('GET', f'/api/invoices/get_invoice/{invoice_id}')[0]
+
+    def _transaction_list(self) -> int:
+        return self.client.call('GET', '/api/transactions/list?per_page=50')[0]
+
+    def _customer_list(self) -> int:
+        return self.client.call('GET', '/api/customers/list_customers')[0]
+
+def run_process(options: Dict) -> Dict:
+    """Run options['threads'] workers in this process and merge what they saw"""
+    if options['url']:
+        factory = lambda: HttpClient(options['url'])
+    else:
+        app = make_app(options['data_dir'])
+        factory = lambda: TestClient(app)
+
+    outcomes: List[Outcome] = []
+    lock = threading.Lock()
+
+    def work(index: int):
+        tag = f"p{options['process']}t{index}"
+        worker = Worker(factory(), options['mix'], options['seed'] * 1000 + options['process'] * 100 + index, tag)
+        outcome = worker.run(options['deadline'], options['operations'])
+        with lock:
+            outcomes.append(outcome)
+
+    threads = [threading.Thread(target=work, args=(i,)) for i in range(options['threads'])]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    merged = Outcome()
+    for outcome in outcomes:
+        merged.merge(outcome)
+    return merged.to_plain()
+
+@dataclass
+class Violation:
+    check: str
+    count: int
+    examples: List[str]
+
+def check_invariants(client, outcome: Outcome) -> Tuple[List[Violation], Dict[str, int]]:
+    """Read the books back and compare them with every acknowledged write"""
+    violations: List[Violation] = []
+
+    def expect(check: str, failures: List[str]):
+        if failures:
+            violations.append(Violation(check, len(failures), failures[:5]))
+
+    _, body = client.call('GET', '/api/invoices/list_invoices')
+    invoices = {i['id']: i for i in (body or {}).get('invoices', [])}
+    _, body = client.call('GET', '/api/customers/list_customers')
+    customers = {c['id'] for c in (body or {}).get('customers', [])}
+    transaction_ids = []
+    transactions = {}
+    for transaction in client.lines('/api/transactions/export?format=ndjson'):
+        transaction_ids.append(transaction['id'])
+        transactions[transaction['id']] = transaction
+
+    expect('created invoices present', [i for i in outcome.invoices if i not in invoices])
+    expect('created customers present', [c for c in outcome.customers if c not in customers])
+    expect('created transactions present', [t for t in outcome.transactions if t not in transactions])
+    expect('transaction ids unique', [t for t, n in Counter(transaction_ids).items() if n > 1])
+
+    unbalanced = []
+    for transaction in transactions.values():
+        debits = sum(money.cents_of(e, 'amount') for e in transaction.get('entries', []) if e['type'] == 'debit')
+        credits = sum(money.cents_of(e, 'amount') for e in transaction.get('entries', []) if e['type'] == 'credit')
+        if debits != credits:
+            unbalanced.append(f"{transaction['id']}: debits {debits} != credits {credits} cents")
+    expect('transactions balanced', unbalanced)
+
+    missing_payments, bad_transactions = [], []
+    for invoice_id, payment_id, amount, transaction_id in outcome.payments:
+        invoice = invoices.get(invoice_id)
+        if invoice is None or not any(p['id'] == payment_id for p in invoice.get('payments', [])):
+            missing_payments.append(f'{invoice_id}/{payment_id}')
+        transaction = transactions.get(transaction_id)
+        debits = sum(money.cents_of(e, 'amount') for e in (transaction or {}).get('entries', []) if e['type'] == 'debit')
+        if transaction is None or debits != money.to_cents(amount):
+            bad_transactions.append(f'{invoice_id}/{payment_id} -> {transaction_id}')
+    expect('acknowledged payments present', missing_payments)
+    expect('payments have a matching transaction', bad_transactions)
+
+    wrong_balances = []
+    for invoice in invoices.values():
+        if invoice.get('status') == 'void':
+            continue
+        total = money.cents_of(invoice, 'total_amount')
+        paid = sum(money.cents_of(p, 'amount') for p in invoice.get('payments', []))
+        due = money.cents_of(invoice, 'balance_due')
+        if total - paid != due:
+            wrong_balances.append(f"{invoice['id']}: total {total} - paid {paid} != due {due} cents")
+    expect('invoice balances match payments', wrong_balances)
+
+    counts = {'invoices': len(invoices), 'customers': len(customers), 'transactions': len(transactions)}
+    return violations, counts
+
+def parse_mix(text: Optional[str]) -> Dict[str, int]:
+    """Parse 'invoice.create=5,invoice.pay=5' into weights; unknown operations are an error"""
+    if not text:
+        return dict(DEFAULT_MIX)
+    mix = {}
+    for part in text.split(','):
+        op, _, weight = part.partition('=')
+        op = op.strip()
+        if op not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"unknown operation {op!r}; choose from {', '.join(DEFAULT_MIX)}")
+        mix[op] = int(weight or 1)
+    return mix
+
+def format_report(outcome: Outcome, elapsed: float) -> str:
+    header = f"{'operation':<22}{'ok':>8}{'errors':>8}{'ops/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}"
+    lines = [header, '-' * len(header)]
+    total = 0
+    for op in sorted(outcome.latencies):
+        ordered = sorted(latency * 1000 for latency in outcome.latencies[op])
+        statuses = outcome.statuses[op]
+        errors = sum(n for status, n in statuses.items() if int(status) >= 400)
+        total += len(ordered)
+        lines.append(
+            f'{op:<22}{len(ordered) - errors:>8}{errors:>8}{len(ordered) / elapsed:>10.1f}'
+            f'{percentile(ordered, 50):>10.2f}{percentile(ordered, 99):>10.2f}{ordered[-1]:>10.2f}'
+        )
+    lines.append('-' * len(header))
+    lines.append(f"{'total':<22}{total:>16}{total / elapsed:>10.1f}")
+    return '\n'.join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks.stress',
+        description='Drive a concurrent read/write mix, then check that no acknowledged write was lost'
+    )
+    parser.add_argument('--url', help='base URL of a running server; defaults to the Flask test client')
+    parser.add_argument('--threads', type=int, default=8, help='client threads per process')
+    parser.add_argument('--processes', type=int, default=1, help='client processes')
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds to run')
+    parser.add_argument('--operations', type=int, help='stop each thread after this many operations')
+    parser.add_argument('--mix', type=parse_mix, default=None,
+                        help=f"weights, e.g. invoice.create=5,invoice.pay=5 (default {DEFAULT_MIX})")
+    parser.add_argument('--records', type=int, default=200, help='invoices to generate before the run')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--data-dir', help='generate into this directory and keep it')
+    parser.add_argument('--json', help='also write the report to this file')
+    args = parser.parse_args()
+
+    directory = None
+    if not args.url:
+        directory = args.data_dir or tempfile.mkdtemp(prefix='stress-')
+        generate_books(directory, Scale.for_records(args.records), args.seed)
+        print(f"Generated {args.records} invoices into {directory}")
+
+    mix = args.mix or dict(DEFAULT_MIX)
+    deadline = time.time() + args.duration
+    options = [{
+        'url': args.url,
+        'data_dir': directory,
+        'threads': args.threads,
+        'process': index,
+        'mix': mix,
+        'seed': args.seed,
+        'deadline': deadline,
+        'operations': args.operations,
+    } for index in range(args.processes)]
+
+    print(f"Running {args.processes} process(es) x {args.threads} thread(s) for up to {args.duration:g}s", file=sys.stderr)
+    started = time.perf_counter()
+    try:
+        if args.processes == 1:
+            results = [run_process(options[0])]
+        else:
+            # Spawn rather than fork: the app starts logging and pool threads at import
+            with multiprocessing.get_context('spawn').Pool(args.processes) as pool:
+                results = pool.map(run_process, options)
+        elapsed = time.perf_counter() - started
+
+        outcome = Outcome()
+        for result in results:
+            outcome.merge(Outcome.from_plain(result))
+
+        client = HttpClient(args.url) if args.url else TestClient(make_app(directory))
+        violations, counts = check_invariants(client, outcome)
+    finally:
+        if directory and not args.data_dir:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    print()
+    print(format_report(outcome, elapsed))
+    print()
+    print(f"Acknowledged: {len(outcome.invoices)} invoices, {len(outcome.payments)} payments, "
+          f"{len(outcome.transactions)} transactions, {len(outcome.customers)} customers")
+    print(f"Found: {counts['invoices']} invoices, {counts['transactions']} transactions, "
+          f"{counts['customers']} customers")
+    if violations:
+        print('\nInvariant violations:')
+        for violation in violations:
+            print(f'  {violation.check}: {violation.count}')
+            for example in violation.examples:
+                print(f'    {example}')
+    else:
+        print('\nAll invariants hold')
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({
+                'threads': args.threads,
+                'processes': args.processes,
+                'elapsed': elapsed,
+                'mix': mix,
+                'acknowledged': {
+                    'invoices': len(outcome.invoices),
+                    'payments': len(outcome.payments),
+                    'transactions': len(outcome.transactions),
+                    'customers': len(outcome.customers),
+                },
+                'found': counts,
+                'violations': [violation.__dict__ for violation in violations]
+            }, f, indent=2)
+
+    sys.exit(1 if violations else 0)
+
+if __name__ == '__main__':
+    main()
@@ -1,20 +1,9 @@
-from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
-from routes import customers_router
+from app import create_app
+from app.asgi import AsgiApp
 
-app = FastAPI()
-
-# Configure CORS
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  # In production, replace with specific origins
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# Include routers
-app.include_router(customers_router, prefix="/api/customers", tags=["customers"])
+# ASGI entry point serving the same Flask app as run.py, e.g.
+#   uvicorn main:app --host 0.0.0.0 --port 8000
+app = AsgiApp(create_app())
 
 if __name__ == "__main__":
     import uvicorn
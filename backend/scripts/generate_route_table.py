@@ -0,0 +1,65 @@
+import importlib
+import os
+import sys
+from typing import Dict, List, Optional, Tuple
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TABLE_PATH = os.path.join(BASE_DIR, 'app', 'route_table.py')
+
+HEADER = '''"""URL rules of every blueprint, as declared in its routes module
+
+Generated by scripts/generate_route_table.py from the route decorators, so
+create_app can add the rules without importing any routes module. Run the
+script again after adding, removing or changing a route.
+"""
+from typing import Dict, List, Optional, Tuple
+
+# Routes module -> (rule within the blueprint, view function, methods) of each route
+ROUTES: Dict[str, List[Tuple[str, str, Optional[List[str]]]]] = {
+'''
+
+class _Recorder:
+    """Stands in for a blueprint's setup state and keeps the URL rules it is given"""
+
+    app = None
+    first_registration = False
+
+    def __init__(self):
+        self.rules: List[Tuple[str, str, Optional[List[str]]]] = []
+
+    def add_url_rule(self, rule: str, endpoint: Optional[str] = None, view_func=None, **options) -> None:
+        methods = options.get('methods')
+        self.rules.append((rule, view_func.__name__, list(methods) if methods is not None else None))
+
+def routes() -> Dict[str, List[Tuple[str, str, Optional[List[str]]]]]:
+    """Import every routes module and read back the rules its decorators declared"""
+    if BASE_DIR not in sys.path:
+        sys.path.insert(0, BASE_DIR)
+    from app.blueprints import BLUEPRINTS
+
+    table = {}
+    for _, module_name, attr in BLUEPRINTS:
+        blueprint = getattr(importlib.import_module(module_name), attr)
+        recorder = _Recorder()
+        for deferred in blueprint.deferred_functions:
+            deferred(recorder)
+        table[module_name] = recorder.rules
+    return table
+
+def render(table: Dict[str, List[Tuple[str, str, Optional[List[str]]]]]) -> str:
+    lines = [HEADER]
+    for module_name, rules in table.items():
+        lines.append(f'    {module_name!r}: [\n')
+        for rule in rules:
+            lines.append(f'        {rule!r},\n')
+        lines.append('    ],\n')
+    lines.append('}\n')
+    return ''.join(lines)
+
+def main():
+    with open(TABLE_PATH, 'w') as f:
+        f.write(render(routes()))
+    print(f"Wrote {TABLE_PATH}")
+
+if __name__ == '__main__':
+    main()
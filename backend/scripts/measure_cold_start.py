@@ -0,0 +1,65 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in a fresh interpreter so nothing is already imported
+CHILD = '''
+import json, time
+start = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+app = create_app()
+created = time.perf_counter()
+client = app.test_client()
+status = client.get({path!r}).status_code
+first = time.perf_counter()
+client.get({path!r})
+second = time.perf_counter()
+print(json.dumps({{
+    'import_ms': (imported - start) * 1000,
+    'create_app_ms': (created - imported) * 1000,
+    'first_request_ms': (first - created) * 1000,
+    'second_request_ms': (second - first) * 1000,
+    'status': status
+}}))
+'''
+
+def measure(path: str, runs: int) -> dict:
+    """Start a new process per run and collect the median of each phase"""
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        output = subprocess.run(
+            [sys.executable, '-c', CHILD.format(path=path)],
+            cwd=BASE_DIR, capture_output=True, text=True, check=True
+        ).stdout
+        wall = (time.perf_counter() - started) * 1000
+        sample = json.loads(output.strip().splitlines()[-1])
+        sample['process_ms'] = wall
+        samples.append(sample)
+
+    keys = ['import_ms', 'create_app_ms', 'first_request_ms', 'second_request_ms', 'process_ms']
+    result = {key: statistics.median(s[key] for s in samples) for key in keys}
+    result['status'] = samples[-1]['status']
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure start-up cost up to the first response')
+    parser.add_argument('--path', default='/api/invoices/get_summary', help='endpoint requested first')
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args()
+
+    print(f"First request: GET {args.path}, median of {args.runs} runs (ms)")
+    print(f"{'import':>10}{'create_app':>12}{'1st req':>10}{'2nd req':>10}{'process':>10}")
+    r = measure(args.path, args.runs)
+    print(f"{r['import_ms']:>10.1f}{r['create_app_ms']:>12.1f}"
+          f"{r['first_request_ms']:>10.1f}{r['second_request_ms']:>10.1f}{r['process_ms']:>10.1f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,16 @@
+"""Invoice line totals in whole cents"""
+from app.invoices.models import Product
+
+def test_fractional_unit_price_is_rounded_once_per_line():
+    assert Product(name='Bolt', description='', price=0.125, quantity=1000).total_cents == 12500
+    assert Product(name='Nut', description='', price=0.333, quantity=3).total_cents == 100
+
+def test_tax_applies_to_the_rounded_line():
+    product = Product(name='Washer', description='', price=0.125, quantity=1000, tax_rate=8.25)
+    assert product.total_cents == 12500 + 1031
+    assert product.tax_amount == 10.31
+    assert product.total == 135.31
+
+def test_whole_unit_prices_are_unchanged():
+    product = Product(name='Hour', description='', price=19.99, quantity=3, tax_rate=10)
+    assert product.total_cents == 5997 + 600
@@ -0,0 +1,19 @@
+"""app/route_table.py against the route decorators it is generated from"""
+from app import create_app
+from app.blueprints import LazyView
+from app.events.broker import broker
+from app.route_table import ROUTES
+from scripts.generate_route_table import routes
+
+def test_route_table_matches_the_routes_modules():
+    assert routes() == ROUTES, 'app/route_table.py is stale; run scripts/generate_route_table.py'
+
+def test_every_lazy_view_imports_its_function():
+    app = create_app({'EVENTS_COALESCE_WINDOW': 0.25})
+    with app.app_context():
+        for endpoint, view in app.view_functions.items():
+            if isinstance(view, LazyView):
+                assert callable(view.view), endpoint
+                assert view.view.__name__ == endpoint.rpartition('.')[2]
+    # Blueprint setup callbacks ran as registration would have run them
+    assert broker.window == 0.25
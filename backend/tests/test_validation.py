@@ -0,0 +1,21 @@
+"""The API spec request schemas against the routes the app serves"""
+from app import create_app
+from app.validation import SPEC_DIR, load_operations, route_key
+
+def test_every_spec_operation_is_served_and_compiles():
+    app = create_app()
+    served = {
+        route_key(method, rule.rule)
+        for rule in app.url_map.iter_rules()
+        for method in rule.methods
+    }
+    for key, operation in load_operations(SPEC_DIR).items():
+        assert key in served, f'{operation.source} describes {key}, which no route serves'
+        assert callable(operation.check), key
+
+def test_body_is_checked_against_the_spec():
+    app = create_app()
+    client = app.test_client()
+    response = client.post('/api/coa/update-balance/missing', json={'amount': 5, 'type': 'sideways'})
+    assert response.status_code == 400
+    assert response.get_json()['error_code'] == 'INVALID_REQUEST'